@@ -0,0 +1,146 @@
+"""
+Retrieval benchmark for the vector search modes in database/db.py.
+
+Samples stored embeddings as queries (no OpenAI calls needed), computes the exact
+top-k with a sequential scan and reports recall@k, latency and index sizes for
+each search mode.
+
+Usage (from the rag/ directory):
+    python -m benchmarks.retrieval --modes full halfvec binary --queries 50
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from config.config import get_config
+from database.db import DatabaseConnection, SEARCH_MODES
+
+
+def sample_query_embeddings(db: DatabaseConnection, count: int) -> List[List[float]]:
+    """Picks random stored embeddings to use as benchmark queries."""
+    with db.get_engine().connect() as connection:
+        rows = connection.execute(
+            text(f"SELECT embedding::text AS embedding FROM {db.data_table} ORDER BY random() LIMIT :count"),
+            {"count": count},
+        ).fetchall()
+    return [json.loads(row.embedding) for row in rows]
+
+
+def exact_top_k(db: DatabaseConnection, query_embedding: List[float], top_k: int) -> List[str]:
+    """Ground truth top-k node ids from a sequential scan."""
+    with db.get_engine().begin() as connection:
+        connection.execute(text("SET LOCAL enable_indexscan = off"))
+        rows = connection.execute(
+            text(
+                f"SELECT node_id FROM {db.data_table} "
+                f"ORDER BY embedding <=> CAST(:query AS vector({db.embed_dim})) LIMIT :top_k"
+            ),
+            {"query": str(query_embedding), "top_k": top_k},
+        ).fetchall()
+    return [row.node_id for row in rows]
+
+
+def index_sizes(db: DatabaseConnection) -> Dict[str, int]:
+    """Returns the on-disk size in bytes of every index on the vector table."""
+    with db.get_engine().connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT indexname, pg_relation_size(format('%I.%I', schemaname, indexname)::regclass) AS size "
+                "FROM pg_indexes WHERE schemaname = 'public' AND tablename = :table"
+            ),
+            {"table": f"data_{db.table_name.lower()}"},
+        ).fetchall()
+    return {row.indexname: row.size for row in rows}
+
+
+def run_benchmark(modes: List[str], queries: int, top_k: int) -> dict:
+    db = DatabaseConnection()
+    for mode in modes:
+        db.verify_search_index(mode)
+    query_embeddings = sample_query_embeddings(db, queries)
+    ground_truth = [set(exact_top_k(db, q, top_k)) for q in query_embeddings]
+
+    report = {"queries": len(query_embeddings), "top_k": top_k, "index_sizes": index_sizes(db), "modes": {}}
+
+    for mode in modes:
+        latencies = []
+        recalls = []
+        for query_embedding, expected in zip(query_embeddings, ground_truth):
+            start = time.perf_counter()
+            results = db.search_by_embedding(query_embedding, top_k, mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = {res.node.node_id for res in results}
+            recalls.append(len(found & expected) / max(len(expected), 1))
+
+        latencies.sort()
+        report["modes"][mode] = {
+            f"recall@{top_k}": statistics.mean(recalls) if recalls else 0.0,
+            "latency_ms_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+            "latency_ms_p95": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+        }
+
+    return report
+
+
+def print_report(report: dict) -> None:
+    top_k = report["top_k"]
+    print(f"\nRetrieval benchmark over {report['queries']} sampled queries (top {top_k})\n")
+    print("Index sizes:")
+    for name, size in sorted(report["index_sizes"].items()):
+        print(f"  {name:<60} {size / 1024 / 1024:>10.1f} MiB")
+    print()
+    print(f"{'mode':<12} {'recall@' + str(top_k):>10} {'p50 ms':>10} {'p95 ms':>10}")
+    for mode, stats in report["modes"].items():
+        print(
+            f"{mode:<12} {stats[f'recall@{top_k}']:>10.3f} "
+            f"{stats['latency_ms_p50']:>10.2f} {stats['latency_ms_p95']:>10.2f}"
+        )
+
+
+def check_recall_tolerance(report: dict, mode: str, tolerance: float) -> bool:
+    """
+    Checks that `mode` keeps recall within `tolerance` of full-precision search
+    (or of exact search when the full mode was not benchmarked).
+    """
+    key = f"recall@{report['top_k']}"
+    baseline = report["modes"].get("full", {}).get(key, 1.0)
+    recall = report["modes"][mode][key]
+    within = recall >= baseline - tolerance
+    status = "OK" if within else "FAIL"
+    print(f"\n{status}: {mode} {key} {recall:.3f} vs baseline {baseline:.3f} (tolerance {tolerance:.3f})")
+    return within
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark vector search modes against exact search.")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        # The matryoshka mode is only available once MATRYOSHKA_DIM names the column the pipeline built
+        default=[mode for mode in SEARCH_MODES if mode != "matryoshka" or get_config().matryoshka_dim],
+        choices=SEARCH_MODES,
+    )
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--json", dest="json_path", help="Optional path to write the report as JSON")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=get_config().matryoshka_recall_tolerance,
+        help="Maximum recall drop allowed for the matryoshka mode",
+    )
+    args = parser.parse_args()
+
+    result = run_benchmark(args.modes, args.queries, args.top_k)
+    print_report(result)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if "matryoshka" in result["modes"] and not check_recall_tolerance(result, "matryoshka", args.tolerance):
+        sys.exit(1)
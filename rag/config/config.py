@@ -32,6 +32,25 @@ class Config:
             self._db_name = self._get_required_env('DB_NAME')
             self._db_table_name = self._get_required_env('DB_TABLE_NAME')
 
+            # Retrieval tuning (optional)
+            self._vector_search_mode = self.get_env_var('VECTOR_SEARCH_MODE', 'full').lower()
+            self._rescore_overfetch = int(self.get_env_var('RESCORE_OVERFETCH', '4'))
+            # Same default as rag_data_pipeline, where 0 means the column is not built
+            self._matryoshka_dim = int(self.get_env_var('MATRYOSHKA_DIM', '0'))
+            self._matryoshka_recall_tolerance = float(self.get_env_var('MATRYOSHKA_RECALL_TOLERANCE', '0.02'))
+
+            # In-process read replica (optional, empty disables)
+            self._replica_snapshot_dir = self.get_env_var('REPLICA_SNAPSHOT_DIR', '')
+            self._replica_check_interval = float(self.get_env_var('REPLICA_CHECK_INTERVAL_SECONDS', '30'))
+
+            # Retrieval result cache (0 disables)
+            self._retrieval_cache_size = int(self.get_env_var('RETRIEVAL_CACHE_SIZE', '1024'))
+            self._retrieval_cache_node_size = int(self.get_env_var('RETRIEVAL_CACHE_NODE_SIZE', '4096'))
+            self._retrieval_cache_version_check_interval = float(self.get_env_var('RETRIEVAL_CACHE_VERSION_CHECK_SECONDS', '0'))
+
+            # Blue/green tables: how often DB_TABLE_NAME is resolved to the active table
+            self._table_alias_refresh_seconds = float(self.get_env_var('TABLE_ALIAS_REFRESH_SECONDS', '30'))
+
             
             
 
@@ -79,6 +98,46 @@ class Config:
     @property
     def db_name(self) -> str:
         return self._db_name
+
+    @property
+    def vector_search_mode(self) -> str:
+        return self._vector_search_mode
+
+    @property
+    def rescore_overfetch(self) -> int:
+        return self._rescore_overfetch
+
+    @property
+    def matryoshka_dim(self) -> int:
+        return self._matryoshka_dim
+
+    @property
+    def matryoshka_recall_tolerance(self) -> float:
+        return self._matryoshka_recall_tolerance
+
+    @property
+    def replica_snapshot_dir(self) -> str:
+        return self._replica_snapshot_dir
+
+    @property
+    def replica_check_interval(self) -> float:
+        return self._replica_check_interval
+
+    @property
+    def retrieval_cache_size(self) -> int:
+        return self._retrieval_cache_size
+
+    @property
+    def retrieval_cache_node_size(self) -> int:
+        return self._retrieval_cache_node_size
+
+    @property
+    def retrieval_cache_version_check_interval(self) -> float:
+        return self._retrieval_cache_version_check_interval
+
+    @property
+    def table_alias_refresh_seconds(self) -> float:
+        return self._table_alias_refresh_seconds
     
    
 
@@ -0,0 +1,120 @@
+import logging
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from sqlalchemy import URL, create_engine, make_url, text
+from sqlalchemy.engine import Engine
+
+from config.config import get_config
+
+
+logger = logging.getLogger(__name__)
+
+# Written by rag_data_pipeline/database/blue_green.py: DB_TABLE_NAME is an alias
+# for the physical table serving reads, and every physical table records the
+# embedding model it was built with.
+TABLE_ALIAS_TABLE = "rag_table_alias"
+TABLE_VERSIONS_TABLE = "rag_table_versions"
+
+
+class ActiveTable(NamedTuple):
+    """The physical table behind the alias and the embedding model its vectors come from."""
+    table_name: str
+    embed_model: str = "text-embedding-3-small"
+    embed_dim: int = 1536
+
+
+class TableAlias:
+    """
+    Resolves DB_TABLE_NAME to the table the pipeline activated last.
+
+    The lookup is cached for `refresh_interval` seconds, so a blue/green switch
+    reaches every worker within that time without a query per request. Until
+    the pipeline creates the alias tables the alias is the table itself; if a
+    lookup fails, the last resolved table keeps being served.
+    """
+
+    def __init__(self, connection_string: str, alias: str, refresh_interval: float = 30.0):
+        self.connection_string = connection_string
+        self.alias = alias
+        self.refresh_interval = refresh_interval
+        self._active: Optional[ActiveTable] = None
+        self._last_check = 0.0
+        self._engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+
+    def _get_engine(self) -> Engine:
+        if self._engine is None:
+            url = make_url(self.connection_string)
+            self._engine = create_engine(
+                URL.create(
+                    "postgresql+psycopg2",
+                    username=url.username,
+                    password=url.password,
+                    host=url.host,
+                    port=url.port,
+                    database=url.database,
+                ),
+                pool_pre_ping=True,
+            )
+        return self._engine
+
+    def _lookup(self) -> ActiveTable:
+        with self._get_engine().connect() as connection:
+            if connection.execute(text("SELECT to_regclass(:table)"), {"table": TABLE_ALIAS_TABLE}).scalar() is None:
+                return ActiveTable(self.alias)
+            row = connection.execute(
+                text(
+                    f"SELECT a.table_name, v.settings FROM {TABLE_ALIAS_TABLE} a "
+                    f"LEFT JOIN {TABLE_VERSIONS_TABLE} v ON v.table_name = a.table_name "
+                    "WHERE a.alias = :alias"
+                ),
+                {"alias": self.alias},
+            ).first()
+        if row is None:
+            return ActiveTable(self.alias)
+        settings = row.settings or {}
+        defaults = ActiveTable(row.table_name)
+        return ActiveTable(
+            row.table_name,
+            embed_model=settings.get("embed_model", defaults.embed_model),
+            embed_dim=int(settings.get("embed_dim", defaults.embed_dim)),
+        )
+
+    def resolve(self) -> ActiveTable:
+        """Returns the active table, looking it up again once the refresh interval has passed."""
+        now = time.monotonic()
+        if self._active is not None and now - self._last_check < self.refresh_interval:
+            return self._active
+
+        with self._lock:
+            if self._active is not None and now - self._last_check < self.refresh_interval:
+                return self._active
+            self._last_check = now
+            try:
+                active = self._lookup()
+            except Exception as e:
+                logger.warning(f"Could not resolve table alias '{self.alias}': {e}")
+                return self._active or ActiveTable(self.alias)
+            if self._active is not None and active != self._active:
+                logger.info(f"Table alias '{self.alias}' switched {self._active.table_name} -> {active.table_name}")
+            self._active = active
+            return active
+
+
+_alias: Optional[TableAlias] = None
+_alias_lock = threading.Lock()
+
+
+def get_table_alias() -> TableAlias:
+    """Returns the process-wide resolver of DB_TABLE_NAME."""
+    global _alias
+    if _alias is None:
+        with _alias_lock:
+            if _alias is None:
+                config = get_config()
+                _alias = TableAlias(
+                    config.db_connection_string, config.db_table_name, config.table_alias_refresh_seconds
+                )
+    return _alias
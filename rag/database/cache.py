@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core.schema import BaseNode, NodeWithScore
+from llama_index.core.vector_stores import MetadataFilters
+
+from config.config import get_config
+
+
+logger = logging.getLogger(__name__)
+
+
+class RetrievalCache:
+    """
+    LRU cache for similarity search results, invalidated by the corpus version.
+
+    Result lists are cached as (node_id, score) pairs keyed by the query embedding
+    hash, top_k, filters and search mode. Chunk bodies are cached separately by
+    node id, so popular chunks shared across queries are stored once.
+
+    The corpus version is bumped by rag_data_pipeline after every successful
+    ingestion. Whenever the cache sees a new version it drops everything, so
+    results are never served across ingestions.
+    """
+
+    def __init__(self, max_queries: int = 1024, max_nodes: int = 4096, version_check_interval: float = 0.0):
+        self.max_queries = max_queries
+        self.max_nodes = max_nodes
+        self.version_check_interval = version_check_interval
+        self._results: "OrderedDict[str, List[Tuple[str, float]]]" = OrderedDict()
+        self._nodes: "OrderedDict[str, BaseNode]" = OrderedDict()
+        self._version: Optional[Hashable] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(
+        query_embedding: List[float],
+        similarity_top_k: int,
+        filters: Optional[MetadataFilters] = None,
+        mode: str = "full",
+    ) -> str:
+        digest = hashlib.sha1(np.asarray(query_embedding, dtype=np.float32).tobytes())
+        digest.update(f"|{similarity_top_k}|{mode}|".encode())
+        if filters is not None:
+            digest.update(filters.model_dump_json().encode())
+        return digest.hexdigest()
+
+    def sync_version(self, fetch_version: Callable[[], Hashable]) -> None:
+        """
+        Reads the corpus version (at most every `version_check_interval` seconds)
+        and clears the cache when it changed.
+        """
+        now = time.monotonic()
+        if self._version is not None and now - self._last_check < self.version_check_interval:
+            return
+
+        version = fetch_version()
+        with self._lock:
+            self._last_check = now
+            if version != self._version:
+                if self._version is not None:
+                    logger.info(f"Corpus version changed {self._version} -> {version}, clearing retrieval cache.")
+                self._results.clear()
+                self._nodes.clear()
+                self._version = version
+
+    def get(self, key: str) -> Optional[List[NodeWithScore]]:
+        with self._lock:
+            entries = self._results.get(key)
+            if entries is None or any(node_id not in self._nodes for node_id, _ in entries):
+                self.misses += 1
+                return None
+
+            self._results.move_to_end(key)
+            results = []
+            for node_id, score in entries:
+                self._nodes.move_to_end(node_id)
+                results.append(NodeWithScore(node=self._nodes[node_id], score=score))
+            self.hits += 1
+            return results
+
+    def put(self, key: str, results: List[NodeWithScore]) -> None:
+        with self._lock:
+            self._results[key] = [(res.node.node_id, res.score) for res in results]
+            self._results.move_to_end(key)
+            for res in results:
+                self._nodes[res.node.node_id] = res.node
+                self._nodes.move_to_end(res.node.node_id)
+
+            while len(self._results) > self.max_queries:
+                self._results.popitem(last=False)
+            while len(self._nodes) > self.max_nodes:
+                self._nodes.popitem(last=False)
+
+
+_cache: Optional[RetrievalCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_retrieval_cache() -> Optional[RetrievalCache]:
+    """Returns the process-wide retrieval cache, or None when RETRIEVAL_CACHE_SIZE is 0."""
+    global _cache
+    config = get_config()
+    if config.retrieval_cache_size <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = RetrievalCache(
+                    max_queries=config.retrieval_cache_size,
+                    max_nodes=config.retrieval_cache_node_size,
+                    version_check_interval=config.retrieval_cache_version_check_interval,
+                )
+    return _cache
@@ -1,29 +1,94 @@
 import logging
-from typing import List
+import threading
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import make_url
+from sqlalchemy import URL, create_engine, make_url, text
+from sqlalchemy.engine import Engine
 from llama_index.vector_stores.postgres import PGVectorStore
-from llama_index.core.vector_stores import VectorStoreQuery
+from llama_index.core.vector_stores import MetadataFilters, VectorStoreQuery
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
 from llama_index.core.embeddings import BaseEmbedding
-from llama_index.core.schema import NodeWithScore
+from llama_index.core.schema import NodeWithScore, TextNode
 
 from config.config import get_config
+from database.alias import get_table_alias
+from database.cache import get_retrieval_cache
+from database.replica import get_replica
 
 
 logger = logging.getLogger(__name__)
 
+# Retrieval modes supported by query_vector_store. "full" uses the PGVectorStore
+# HNSW index directly; the other modes run a first pass over a compressed index
+# (quantized or reduced-dimension) and rescore the candidates against the
+# float32 embeddings.
+SEARCH_MODES = ("full", "halfvec", "binary", "matryoshka")
+
+# Table holding the corpus version stamp that rag_data_pipeline bumps after each
+# successful ingestion.
+CORPUS_VERSION_TABLE = "rag_corpus_version"
+
+# First-pass ordering expressions. These must match the index expressions built
+# by rag_data_pipeline/database/db.py exactly, otherwise Postgres will not use them.
+FIRST_PASS_ORDER_BY = {
+    "halfvec": "embedding::halfvec({dim}) <=> CAST(:query AS halfvec({dim}))",
+    "binary": "binary_quantize(embedding)::bit({dim}) <~> binary_quantize(CAST(:query AS vector({dim})))",
+    "matryoshka": "embedding_{short_dim} <=> CAST(:short_query AS vector({short_dim}))",
+}
+
+
+# One engine and one PGVectorStore per table for the whole process. get_chunks builds a
+# DatabaseConnection per call; sharing them keeps each query on pooled connections.
+_engine: Optional[Engine] = None
+_vector_stores: Dict[Tuple[str, int], PGVectorStore] = {}
+_shared_lock = threading.Lock()
+
+
+def truncate_embedding(embedding: List[float], dim: int) -> List[float]:
+    """
+    Shortens a Matryoshka embedding to its first `dim` components and renormalizes it.
+
+    Args:
+        embedding (List[float]): Full-dimension embedding
+        dim (int): Target dimension
+
+    Returns:
+        List[float]: Unit-length truncated embedding
+    """
+    head = embedding[:dim]
+    norm = sum(x * x for x in head) ** 0.5
+    return [x / norm for x in head] if norm else list(head)
+
 
 class DatabaseConnection:
     """
     Handles database connections and vector store initialization for data ingestion.
     Assumes the external PostgreSQL + pgvector database already exists.
+
+    DB_TABLE_NAME is resolved to the table the pipeline activated last (see
+    database/alias.py); queries must be embedded with `embed_model`, the model
+    that table was built with.
     """
 
     def __init__(self):
         self.config = get_config()
         self.connection_string = self.config.db_connection_string
-        self.table_name = self.config.db_table_name
+        active = get_table_alias().resolve()
+        self.alias = self.config.db_table_name
+        self.table_name = active.table_name
+        self.embed_model = active.embed_model
+        self.search_mode = self.config.vector_search_mode
+        self.rescore_overfetch = self.config.rescore_overfetch
+        self.matryoshka_dim = self.config.matryoshka_dim
+        self.embed_dim = active.embed_dim
         self.vector_store = None
+        self.replica = get_replica()
+        self.cache = get_retrieval_cache()
+
+        if self.search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unsupported VECTOR_SEARCH_MODE '{self.search_mode}'. Expected one of {SEARCH_MODES}.")
+        if self.search_mode == "matryoshka" and self.matryoshka_dim <= 0:
+            raise ValueError("VECTOR_SEARCH_MODE=matryoshka needs MATRYOSHKA_DIM, the dimension the pipeline built.")
 
     def get_vector_store(self, embed_dim: int = 1536) -> PGVectorStore:
         """
@@ -55,11 +120,117 @@ class DatabaseConnection:
 
         return vector_store
 
+    def get_engine(self) -> Engine:
+        """
+        Returns a SQLAlchemy engine for raw SQL against the vector table.
+
+        Returns:
+            Engine: Process-wide engine pointing at the same database as the vector store
+        """
+        global _engine
+        if _engine is None:
+            with _shared_lock:
+                if _engine is None:
+                    url = make_url(self.connection_string)
+                    _engine = create_engine(
+                        URL.create(
+                            "postgresql+psycopg2",
+                            username=url.username,
+                            password=url.password,
+                            host=url.host,
+                            port=url.port,
+                            database=url.database,
+                        ),
+                        pool_pre_ping=True,
+                    )
+        return _engine
+
+    def _shared_vector_store(self) -> PGVectorStore:
+        """The process-wide PGVectorStore of the active table, created on first use."""
+        key = (self.table_name, self.embed_dim)
+        if key not in _vector_stores:
+            with _shared_lock:
+                if key not in _vector_stores:
+                    logger.info(f"Initializing vector store for {self.table_name}...")
+                    _vector_stores[key] = self.get_vector_store(self.embed_dim)
+        return _vector_stores[key]
+
+    @property
+    def data_table_name(self) -> str:
+        """Unqualified name of the table PGVectorStore writes nodes to."""
+        return f"data_{self.table_name.lower()}"
+
+    @property
+    def data_table(self) -> str:
+        """Fully qualified name of the table PGVectorStore writes nodes to."""
+        return f'public."{self.data_table_name}"'
+
+    def verify_search_index(self, mode: Optional[str] = None) -> None:
+        """
+        Checks that the column and index a search mode reads were built by the pipeline.
+
+        Args:
+            mode (Optional[str]): Search mode to check, defaults to VECTOR_SEARCH_MODE.
+
+        Raises:
+            RuntimeError: If the column or the index is missing from the active table
+        """
+        mode = mode or self.search_mode
+        if mode == "full":
+            return
+        # Names as created by rag_data_pipeline/database/db.py
+        if mode == "matryoshka":
+            if self.matryoshka_dim <= 0:
+                raise RuntimeError("The matryoshka mode needs MATRYOSHKA_DIM, the dimension the pipeline built.")
+            column = f"embedding_{self.matryoshka_dim}"
+            index = f"{self.data_table_name}_{column}_idx"
+            setting = f"MATRYOSHKA_DIM={self.matryoshka_dim}"
+        else:
+            column = "embedding"
+            index = f"{self.data_table_name}_embedding_{mode}_idx"
+            setting = f"VECTOR_INDEX_QUANTIZATION={mode}"
+
+        with self.get_engine().connect() as connection:
+            has_column = connection.execute(
+                text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_schema = 'public' AND table_name = :table AND column_name = :column"
+                ),
+                {"table": self.data_table_name, "column": column},
+            ).first() is not None
+            has_index = connection.execute(
+                text("SELECT to_regclass(:index)"), {"index": f'public."{index}"'}
+            ).scalar() is not None
+
+        if not (has_column and has_index):
+            missing = f"column {column}" if not has_column else f"index {index}"
+            raise RuntimeError(
+                f"VECTOR_SEARCH_MODE={mode} needs the {missing} on {self.data_table_name}; "
+                f"run rag_data_pipeline with {setting}."
+            )
+        logger.info(f"Search mode {mode}: found {column} and {index} on {self.data_table_name}.")
+
+    def get_corpus_version(self) -> int:
+        """
+        Returns the corpus version stamp for this table, or 0 if nothing has been ingested yet.
+        """
+        try:
+            with self.get_engine().connect() as connection:
+                version = connection.execute(
+                    text(f"SELECT version FROM {CORPUS_VERSION_TABLE} WHERE table_name = :table_name"),
+                    {"table_name": self.table_name},
+                ).scalar()
+        except Exception as e:
+            logger.warning(f"Could not read corpus version: {e}")
+            return 0
+        return version or 0
+
     def query_vector_store(
         self,
         query_text: str,
         embed_model: BaseEmbedding,
         similarity_top_k: int = 5,
+        filters: Optional[MetadataFilters] = None,
     ) -> List[NodeWithScore]:
         """
         Queries the vector store to find the most similar text chunks for a given query.
@@ -68,6 +239,7 @@ class DatabaseConnection:
             query_text (str): The text query to search for.
             embed_model (BaseEmbedding): The embedding model to use for vectorizing the query text.
             similarity_top_k (int): The number of top similar results to retrieve.
+            filters (Optional[MetadataFilters]): Metadata filters applied to the search.
 
         Returns:
             List[NodeWithScore]: A list of nodes with similarity scores.
@@ -77,29 +249,30 @@ class DatabaseConnection:
             return []
 
         try:
-            # Initialize vector store if not already done
-            if self.vector_store is None:
-                logger.info("Initializing vector store...")
-                self.vector_store = self.get_vector_store()
-
             logger.info(f"Generating embedding for query: '{query_text[:50]}...'")
             query_embedding = embed_model.get_query_embedding(query_text)
 
-            query = VectorStoreQuery(
-                query_embedding=query_embedding,
-                similarity_top_k=similarity_top_k,
-            )
-
-            logger.info(f"Querying vector store for {similarity_top_k} most similar chunks.")
-            result = self.vector_store.query(query)
+            cache_key = None
+            if self.cache is not None:
+                # Versions count per table, so the table is part of the version a switch is detected by
+                self.cache.sync_version(lambda: (self.table_name, self.get_corpus_version()))
+                mode = self.search_mode if self.replica is None else f"{self.search_mode}|replica:{self.replica.version}"
+                mode = f"{mode}|table:{self.table_name}"
+                cache_key = self.cache.make_key(query_embedding, similarity_top_k, filters, mode)
+                nodes_with_scores = self.cache.get(cache_key)
+                if nodes_with_scores is not None:
+                    logger.info(f"Retrieval cache hit: {len(nodes_with_scores)} chunks.")
+                    return nodes_with_scores
 
-            nodes_with_scores = []
-            if result.nodes and result.similarities:
-                for node, similarity in zip(result.nodes, result.similarities):
-                    if hasattr(node, 'metadata') and node.metadata:
-                        logger.debug(f"Node metadata: {node.metadata}")
+            # Postgres stays the source of truth; the replica only answers when it has a snapshot.
+            nodes_with_scores = None
+            if self.replica is not None and filters is None:
+                nodes_with_scores = self.replica.search(query_embedding, similarity_top_k, table=self.data_table_name)
+            if nodes_with_scores is None:
+                nodes_with_scores = self.search_by_embedding(query_embedding, similarity_top_k, filters=filters)
 
-                    nodes_with_scores.append(NodeWithScore(node=node, score=similarity))
+            if cache_key is not None:
+                self.cache.put(cache_key, nodes_with_scores)
 
             logger.info(f"Found {len(nodes_with_scores)} related text chunks with metadata.")
             return nodes_with_scores
@@ -107,3 +280,107 @@ class DatabaseConnection:
         except Exception as e:
             logger.error(f"An error occurred during vector store query: {e}")
             raise
+
+    def search_by_embedding(
+        self,
+        query_embedding: List[float],
+        similarity_top_k: int = 5,
+        mode: Optional[str] = None,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[NodeWithScore]:
+        """
+        Runs the similarity search for an already computed query embedding.
+
+        Args:
+            query_embedding (List[float]): Full-precision query embedding.
+            similarity_top_k (int): The number of top similar results to retrieve.
+            mode (Optional[str]): Search mode override, defaults to VECTOR_SEARCH_MODE.
+            filters (Optional[MetadataFilters]): Metadata filters, only supported by the full mode.
+
+        Returns:
+            List[NodeWithScore]: A list of nodes with similarity scores.
+        """
+        mode = mode or self.search_mode
+        if mode == "full" or filters is not None:
+            return self._full_precision_search(query_embedding, similarity_top_k, filters)
+        return self._two_stage_search(query_embedding, similarity_top_k, mode)
+
+    def _full_precision_search(
+        self,
+        query_embedding: List[float],
+        similarity_top_k: int,
+        filters: Optional[MetadataFilters] = None,
+    ) -> List[NodeWithScore]:
+        # Initialize vector store if not already done
+        if self.vector_store is None:
+            self.vector_store = self._shared_vector_store()
+
+        query = VectorStoreQuery(
+            query_embedding=query_embedding,
+            similarity_top_k=similarity_top_k,
+            filters=filters,
+        )
+
+        logger.info(f"Querying vector store for {similarity_top_k} most similar chunks.")
+        result = self.vector_store.query(query)
+
+        nodes_with_scores = []
+        if result.nodes and result.similarities:
+            for node, similarity in zip(result.nodes, result.similarities):
+                if hasattr(node, 'metadata') and node.metadata:
+                    logger.debug(f"Node metadata: {node.metadata}")
+
+                nodes_with_scores.append(NodeWithScore(node=node, score=similarity))
+
+        return nodes_with_scores
+
+    def _two_stage_search(self, query_embedding: List[float], similarity_top_k: int, mode: str) -> List[NodeWithScore]:
+        """
+        Over-fetches candidates through a compressed HNSW index (quantized or
+        reduced-dimension) and rescores them with exact cosine distance on the
+        stored float32 embeddings.
+        """
+        if mode not in FIRST_PASS_ORDER_BY:
+            raise ValueError(f"Unsupported search mode '{mode}'. Expected one of {SEARCH_MODES}.")
+
+        candidates = similarity_top_k * max(self.rescore_overfetch, 1)
+        order_by = FIRST_PASS_ORDER_BY[mode].format(dim=self.embed_dim, short_dim=self.matryoshka_dim)
+        params = {
+            "query": str(list(query_embedding)),
+            "candidates": candidates,
+            "top_k": similarity_top_k,
+        }
+        if mode == "matryoshka":
+            params["short_query"] = str(truncate_embedding(query_embedding, self.matryoshka_dim))
+        statement = text(
+            f"""
+            WITH candidates AS (
+                SELECT node_id, text, metadata_, embedding
+                FROM {self.data_table}
+                ORDER BY {order_by}
+                LIMIT :candidates
+            )
+            SELECT node_id, text, metadata_, embedding <=> CAST(:query AS vector({self.embed_dim})) AS distance
+            FROM candidates
+            ORDER BY distance
+            LIMIT :top_k
+            """
+        )
+
+        logger.info(f"Querying {mode} index for {candidates} candidates, rescoring to top {similarity_top_k}.")
+        with self.get_engine().begin() as connection:
+            # HNSW never returns more than ef_search rows, so widen it to cover the over-fetch.
+            connection.execute(text(f"SET LOCAL hnsw.ef_search = {max(40, candidates)}"))
+            rows = connection.execute(statement, params).fetchall()
+
+        return [NodeWithScore(node=self._row_to_node(row), score=1 - row.distance) for row in rows]
+
+    @staticmethod
+    def _row_to_node(row) -> TextNode:
+        """Rebuilds a node from a raw table row the same way PGVectorStore does."""
+        try:
+            node = metadata_dict_to_node(row.metadata_)
+            node.set_content(str(row.text))
+        except Exception:
+            node = TextNode(id_=row.node_id, text=row.text, metadata=row.metadata_)
+        return node
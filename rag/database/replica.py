@@ -0,0 +1,159 @@
+import json
+import logging
+import mmap
+import os
+import threading
+import time
+from typing import List, Optional
+
+import numpy as np
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+from llama_index.core.schema import NodeWithScore, TextNode
+
+from config.config import get_config
+
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot:
+    """One loaded, read-only snapshot version."""
+
+    def __init__(self, path: str, version: str):
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+
+        self.version = version
+        self.count = manifest["count"]
+        self.dim = manifest["dim"]
+        self.table = manifest.get("table")
+        # Memory-mapped read-only: every uvicorn worker maps the same file, so the
+        # pages live once in the OS page cache instead of once per process.
+        self.embeddings = np.memmap(
+            os.path.join(path, "embeddings.f32"), dtype=np.float32, mode="r", shape=(max(self.count, 1), self.dim)
+        )[: self.count]
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+
+        self._records_file = open(os.path.join(path, "records.bin"), "rb")
+        self.records = (
+            mmap.mmap(self._records_file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else b""
+        )
+
+    def node(self, index: int) -> TextNode:
+        record = json.loads(self.records[int(self.offsets[index]):int(self.offsets[index + 1])])
+        try:
+            node = metadata_dict_to_node(record["metadata"])
+            node.set_content(str(record["text"]))
+        except Exception:
+            node = TextNode(id_=record["node_id"], text=record["text"], metadata=record["metadata"])
+        return node
+
+
+class VectorReplica:
+    """
+    In-process, read-only replica of the vector table built from the snapshots
+    that rag_data_pipeline/database/snapshot.py publishes.
+
+    Searches are exact cosine similarity computed as one matrix-vector product
+    over the memory-mapped embeddings. The replica checks the snapshot's CURRENT
+    pointer at most every `check_interval` seconds and swaps in a new version
+    atomically; in-flight searches keep using the snapshot they started with.
+    """
+
+    def __init__(self, snapshot_dir: str, check_interval: float = 30.0):
+        self.snapshot_dir = snapshot_dir
+        self.check_interval = check_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[str]:
+        """Version of the snapshot currently loaded, if any."""
+        snapshot = self._snapshot
+        return snapshot.version if snapshot is not None else None
+
+    def _current_version(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.snapshot_dir, "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if self._snapshot is not None and now - self._last_check < self.check_interval:
+            return
+
+        with self._lock:
+            if self._snapshot is not None and now - self._last_check < self.check_interval:
+                return
+            self._last_check = now
+
+            version = self._current_version()
+            if version is None or (self._snapshot is not None and self._snapshot.version == version):
+                return
+
+            logger.info(f"Loading vector snapshot {version} from {self.snapshot_dir}")
+            self._snapshot = _Snapshot(os.path.join(self.snapshot_dir, version), version)
+
+    def search(
+        self, query_embedding: List[float], similarity_top_k: int = 5, table: Optional[str] = None
+    ) -> Optional[List[NodeWithScore]]:
+        """
+        Searches the local snapshot.
+
+        Args:
+            query_embedding (List[float]): Full-precision query embedding.
+            similarity_top_k (int): The number of top similar results to retrieve.
+            table (Optional[str]): Data table the caller reads; a snapshot of another table is not used.
+
+        Returns:
+            Optional[List[NodeWithScore]]: Results, or None when no usable snapshot is
+            available and the caller should fall back to Postgres.
+        """
+        try:
+            self._maybe_reload()
+        except Exception as e:
+            logger.warning(f"Could not load vector snapshot, falling back to Postgres: {e}")
+            return None
+
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.count == 0:
+            return None
+        if table is not None and snapshot.table is not None and snapshot.table != table:
+            # Right after a blue/green switch, until the snapshot of the new table is published
+            logger.info(f"Snapshot {snapshot.version} is of {snapshot.table}, not {table}; using Postgres.")
+            return None
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        if query.shape[0] != snapshot.dim:
+            logger.warning(f"Query dimension {query.shape[0]} does not match snapshot dimension {snapshot.dim}.")
+            return None
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+
+        scores = snapshot.embeddings @ query
+        k = min(similarity_top_k, snapshot.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [NodeWithScore(node=snapshot.node(i), score=float(scores[i])) for i in top]
+
+
+_replica: Optional[VectorReplica] = None
+_replica_lock = threading.Lock()
+
+
+def get_replica() -> Optional[VectorReplica]:
+    """Returns the process-wide replica, or None when REPLICA_SNAPSHOT_DIR is not set."""
+    global _replica
+    config = get_config()
+    if not config.replica_snapshot_dir:
+        return None
+    if _replica is None:
+        with _replica_lock:
+            if _replica is None:
+                _replica = VectorReplica(config.replica_snapshot_dir, config.replica_check_interval)
+    return _replica
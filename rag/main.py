@@ -6,6 +6,7 @@ from fastapi.responses import RedirectResponse, JSONResponse
 from pydantic import BaseModel
 from config.config import get_config
 from src.agent.agent import run_agent_async
+from database.db import DatabaseConnection
 import os
 from google_auth_oauthlib.flow import Flow
 from google.auth.transport import requests as google_requests
@@ -113,6 +114,9 @@ async def startup_event():
     print(f"Redirect URI: {REDIRECT_URI}")
     print(f"Frontend URI: {config.redirect_frontend_uri}")
     print("API Documentation available at /docs")
+    # Fail now rather than on the first query when the search mode's column or index was not built
+    DatabaseConnection().verify_search_index()
+    print(f"Vector search mode: {config.vector_search_mode}")
     print("Application started successfully!")
 
 # --- API Endpoints ---
@@ -8,8 +8,26 @@ import os
 # Load configuration
 config = get_config()
 
-# Regex pattern to extract YouTube timestamps like [123.45s]
-timestamp_pattern = r"\[(\d+\.?\d*)s\]"
+# Regex pattern to extract YouTube timestamps like [123.45s]. Only used for nodes
+# ingested before the pipeline started storing citation fields.
+timestamp_pattern = re.compile(r"\[(\d+\.?\d*)s\]")
+
+CHUNK_TEMPLATE = (
+    "--- Chunk {index} ---\n"
+    "Title: {title}\n"
+    "Source: {source}\n"
+    "URL: {url}\n"
+    "Content: {content}\n\n"
+)
+
+
+def _legacy_citation(metadata: dict, content: str) -> dict:
+    """Builds citation fields at query time for nodes without stored citation metadata."""
+    url = metadata.get('url', 'N/A')
+    youtube_time_stamps = timestamp_pattern.findall(content)
+    if metadata.get('source') == "youtube_transcript" and youtube_time_stamps:
+        url = f"{url}&t={int(float(youtube_time_stamps[0]))}s"
+    return {'citation_url': url, 'citation_title': metadata.get('title', 'N/A')}
 
 
 def get_chunks(query_text: str) -> str:
@@ -25,7 +43,7 @@ def get_chunks(query_text: str) -> str:
     try:
         # Initialize database connection and embedding model
         db_connection = DatabaseConnection()
-        embed_model =  OpenAIEmbedding(model="text-embedding-3-small", embed_dim=1536)
+        embed_model = OpenAIEmbedding(model=db_connection.embed_model, embed_dim=db_connection.embed_dim)
 
         # Query vector database
         results = db_connection.query_vector_store(
@@ -37,26 +55,29 @@ def get_chunks(query_text: str) -> str:
         if not results:
             return f"No relevant text chunks found for the query: '{query_text}'"
 
+        # Near-duplicates ingested with DEDUP_MODE=link point at their canonical chunk; show each text once
+        unique_results, seen_chunks = [], set()
+        for res in results:
+            key = res.node.metadata.get('duplicate_of') or res.node.node_id
+            if key not in seen_chunks:
+                seen_chunks.add(key)
+                unique_results.append(res)
+        results = unique_results
+
         formatted_output = f"Found {len(results)} relevant chunks for '{query_text}':\n\n"
 
         for i, res in enumerate(results):
-            # Extract content and metadata
-            content = res.node.get_content().strip().replace('\n', ' ')
-            source = res.node.metadata.get('source', 'N/A')
-            title = res.node.metadata.get('title', 'N/A')
-            url = res.node.metadata.get('url', 'N/A')
-
-            # Extract timestamps if present
-            youtube_time_stamps = re.findall(timestamp_pattern, content)
-            if source == "youtube_transcript" and youtube_time_stamps:
-                url = f"{url}&t={int(float(youtube_time_stamps[0]))}s"
-
-            # Build formatted chunk
-            formatted_output += f"--- Chunk {i + 1} ---\n"
-            formatted_output += f"Title: {title}\n"
-            formatted_output += f"Source: {source}\n"
-            formatted_output += f"URL: {url}\n"
-            formatted_output += f"Content: {content}\n\n"
+            metadata = res.node.metadata
+            content = res.node.get_content().strip()
+            citation = metadata if 'citation_url' in metadata else _legacy_citation(metadata, content)
+
+            formatted_output += CHUNK_TEMPLATE.format(
+                index=i + 1,
+                title=citation.get('citation_title', 'N/A'),
+                source=metadata.get('source', 'N/A'),
+                url=citation['citation_url'],
+                content=content,
+            )
 
         
         return formatted_output.strip()
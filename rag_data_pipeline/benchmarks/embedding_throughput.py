@@ -0,0 +1,187 @@
+"""
+Throughput benchmark for the parallel ingestion mode in src/ingestion/throughput.py.
+
+Starts a local fake OpenAI embeddings server (fixed latency per request plus a
+per-input cost, deterministic vectors), then ingests the same synthetic
+Markdown documents twice into an in-memory vector store with a simulated write
+latency:
+    sequential  IngestionPipeline.run, then one vector store write
+    parallel    ThroughputIngestor with ParallelTransformation and ConcurrentEmbedding
+and reports docs/sec, nodes/sec and tokens/sec for both.
+
+No OpenAI key or database is needed.
+
+Usage (from the rag_data_pipeline/ directory):
+    python -m benchmarks.embedding_throughput --documents 200 --latency-ms 150 --concurrency 8
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from llama_index.core import Document
+from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.node_parser import MarkdownNodeParser
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.embeddings.openai import OpenAIEmbedding
+
+from src.ingestion.throughput import ConcurrentEmbedding, ParallelTransformation, ThroughputIngestor
+from src.youtube_transcripts.llm_limiter import count_tokens
+
+
+WORDS = (
+    "retrieval embedding vector index chunk token latency throughput database query document pipeline "
+    "transcript video section heading markdown scraper crawler cache batch worker process thread"
+).split()
+
+
+def fake_embedding_server(latency: float, per_input: float, dimensions: int) -> ThreadingHTTPServer:
+    """Serves POST /v1/embeddings like the OpenAI API, sleeping to simulate model time."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = request["input"] if isinstance(request["input"], list) else [request["input"]]
+            time.sleep(latency + per_input * len(inputs))
+
+            data = []
+            for index, text in enumerate(inputs):
+                seed = int.from_bytes(hashlib.sha256(str(text).encode("utf-8")).digest()[:8], "big")
+                rng = random.Random(seed)
+                vector = [rng.uniform(-1, 1) for _ in range(dimensions)]
+                if request.get("encoding_format") == "base64":
+                    embedding = base64.b64encode(struct.pack(f"<{dimensions}f", *vector)).decode("ascii")
+                else:
+                    embedding = vector
+                data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+            tokens = sum(len(str(text).split()) for text in inputs)
+            body = json.dumps({
+                "object": "list",
+                "data": data,
+                "model": request.get("model", "fake"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class SlowVectorStore(SimpleVectorStore):
+    """In-memory vector store whose writes take a fixed time per node, standing in for PGVectorStore."""
+
+    def __init__(self, seconds_per_node: float):
+        super().__init__()
+        self._seconds_per_node = seconds_per_node
+
+    def add(self, nodes: List[BaseNode], **kwargs: Any) -> List[str]:
+        time.sleep(self._seconds_per_node * len(nodes))
+        return super().add(nodes, **kwargs)
+
+
+def synthetic_documents(count: int, sections: int, words: int) -> List[Document]:
+    rng = random.Random(0)
+    documents = []
+    for i in range(count):
+        body = "\n\n".join(
+            f"## Section {s}\n\n" + " ".join(rng.choice(WORDS) for _ in range(words)) for s in range(sections)
+        )
+        documents.append(Document(text=f"# Document {i}\n\n{body}", id_=f"doc-{i}"))
+    return documents
+
+
+def report(name: str, documents: int, nodes: List[BaseNode], seconds: float) -> Dict[str, float]:
+    tokens = sum(count_tokens(node.get_content(metadata_mode=MetadataMode.EMBED)) for node in nodes)
+    row = {
+        "seconds": seconds,
+        "docs_per_sec": documents / seconds,
+        "nodes_per_sec": len(nodes) / seconds,
+        "tokens_per_sec": tokens / seconds,
+    }
+    print(
+        f"{name:<11} {seconds:>8.2f}s {row['docs_per_sec']:>10.2f} docs/s {row['nodes_per_sec']:>10.1f} nodes/s "
+        f"{row['tokens_per_sec']:>12,.0f} tokens/s"
+    )
+    return row
+
+
+def run_benchmark(args) -> Dict[str, Dict[str, float]]:
+    server = fake_embedding_server(args.latency_ms / 1000, args.per_input_ms / 1000, args.dimensions)
+    api_base = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    def embed_model():
+        return OpenAIEmbedding(
+            model="text-embedding-3-small", api_key="fake", api_base=api_base,
+            embed_batch_size=args.batch_size, max_retries=0,
+        )
+
+    def node_parser():
+        return MarkdownNodeParser(chunk_size=512, chunk_overlap=100, include_metadata=True, include_prev_next_rel=True)
+
+    results = {}
+    try:
+        documents = synthetic_documents(args.documents, args.sections, args.words)
+        started = time.perf_counter()
+        store = SlowVectorStore(args.write_ms_per_node / 1000)
+        nodes = IngestionPipeline(transformations=[node_parser(), embed_model()]).run(documents=documents)
+        store.add(nodes)
+        results["sequential"] = report("sequential", len(documents), nodes, time.perf_counter() - started)
+
+        documents = synthetic_documents(args.documents, args.sections, args.words)
+        embedder = ConcurrentEmbedding(
+            embed_model(), batch_size=args.batch_size, max_concurrency=args.concurrency,
+            tokens_per_minute=args.tokens_per_minute,
+        )
+        ingestor = ThroughputIngestor(
+            IngestionPipeline(transformations=[ParallelTransformation(node_parser(), workers=args.parse_workers)]),
+            embedder,
+            SlowVectorStore(args.write_ms_per_node / 1000),
+            embedder,
+        )
+        started = time.perf_counter()
+        nodes = ingestor.run(documents)
+        results["parallel"] = report("parallel", len(documents), nodes, time.perf_counter() - started)
+    finally:
+        server.shutdown()
+
+    print(f"Speedup: {results['sequential']['seconds'] / results['parallel']['seconds']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark sequential vs parallel ingestion against a fake embedding server.")
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=6)
+    parser.add_argument("--words", type=int, default=150)
+    parser.add_argument("--latency-ms", type=float, default=150, help="Fixed latency of each embedding request")
+    parser.add_argument("--per-input-ms", type=float, default=1, help="Extra latency per text in a request")
+    parser.add_argument("--write-ms-per-node", type=float, default=0.5, help="Simulated vector store write time")
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tokens-per-minute", type=int, default=10_000_000)
+    parser.add_argument("--parse-workers", type=int, default=4)
+    parser.add_argument("--json", dest="json_path", help="Optional path to write the report as JSON")
+    args = parser.parse_args()
+
+    results = run_benchmark(args)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(results, f, indent=2)
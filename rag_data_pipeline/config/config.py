@@ -1,5 +1,6 @@
 import os
 from typing import Optional
+import atexit
 import tempfile, json
 from dotenv import load_dotenv
 
@@ -31,6 +32,143 @@ class Config:
 
             self._google_drive_folder_id = self._get_required_env('FOLDER_ID')
 
+            # Optional quantized first-pass index ('halfvec' or 'binary')
+            self._vector_index_quantization = self.get_env_var('VECTOR_INDEX_QUANTIZATION', '').lower()
+            # Optional reduced-dimension first-pass index (e.g. 256 or 512, 0 disables)
+            self._matryoshka_dim = int(self.get_env_var('MATRYOSHKA_DIM', '0'))
+            # Optional directory to publish read-replica snapshots to (empty disables)
+            self._snapshot_dir = self.get_env_var('SNAPSHOT_DIR', '')
+            # Persistent transformation/embedding cache: SQLAlchemy URL, 'postgres' to reuse the DB, empty disables
+            self._ingestion_cache_url = self.get_env_var('INGESTION_CACHE_URL', 'sqlite:///.cache/ingestion_cache.db')
+            self._ingestion_cache_max_mb = int(self.get_env_var('INGESTION_CACHE_MAX_MB', '1024'))
+
+            # Ingestion mode: 'streaming' (bounded batches, checkpointed, resumable) or 'batch' (all at once)
+            self._ingestion_mode = self.get_env_var('INGESTION_MODE', 'streaming').lower()
+            self._ingestion_batch_documents = int(self.get_env_var('INGESTION_BATCH_DOCUMENTS', '64'))
+            self._ingestion_resume = self.get_env_var('INGESTION_RESUME', 'true').lower() == 'true'
+
+            # High-throughput mode: parse in worker processes, embed concurrently, overlap DB writes with embedding
+            self._ingestion_parallel = self.get_env_var('INGESTION_PARALLEL', 'false').lower() == 'true'
+            # Node parser processes (empty: one per CPU)
+            parse_workers = self.get_env_var('INGESTION_PARSE_WORKERS', '')
+            self._ingestion_parse_workers = int(parse_workers) if parse_workers else (os.cpu_count() or 1)
+            self._embed_batch_size = int(self.get_env_var('EMBED_BATCH_SIZE', '100'))
+            self._embed_concurrency = int(self.get_env_var('EMBED_CONCURRENCY', '8'))
+            self._embed_tokens_per_minute = int(self.get_env_var('EMBED_TOKENS_PER_MINUTE', '1000000'))
+
+            # Drive file conversion: worker processes (empty: one per CPU), per-file limits, result cache
+            convert_processes = self.get_env_var('DRIVE_CONVERT_PROCESSES', '')
+            self._drive_convert_processes = int(convert_processes) if convert_processes else None
+            self._drive_convert_timeout_seconds = int(self.get_env_var('DRIVE_CONVERT_TIMEOUT_SECONDS', '120'))
+            self._drive_convert_memory_mb = int(self.get_env_var('DRIVE_CONVERT_MEMORY_MB', '2048'))
+            self._drive_conversion_cache_dir = self.get_env_var('DRIVE_CONVERSION_CACHE_DIR', '.cache/drive_conversions')
+            # PDFs are split into Documents of whole pages of about this many characters
+            self._drive_pdf_part_chars = int(self.get_env_var('DRIVE_PDF_PART_CHARS', '20000'))
+
+            # Incremental Drive sync: downloaded files, parallel downloads, and a local folder standing in for Drive
+            self._drive_download_dir = self.get_env_var('DRIVE_DOWNLOAD_DIR', '.cache/drive_files')
+            self._drive_download_workers = int(self.get_env_var('DRIVE_DOWNLOAD_WORKERS', '8'))
+            self._drive_fake_dir = self.get_env_var('DRIVE_FAKE_DIR', '')
+
+            # Per-stage timings, tokens and estimated cost of each run, saved as JSON here (empty disables)
+            self._run_report_dir = self.get_env_var('RUN_REPORT_DIR', '.cache/run_reports')
+
+            # Near-duplicate chunks: 'off', 'drop' (not embedded) or 'link' (kept with duplicate_of), at this MinHash similarity
+            self._dedup_mode = self.get_env_var('DEDUP_MODE', 'off').lower()
+            self._dedup_threshold = float(self.get_env_var('DEDUP_THRESHOLD', '0.9'))
+
+            # Document titles: 'source' (source metadata and headings, LLM only for untitled documents) or 'llm'
+            self._title_extractor = self.get_env_var('TITLE_EXTRACTOR', 'source').lower()
+            self._title_llm_batch_size = int(self.get_env_var('TITLE_LLM_BATCH_SIZE', '8'))
+
+            # Settings of the next blue/green table build (reindex.py); existing tables keep the settings they were built with
+            self._embed_model = self.get_env_var('EMBED_MODEL', 'text-embedding-3-small')
+            self._embed_dim = int(self.get_env_var('EMBED_DIM', '1536'))
+            self._chunk_size = int(self.get_env_var('CHUNK_SIZE', '512'))
+            self._chunk_overlap = int(self.get_env_var('CHUNK_OVERLAP', '100'))
+            self._hnsw_m = int(self.get_env_var('HNSW_M', '16'))
+            self._hnsw_ef_construction = int(self.get_env_var('HNSW_EF_CONSTRUCTION', '64'))
+            # A build is activated only if it holds this share of the live table's sources and finds
+            # the source of this share of chunks sampled from the live table in its top k
+            self._blue_green_min_source_ratio = float(self.get_env_var('BLUE_GREEN_MIN_SOURCE_RATIO', '0.95'))
+            self._blue_green_min_recall = float(self.get_env_var('BLUE_GREEN_MIN_RECALL', '0.9'))
+            self._blue_green_sample_size = int(self.get_env_var('BLUE_GREEN_SAMPLE_SIZE', '50'))
+            self._blue_green_top_k = int(self.get_env_var('BLUE_GREEN_TOP_K', '10'))
+            # How often the ingestion service checks whether the alias was moved to another table
+            self._table_alias_refresh_seconds = float(self.get_env_var('TABLE_ALIAS_REFRESH_SECONDS', '30'))
+
+            # Vector writes: 'insert' (PGVectorStore.add) or 'bulk' (binary COPY into staging, one index build, swap)
+            self._vector_load_mode = self.get_env_var('VECTOR_LOAD_MODE', 'insert').lower()
+            # Staged rows relative to live rows from which the bulk load rebuilds instead of merging
+            self._bulk_rebuild_ratio = float(self.get_env_var('BULK_REBUILD_RATIO', '0.5'))
+            self._bulk_maintenance_work_mem = self.get_env_var('BULK_MAINTENANCE_WORK_MEM', '2GB')
+            self._bulk_parallel_workers = int(self.get_env_var('BULK_PARALLEL_WORKERS', '4'))
+
+            # Web scraper concurrency and politeness limits
+            self._scraper_max_workers = int(self.get_env_var('SCRAPER_MAX_WORKERS', '16'))
+            self._scraper_max_per_host = int(self.get_env_var('SCRAPER_MAX_PER_HOST', '4'))
+            self._scraper_host_delay = float(self.get_env_var('SCRAPER_HOST_DELAY_SECONDS', '0.25'))
+            # Processes for HTML to Markdown conversion (empty: one per CPU, 0: convert on fetch threads)
+            convert_processes = self.get_env_var('SCRAPER_CONVERT_PROCESSES', '')
+            self._scraper_convert_processes = int(convert_processes) if convert_processes else None
+            # Blocks repeated on this many pages of a site are stripped before conversion (empty path disables)
+            self._boilerplate_path = self.get_env_var('BOILERPLATE_PATH', '.cache/boilerplate.db')
+            self._boilerplate_min_pages = int(self.get_env_var('BOILERPLATE_MIN_PAGES', '3'))
+
+            # On-disk conditional-GET cache for scraped pages (empty disables); offline replays it without network
+            self._http_cache_dir = self.get_env_var('HTTP_CACHE_DIR', '.cache/http')
+            self._http_cache_offline = self.get_env_var('HTTP_CACHE_OFFLINE', 'false').lower() == 'true'
+            self._http_cache_max_mb = int(self.get_env_var('HTTP_CACHE_MAX_MB', '1024'))
+
+            # YouTube: concurrent LLM formatting calls, tokens-per-minute budget and concurrent transcript fetches
+            self._youtube_llm_concurrency = int(self.get_env_var('YOUTUBE_LLM_CONCURRENCY', '8'))
+            self._youtube_llm_tokens_per_minute = int(self.get_env_var('YOUTUBE_LLM_TOKENS_PER_MINUTE', '200000'))
+            self._youtube_fetch_concurrency = int(self.get_env_var('YOUTUBE_FETCH_CONCURRENCY', '4'))
+            # Transcript to Markdown formatter: 'llm' (gpt-4o-mini) or 'rules' (local, no LLM calls)
+            self._transcript_formatter = self.get_env_var('TRANSCRIPT_FORMATTER', 'llm').lower()
+            # Target tokens per transcript segment (0 falls back to fixed 10 minute windows)
+            self._youtube_segment_tokens = int(self.get_env_var('YOUTUBE_SEGMENT_TOKENS', '1500'))
+
+            # Crawler: link hops from the seed URLs, page budget, sitemap seeding and resumable frontier
+            self._crawl_max_depth = int(self.get_env_var('CRAWL_MAX_DEPTH', '2'))
+            self._crawl_max_pages = int(self.get_env_var('CRAWL_MAX_PAGES', '200'))
+            self._crawl_use_sitemaps = self.get_env_var('CRAWL_USE_SITEMAPS', 'true').lower() == 'true'
+            self._crawl_frontier_path = self.get_env_var('CRAWL_FRONTIER_PATH', '.cache/crawl_frontier.db')
+            self._crawl_resume = self.get_env_var('CRAWL_RESUME', 'false').lower() == 'true'
+
+            # Sources: YouTube URL list (Markdown with watch links) and web crawl seed URLs (comma-separated)
+            self._youtube_url_list = self.get_env_var(
+                'YOUTUBE_URL_LIST', 'https://raw.githubusercontent.com/RMCV-Rajapaksha/Agentic-RAG-AI/main/YouTubeURL.md'
+            )
+            self._web_seed_urls = [url.strip() for url in self.get_env_var('WEB_SEED_URLS', ','.join([
+                'https://wso2.ai/',
+                'https://wso2.com/api-management/ai/',
+                'https://wso2.com/integration/ai/',
+                'https://wso2.com/identity-and-access-management/ai/',
+                'https://wso2.com/internal-developer-platform/ai/',
+            ])).split(',') if url.strip()]
+
+            # Ingestion service: worker threads per job type (type=count,...), retries and leases
+            self._job_concurrency = {
+                job_type.strip(): int(count)
+                for job_type, count in (
+                    item.split('=') for item in self.get_env_var(
+                        'JOB_CONCURRENCY', 'youtube_video=2,web_page=4,youtube_list=1,web_crawl=1,drive_folder=1'
+                    ).split(',') if item.strip()
+                )
+            }
+            self._job_max_attempts = int(self.get_env_var('JOB_MAX_ATTEMPTS', '5'))
+            self._job_retry_base_seconds = float(self.get_env_var('JOB_RETRY_BASE_SECONDS', '30'))
+            self._job_retry_max_seconds = float(self.get_env_var('JOB_RETRY_MAX_SECONDS', '3600'))
+            self._job_lease_seconds = float(self.get_env_var('JOB_LEASE_SECONDS', '300'))
+            self._job_poll_seconds = float(self.get_env_var('JOB_POLL_SECONDS', '2'))
+            # Scheduled re-syncs in minutes (0 disables one)
+            self._youtube_resync_minutes = float(self.get_env_var('YOUTUBE_RESYNC_MINUTES', '60'))
+            self._web_resync_minutes = float(self.get_env_var('WEB_RESYNC_MINUTES', '1440'))
+            self._drive_resync_minutes = float(self.get_env_var('DRIVE_RESYNC_MINUTES', '15'))
+            self._job_api_host = self.get_env_var('JOB_API_HOST', '127.0.0.1')
+            self._job_api_port = int(self.get_env_var('JOB_API_PORT', '8090'))
+
             # Google service account credentials from env
             self._google_credentials = {
                 "type": os.getenv("GOOGLE_TYPE"),
@@ -45,6 +183,7 @@ class Config:
                 "client_x509_cert_url": os.getenv("GOOGLE_CLIENT_X509_CERT_URL"),
                 "universe_domain": os.getenv("GOOGLE_UNIVERSE_DOMAIN"),
             }
+            self._google_credentials_path = None
 
             Config._initialized = True
 
@@ -85,19 +224,314 @@ class Config:
     def google_drive_folder_id(self) -> str:
         return self._google_drive_folder_id
 
+    @property
+    def vector_index_quantization(self) -> str:
+        return self._vector_index_quantization
+
+    @property
+    def matryoshka_dim(self) -> int:
+        return self._matryoshka_dim
+
+    @property
+    def snapshot_dir(self) -> str:
+        return self._snapshot_dir
+
+    @property
+    def ingestion_cache_url(self) -> str:
+        return self._ingestion_cache_url
+
+    @property
+    def ingestion_cache_max_mb(self) -> int:
+        return self._ingestion_cache_max_mb
+
+    @property
+    def ingestion_mode(self) -> str:
+        return self._ingestion_mode
+
+    @property
+    def ingestion_batch_documents(self) -> int:
+        return self._ingestion_batch_documents
+
+    @property
+    def ingestion_resume(self) -> bool:
+        return self._ingestion_resume
+
+    @property
+    def ingestion_parallel(self) -> bool:
+        return self._ingestion_parallel
+
+    @property
+    def ingestion_parse_workers(self) -> int:
+        return self._ingestion_parse_workers
+
+    @property
+    def embed_batch_size(self) -> int:
+        return self._embed_batch_size
+
+    @property
+    def embed_concurrency(self) -> int:
+        return self._embed_concurrency
+
+    @property
+    def embed_tokens_per_minute(self) -> int:
+        return self._embed_tokens_per_minute
+
+    @property
+    def drive_convert_processes(self) -> Optional[int]:
+        return self._drive_convert_processes
+
+    @property
+    def drive_convert_timeout_seconds(self) -> int:
+        return self._drive_convert_timeout_seconds
+
+    @property
+    def drive_convert_memory_mb(self) -> int:
+        return self._drive_convert_memory_mb
+
+    @property
+    def drive_conversion_cache_dir(self) -> str:
+        return self._drive_conversion_cache_dir
+
+    @property
+    def drive_pdf_part_chars(self) -> int:
+        return self._drive_pdf_part_chars
+
+    @property
+    def run_report_dir(self) -> str:
+        return self._run_report_dir
+
+    @property
+    def dedup_mode(self) -> str:
+        return self._dedup_mode
+
+    @property
+    def dedup_threshold(self) -> float:
+        return self._dedup_threshold
+
+    @property
+    def drive_download_dir(self) -> str:
+        return self._drive_download_dir
+
+    @property
+    def drive_download_workers(self) -> int:
+        return self._drive_download_workers
+
+    @property
+    def drive_fake_dir(self) -> str:
+        return self._drive_fake_dir
+
+    @property
+    def title_extractor(self) -> str:
+        return self._title_extractor
+
+    @property
+    def title_llm_batch_size(self) -> int:
+        return self._title_llm_batch_size
+
+    @property
+    def vector_load_mode(self) -> str:
+        return self._vector_load_mode
+
+    @property
+    def bulk_rebuild_ratio(self) -> float:
+        return self._bulk_rebuild_ratio
+
+    @property
+    def bulk_maintenance_work_mem(self) -> str:
+        return self._bulk_maintenance_work_mem
+
+    @property
+    def bulk_parallel_workers(self) -> int:
+        return self._bulk_parallel_workers
+
+    @property
+    def scraper_max_workers(self) -> int:
+        return self._scraper_max_workers
+
+    @property
+    def scraper_max_per_host(self) -> int:
+        return self._scraper_max_per_host
+
+    @property
+    def scraper_host_delay(self) -> float:
+        return self._scraper_host_delay
+
+    @property
+    def scraper_convert_processes(self) -> Optional[int]:
+        return self._scraper_convert_processes
+
+    @property
+    def boilerplate_path(self) -> str:
+        return self._boilerplate_path
+
+    @property
+    def boilerplate_min_pages(self) -> int:
+        return self._boilerplate_min_pages
+
+    @property
+    def http_cache_dir(self) -> str:
+        return self._http_cache_dir
+
+    @property
+    def http_cache_offline(self) -> bool:
+        return self._http_cache_offline
+
+    @property
+    def http_cache_max_mb(self) -> int:
+        return self._http_cache_max_mb
+
+    @property
+    def youtube_llm_concurrency(self) -> int:
+        return self._youtube_llm_concurrency
+
+    @property
+    def youtube_llm_tokens_per_minute(self) -> int:
+        return self._youtube_llm_tokens_per_minute
+
+    @property
+    def youtube_fetch_concurrency(self) -> int:
+        return self._youtube_fetch_concurrency
+
+    @property
+    def transcript_formatter(self) -> str:
+        return self._transcript_formatter
+
+    @property
+    def youtube_segment_tokens(self) -> int:
+        return self._youtube_segment_tokens
+
+    @property
+    def crawl_max_depth(self) -> int:
+        return self._crawl_max_depth
+
+    @property
+    def crawl_max_pages(self) -> int:
+        return self._crawl_max_pages
+
+    @property
+    def crawl_use_sitemaps(self) -> bool:
+        return self._crawl_use_sitemaps
+
+    @property
+    def crawl_frontier_path(self) -> str:
+        return self._crawl_frontier_path
+
+    @property
+    def crawl_resume(self) -> bool:
+        return self._crawl_resume
+
+    @property
+    def youtube_url_list(self) -> str:
+        return self._youtube_url_list
+
+    @property
+    def web_seed_urls(self) -> list:
+        return list(self._web_seed_urls)
+
+    @property
+    def job_concurrency(self) -> dict:
+        return dict(self._job_concurrency)
+
+    @property
+    def job_max_attempts(self) -> int:
+        return self._job_max_attempts
+
+    @property
+    def job_retry_base_seconds(self) -> float:
+        return self._job_retry_base_seconds
+
+    @property
+    def job_retry_max_seconds(self) -> float:
+        return self._job_retry_max_seconds
+
+    @property
+    def job_lease_seconds(self) -> float:
+        return self._job_lease_seconds
+
+    @property
+    def job_poll_seconds(self) -> float:
+        return self._job_poll_seconds
+
+    @property
+    def youtube_resync_minutes(self) -> float:
+        return self._youtube_resync_minutes
+
+    @property
+    def web_resync_minutes(self) -> float:
+        return self._web_resync_minutes
+
+    @property
+    def drive_resync_minutes(self) -> float:
+        return self._drive_resync_minutes
+
+    @property
+    def job_api_host(self) -> str:
+        return self._job_api_host
+
+    @property
+    def job_api_port(self) -> int:
+        return self._job_api_port
+
+    @property
+    def embed_model(self) -> str:
+        return self._embed_model
+
+    @property
+    def embed_dim(self) -> int:
+        return self._embed_dim
+
+    @property
+    def chunk_size(self) -> int:
+        return self._chunk_size
+
+    @property
+    def chunk_overlap(self) -> int:
+        return self._chunk_overlap
+
+    @property
+    def hnsw_m(self) -> int:
+        return self._hnsw_m
+
+    @property
+    def hnsw_ef_construction(self) -> int:
+        return self._hnsw_ef_construction
+
+    @property
+    def blue_green_min_source_ratio(self) -> float:
+        return self._blue_green_min_source_ratio
+
+    @property
+    def blue_green_min_recall(self) -> float:
+        return self._blue_green_min_recall
+
+    @property
+    def blue_green_sample_size(self) -> int:
+        return self._blue_green_sample_size
+
+    @property
+    def blue_green_top_k(self) -> int:
+        return self._blue_green_top_k
+
+    @property
+    def table_alias_refresh_seconds(self) -> float:
+        return self._table_alias_refresh_seconds
+
     @property
     def google_credentials(self) -> dict:
         """Returns Google service account credentials as a dictionary."""
         return dict(self._google_credentials)
 
     def google_credentials_json_path(self) -> str:
-        """Writes Google service account credentials to a temporary JSON file and returns its path."""
-        
-        creds_dict = dict(self._google_credentials)
-        temp = tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w')
-        json.dump(creds_dict, temp)
-        temp.close()
-        return temp.name
+        """Writes Google service account credentials to a temporary JSON file once and returns its path."""
+        if self._google_credentials_path is None:
+            creds_dict = dict(self._google_credentials)
+            temp = tempfile.NamedTemporaryFile(delete=False, suffix='.json', mode='w')
+            json.dump(creds_dict, temp)
+            temp.close()
+            # The file holds a private key; remove it when the process exits
+            atexit.register(lambda path=temp.name: os.path.exists(path) and os.remove(path))
+            self._google_credentials_path = temp.name
+        return self._google_credentials_path
 
     # General getter for any env variable
     def get_env_var(self, key: str, default: Optional[str] = None) -> Optional[str]:
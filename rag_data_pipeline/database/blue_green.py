@@ -0,0 +1,329 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from llama_index.embeddings.openai import OpenAIEmbedding
+from sqlalchemy import text
+
+from database.db import TABLE_ALIAS_TABLE, TABLE_VERSIONS_TABLE, DatabaseConnection, IndexSettings
+
+
+class BlueGreenIndex:
+    """
+    Versioned vector tables behind the DB_TABLE_NAME alias.
+
+    A change of embedding model, chunking or HNSW parameters is built into a
+    new table `<alias>_v<n>` next to the live one, which keeps serving reads.
+    The build is validated against the live table (sources covered, embedded
+    rows and a recall spot-check), then activated by pointing the alias at it
+    in one UPDATE; the rag service and the ingestion service follow the alias.
+    The previous table stays in place, so rollback() is another pointer flip.
+
+    Version statuses: building -> validated | failed -> active -> retired -> dropped.
+    """
+
+    BUILDING = "building"
+    VALIDATED = "validated"
+    FAILED = "failed"
+    ACTIVE = "active"
+    RETIRED = "retired"
+    DROPPED = "dropped"
+
+    def __init__(self, db_connection: DatabaseConnection):
+        self.db_connection = db_connection
+        self.alias = db_connection.alias
+        self.engine = db_connection.get_engine()
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_ALIAS_TABLE} ("
+                "alias VARCHAR PRIMARY KEY, table_name VARCHAR NOT NULL, previous_table_name VARCHAR, "
+                "switched_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            ))
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS_TABLE} ("
+                "table_name VARCHAR PRIMARY KEY, alias VARCHAR NOT NULL, version INTEGER NOT NULL, "
+                "settings JSONB NOT NULL, status VARCHAR NOT NULL, validation JSONB, "
+                "created_at TIMESTAMPTZ NOT NULL DEFAULT now(), activated_at TIMESTAMPTZ)"
+            ))
+            # The table in use before the first build becomes version 0, built with the historical defaults
+            connection.execute(
+                text(
+                    f"INSERT INTO {TABLE_VERSIONS_TABLE} (table_name, alias, version, settings, status, activated_at) "
+                    "VALUES (:alias, :alias, 0, CAST(:settings AS JSONB), :active, now()) ON CONFLICT DO NOTHING"
+                ),
+                {"alias": self.alias, "settings": json.dumps(IndexSettings()._asdict()), "active": self.ACTIVE},
+            )
+            connection.execute(
+                text(
+                    f"INSERT INTO {TABLE_ALIAS_TABLE} (alias, table_name) VALUES (:alias, :alias) "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                {"alias": self.alias},
+            )
+
+    @staticmethod
+    def data_table(table_name: str) -> str:
+        """Table PGVectorStore stores the nodes of `table_name` in."""
+        return f"data_{table_name.lower()}"
+
+    def pointer(self) -> Dict[str, Optional[str]]:
+        """The active table and the previous one, which rollback() returns to."""
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                text(f"SELECT table_name, previous_table_name FROM {TABLE_ALIAS_TABLE} WHERE alias = :alias"),
+                {"alias": self.alias},
+            ).one()
+        return {"active": row.table_name, "previous": row.previous_table_name}
+
+    def versions(self) -> List[Dict[str, Any]]:
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    f"SELECT table_name, version, settings, status, validation, created_at, activated_at "
+                    f"FROM {TABLE_VERSIONS_TABLE} WHERE alias = :alias ORDER BY version"
+                ),
+                {"alias": self.alias},
+            ).fetchall()
+        return [dict(row._mapping) for row in rows]
+
+    def _set_status(self, connection, table_name: str, status: str, **columns: Any) -> None:
+        assignments = "".join(f", {column} = :{column}" for column in columns)
+        connection.execute(
+            text(f"UPDATE {TABLE_VERSIONS_TABLE} SET status = :status{assignments} WHERE table_name = :table_name"),
+            {"status": status, "table_name": table_name, **columns},
+        )
+
+    def create_version(self, settings: IndexSettings) -> str:
+        """
+        Registers the table for a new build, or returns the unfinished build with
+        the same settings so an interrupted build resumes where it stopped.
+
+        Args:
+            settings (IndexSettings): Settings to build the table with
+
+        Returns:
+            str: Table name to pass to RAGDataIngestion / main()
+        """
+        with self.engine.begin() as connection:
+            building = connection.execute(
+                text(
+                    f"SELECT table_name, settings FROM {TABLE_VERSIONS_TABLE} "
+                    "WHERE alias = :alias AND status = :building ORDER BY version DESC"
+                ),
+                {"alias": self.alias, "building": self.BUILDING},
+            ).fetchall()
+            for row in building:
+                if row.settings == settings._asdict():
+                    print(f"Resuming the build of {row.table_name}")
+                    return row.table_name
+                # Settings changed since that build started; it will never be finished
+                self._set_status(connection, row.table_name, self.FAILED)
+
+            version = connection.execute(
+                text(f"SELECT COALESCE(MAX(version), 0) + 1 FROM {TABLE_VERSIONS_TABLE} WHERE alias = :alias"),
+                {"alias": self.alias},
+            ).scalar()
+            table_name = f"{self.alias}_v{version}"
+            connection.execute(
+                text(
+                    f"INSERT INTO {TABLE_VERSIONS_TABLE} (table_name, alias, version, settings, status) "
+                    "VALUES (:table_name, :alias, :version, CAST(:settings AS JSONB), :building)"
+                ),
+                {
+                    "table_name": table_name,
+                    "alias": self.alias,
+                    "version": version,
+                    "settings": json.dumps(settings._asdict()),
+                    "building": self.BUILDING,
+                },
+            )
+        print(f"Building {table_name} with {settings._asdict()}")
+        return table_name
+
+    def _table_stats(self, connection, table_name: str) -> Dict[str, Optional[int]]:
+        data_table = self.data_table(table_name)
+        stats: Dict[str, Optional[int]] = {"rows": 0, "unembedded_rows": 0, "sources": None}
+        if connection.execute(text("SELECT to_regclass(:table)"), {"table": f'public."{data_table}"'}).scalar() is None:
+            return stats
+        stats["rows"], stats["unembedded_rows"] = connection.execute(text(
+            f'SELECT COUNT(*), COUNT(*) FILTER (WHERE embedding IS NULL) FROM public."{data_table}"'
+        )).one()
+        registry = f"{data_table}_doc_registry"
+        if connection.execute(text("SELECT to_regclass(:table)"), {"table": f'public."{registry}"'}).scalar() is not None:
+            stats["sources"] = connection.execute(text(
+                f"SELECT COUNT(*) FROM public.\"{registry}\" WHERE status = 'active'"
+            )).scalar()
+        return stats
+
+    @staticmethod
+    def _source_id(metadata: Dict[str, Any]) -> str:
+        """Source a stored chunk belongs to; node ref_doc_ids are '<source id>#<part>'."""
+        return str(metadata.get("ref_doc_id") or metadata.get("doc_id") or "").rsplit("#", 1)[0]
+
+    def _recall(self, connection, live_table: str, table_name: str, settings: IndexSettings,
+                sample_size: int, top_k: int) -> Dict[str, Any]:
+        """
+        Samples chunks of the live table, embeds their text with the new table's
+        model and counts how often a chunk of the same source is in the new
+        table's top k. Robust to changes of chunking and model, since it only
+        asks whether the right source is found.
+        """
+        samples = connection.execute(
+            text(
+                f'SELECT text, metadata_ FROM public."{self.data_table(live_table)}" '
+                "WHERE embedding IS NOT NULL ORDER BY random() LIMIT :limit"
+            ),
+            {"limit": sample_size},
+        ).fetchall()
+        samples = [(row.text, self._source_id(row.metadata_ or {})) for row in samples if row.text and row.metadata_]
+        samples = [(sample_text, source) for sample_text, source in samples if source]
+        if not samples:
+            return {"samples": 0, "hits": 0, "recall": None}
+
+        embed_model = OpenAIEmbedding(model=settings.embed_model, embed_dim=settings.embed_dim)
+        # Chunks of the live table can exceed the new model's input at a larger chunk size; the head is enough
+        embeddings = embed_model.get_text_embedding_batch([sample_text[:4000] for sample_text, _ in samples])
+
+        connection.execute(text(f"SET LOCAL hnsw.ef_search = {max(40, top_k)}"))
+        hits = 0
+        for (_, source), embedding in zip(samples, embeddings):
+            rows = connection.execute(
+                text(
+                    f'SELECT metadata_ FROM public."{self.data_table(table_name)}" '
+                    f"ORDER BY embedding <=> CAST(:query AS vector({settings.embed_dim})) LIMIT :top_k"
+                ),
+                {"query": str(list(embedding)), "top_k": top_k},
+            ).fetchall()
+            hits += any(self._source_id(row.metadata_ or {}) == source for row in rows)
+        return {"samples": len(samples), "hits": hits, "recall": round(hits / len(samples), 4)}
+
+    def validate(
+        self,
+        table_name: str,
+        min_source_ratio: float = 0.95,
+        min_recall: float = 0.9,
+        sample_size: int = 50,
+        top_k: int = 10,
+    ) -> Dict[str, Any]:
+        """
+        Checks a built table against the live one before it may be activated.
+
+        Passes when the table has rows and all of them are embedded, it holds
+        at least `min_source_ratio` of the live table's active sources (row
+        counts differ legitimately when the chunking changed, so sources are
+        compared) and the recall spot-check reaches `min_recall`.
+
+        Args:
+            table_name (str): Table to validate
+            min_source_ratio (float): Share of the live table's sources the table must hold
+            min_recall (float): Share of sampled live chunks whose source must be found
+            sample_size (int): Chunks sampled from the live table
+            top_k (int): Results searched per sampled chunk
+
+        Returns:
+            Dict[str, Any]: The validation report, also stored with the version; 'passed' tells the outcome
+        """
+        live_table = self.pointer()["active"]
+        settings = self.db_connection.table_settings(table_name)
+        with self.engine.begin() as connection:
+            new_stats = self._table_stats(connection, table_name)
+            live_stats = self._table_stats(connection, live_table)
+            report: Dict[str, Any] = {"live_table": live_table, "table": new_stats, "live": live_stats, "errors": []}
+
+            if not new_stats["rows"]:
+                report["errors"].append("the table has no rows")
+            if new_stats["unembedded_rows"]:
+                report["errors"].append(f"{new_stats['unembedded_rows']} rows have no embedding")
+            if new_stats["sources"] is not None and live_stats["sources"]:
+                ratio = new_stats["sources"] / live_stats["sources"]
+                report["source_ratio"] = round(ratio, 4)
+                if ratio < min_source_ratio:
+                    report["errors"].append(f"holds {ratio:.1%} of the live sources, below {min_source_ratio:.0%}")
+            elif live_stats["rows"]:
+                # No registries to compare: fall back to row counts
+                ratio = new_stats["rows"] / live_stats["rows"]
+                report["row_ratio"] = round(ratio, 4)
+                if ratio < min_source_ratio:
+                    report["errors"].append(f"has {ratio:.1%} of the live rows, below {min_source_ratio:.0%}")
+
+            if new_stats["rows"] and live_stats["rows"] and live_table != table_name:
+                report["recall_check"] = self._recall(connection, live_table, table_name, settings, sample_size, top_k)
+                recall = report["recall_check"]["recall"]
+                if recall is not None and recall < min_recall:
+                    report["errors"].append(f"recall spot-check {recall:.1%} is below {min_recall:.0%}")
+
+            report["passed"] = not report["errors"]
+            self._set_status(
+                connection,
+                table_name,
+                self.VALIDATED if report["passed"] else self.FAILED,
+                validation=json.dumps(report),
+            )
+        print(f"Validation of {table_name}: {'passed' if report['passed'] else 'failed'} {json.dumps(report)}")
+        return report
+
+    def _point(self, table_name: str, previous: Optional[str]) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"UPDATE {TABLE_ALIAS_TABLE} SET table_name = :table_name, previous_table_name = :previous, "
+                    "switched_at = now() WHERE alias = :alias"
+                ),
+                {"table_name": table_name, "previous": previous, "alias": self.alias},
+            )
+            if previous:
+                self._set_status(connection, previous, self.RETIRED)
+            connection.execute(
+                text(
+                    f"UPDATE {TABLE_VERSIONS_TABLE} SET status = :active, activated_at = now() "
+                    "WHERE table_name = :table_name"
+                ),
+                {"active": self.ACTIVE, "table_name": table_name},
+            )
+        # Stamps the newly active table so retrieval caches keyed on its version start fresh
+        DatabaseConnection(table_name).bump_corpus_version()
+        print(f"{self.alias} now points at {table_name}" + (f" (previous: {previous})" if previous else ""))
+
+    def activate(self, table_name: str, force: bool = False) -> None:
+        """
+        Points the alias at a built table; the current one is kept for rollback.
+
+        Args:
+            table_name (str): Table to serve reads from
+            force (bool): Activate even if the table did not pass validation
+        """
+        status = {version["table_name"]: version["status"] for version in self.versions()}.get(table_name)
+        if status is None or status == self.DROPPED:
+            raise ValueError(f"Unknown table '{table_name}' for alias '{self.alias}'.")
+        if status not in (self.VALIDATED, self.RETIRED, self.ACTIVE) and not force:
+            raise ValueError(f"{table_name} is '{status}'; validate it first or pass force=True.")
+        current = self.pointer()["active"]
+        if current == table_name:
+            print(f"{table_name} is already active")
+            return
+        self._point(table_name, current)
+
+    def rollback(self) -> str:
+        """
+        Points the alias back at the previous table.
+
+        Returns:
+            str: The table now active
+        """
+        pointer = self.pointer()
+        if not pointer["previous"]:
+            raise ValueError(f"Alias '{self.alias}' has no previous table to roll back to.")
+        self._point(pointer["previous"], pointer["active"])
+        return pointer["previous"]
+
+    def drop(self, table_name: str) -> None:
+        """Drops a table that is neither active nor the rollback target, with its registry and near-duplicate index."""
+        pointer = self.pointer()
+        if table_name in (pointer["active"], pointer["previous"]):
+            raise ValueError(f"{table_name} is the active or previous table of '{self.alias}' and cannot be dropped.")
+        data_table = self.data_table(table_name)
+        with self.engine.begin() as connection:
+            for suffix in ("", "_staging", "_doc_registry", "_minhash", "_drive_sync_state", "_drive_sync_files"):
+                connection.execute(text(f'DROP TABLE IF EXISTS public."{data_table}{suffix}"'))
+            self._set_status(connection, table_name, self.DROPPED)
+        print(f"Dropped {table_name}")
+
@@ -1,34 +1,130 @@
-from sqlalchemy import make_url
+import json
+import re
+import struct
+import time
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+from sqlalchemy import URL, bindparam, create_engine, make_url, text
+from llama_index.core.schema import BaseNode, MetadataMode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
 from llama_index.vector_stores.postgres import PGVectorStore
 from config.config import get_config
+from src.ingestion.citations import INDEXED_CITATION_KEYS
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Table holding the corpus version stamp. The rag service clears its retrieval
+# cache whenever the version for its table changes.
+CORPUS_VERSION_TABLE = "rag_corpus_version"
+
+# Quantized HNSW indexes used for the first retrieval pass. The expressions must
+# match the ORDER BY expressions in rag/database/db.py exactly.
+QUANTIZED_INDEXES = {
+    "halfvec": "(embedding::halfvec({dim})) halfvec_cosine_ops",
+    "binary": "(binary_quantize(embedding)::bit({dim})) bit_hamming_ops",
+}
+
+# Blue/green indexes: the logical table name (DB_TABLE_NAME) points at the physical table
+# serving reads, and every physical table records the settings it was built with.
+# The rag service resolves the same alias, see rag/database/alias.py.
+TABLE_ALIAS_TABLE = "rag_table_alias"
+TABLE_VERSIONS_TABLE = "rag_table_versions"
+
+# How nodes are written: 'insert' through PGVectorStore.add, 'bulk' through BulkLoader
+VECTOR_LOAD_MODES = ("insert", "bulk")
+
+# PostgreSQL binary COPY framing
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_TRAILER = struct.pack("!h", -1)
+INDEX_DEFINITION_PATTERN = re.compile(r"^CREATE (UNIQUE )?INDEX \S+ ON \S+ ")
+
+
+class IndexSettings(NamedTuple):
+    """
+    Settings a vector table is built with. Changing any of them needs a new
+    table (see database/blue_green.py); the defaults are what every table
+    was built with before they became configurable.
+    """
+    embed_model: str = "text-embedding-3-small"
+    embed_dim: int = 1536
+    chunk_size: int = 512
+    chunk_overlap: int = 100
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+
+    @classmethod
+    def from_config(cls) -> "IndexSettings":
+        """Settings for the next table build, from EMBED_MODEL, EMBED_DIM, CHUNK_SIZE, CHUNK_OVERLAP and HNSW_*."""
+        config = get_config()
+        return cls(
+            embed_model=config.embed_model,
+            embed_dim=config.embed_dim,
+            chunk_size=config.chunk_size,
+            chunk_overlap=config.chunk_overlap,
+            hnsw_m=config.hnsw_m,
+            hnsw_ef_construction=config.hnsw_ef_construction,
+        )
+
+
 class DatabaseConnection:
     """
     Handles database connections and vector store initialization for data ingestion.
 
+    DB_TABLE_NAME is an alias: the connection writes to the physical table it
+    points at (the alias itself until a blue/green build was activated) with
+    the settings recorded for that table.
     """
-    
-    def __init__(self):
+
+    def __init__(self, table_name: Optional[str] = None):
+        """
+        Args:
+            table_name (Optional[str]): Physical table to use instead of the alias target, e.g. a table being built
+        """
         self.config = get_config()
         self.connection_string = self.config.db_connection_string
         self.db_name = self.config.db_name
-        self.table_name = self.config.db_table_name
-        
-    def get_vector_store(self, embed_dim: int = 1536):
+        self.alias = self.config.db_table_name
+        self._engine = None
+        self.table_name = table_name or self.resolve_alias()
+        self.settings = self.table_settings(self.table_name)
+        self.embed_dim = self.settings.embed_dim
+
+    def resolve_alias(self) -> str:
+        """Physical table the alias points at; the alias itself while no blue/green build was activated."""
+        with self.get_engine().connect() as connection:
+            if connection.execute(text("SELECT to_regclass(:table)"), {"table": TABLE_ALIAS_TABLE}).scalar() is None:
+                return self.alias
+            table_name = connection.execute(
+                text(f"SELECT table_name FROM {TABLE_ALIAS_TABLE} WHERE alias = :alias"), {"alias": self.alias}
+            ).scalar()
+        return table_name or self.alias
+
+    def table_settings(self, table_name: str) -> IndexSettings:
+        """Settings recorded for a physical table, the historical defaults for tables without a record."""
+        with self.get_engine().connect() as connection:
+            if connection.execute(text("SELECT to_regclass(:table)"), {"table": TABLE_VERSIONS_TABLE}).scalar() is None:
+                return IndexSettings()
+            settings = connection.execute(
+                text(f"SELECT settings FROM {TABLE_VERSIONS_TABLE} WHERE table_name = :table_name"),
+                {"table_name": table_name},
+            ).scalar()
+        if not settings:
+            return IndexSettings()
+        return IndexSettings(**{key: value for key, value in settings.items() if key in IndexSettings._fields})
+
+    def get_vector_store(self, embed_dim: Optional[int] = None):
         """
         Returns a configured PGVectorStore instance.
 
         Args:
-            embed_dim (int): Embedding dimension (default: 1536 for OpenAI)
-            
+            embed_dim (Optional[int]): Embedding dimension (default: the table's settings)
+
         Returns:
             PGVectorStore: Configured vector store instance
         """
         url = make_url(self.connection_string)
-        
+
         vector_store = PGVectorStore.from_params(
             database=self.db_name,
             host=url.host,
@@ -36,13 +132,443 @@ class DatabaseConnection:
             port=url.port,
             user=url.username,
             table_name=self.table_name,
-            embed_dim=embed_dim,
+            embed_dim=embed_dim or self.settings.embed_dim,
+            indexed_metadata_keys=INDEXED_CITATION_KEYS,
             hnsw_kwargs={
-                "hnsw_m": 16,
-                "hnsw_ef_construction": 64,
+                "hnsw_m": self.settings.hnsw_m,
+                "hnsw_ef_construction": self.settings.hnsw_ef_construction,
                 "hnsw_ef_search": 40,
                 "hnsw_dist_method": "vector_cosine_ops",
             },
         )
-        
-        return vector_store
\ No newline at end of file
+
+        return vector_store
+
+    def get_engine(self):
+        """
+        Returns a SQLAlchemy engine for maintenance SQL against the vector table.
+        """
+        if self._engine is None:
+            url = make_url(self.connection_string)
+            self._engine = create_engine(
+                URL.create(
+                    "postgresql+psycopg2",
+                    username=url.username,
+                    password=url.password,
+                    host=url.host,
+                    port=url.port,
+                    database=self.db_name,
+                ),
+                pool_pre_ping=True,
+            )
+        return self._engine
+
+    @property
+    def data_table(self) -> str:
+        """Unqualified name of the table PGVectorStore writes nodes to."""
+        return f"data_{self.table_name.lower()}"
+
+    def bump_corpus_version(self) -> int:
+        """
+        Increments the corpus version stamp for this table after a successful ingestion.
+
+        Returns:
+            int: The new version
+        """
+        with self.get_engine().begin() as connection:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {CORPUS_VERSION_TABLE} ("
+                "table_name VARCHAR PRIMARY KEY, "
+                "version BIGINT NOT NULL, "
+                "updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            ))
+            version = connection.execute(
+                text(
+                    f"INSERT INTO {CORPUS_VERSION_TABLE} (table_name, version) VALUES (:table_name, 1) "
+                    "ON CONFLICT (table_name) DO UPDATE "
+                    f"SET version = {CORPUS_VERSION_TABLE}.version + 1, updated_at = now() "
+                    "RETURNING version"
+                ),
+                {"table_name": self.table_name},
+            ).scalar()
+
+        print(f"Corpus version for {self.table_name} is now {version}")
+        return version
+
+    def create_quantized_index(self, kind: str, hnsw_m: Optional[int] = None, ef_construction: Optional[int] = None) -> dict:
+        """
+        Builds a quantized HNSW expression index over the stored embeddings.
+
+        The float32 column is left untouched so results can be rescored at full
+        precision; only the index holds the compressed representation.
+
+        Args:
+            kind (str): 'halfvec' or 'binary'
+            hnsw_m (Optional[int]): HNSW graph degree (default: the table's settings)
+            ef_construction (Optional[int]): HNSW build-time candidate list size (default: the table's settings)
+
+        Returns:
+            dict: 'index', 'build_seconds' and 'size_bytes' of the index
+        """
+        if kind not in QUANTIZED_INDEXES:
+            raise ValueError(f"Unsupported quantized index '{kind}'. Expected one of {list(QUANTIZED_INDEXES)}.")
+
+        index_name = f"{self.data_table}_embedding_{kind}_idx"
+        expression = QUANTIZED_INDEXES[kind].format(dim=self.embed_dim)
+
+        # CONCURRENTLY keeps the table readable by the rag service during the build,
+        # but cannot run inside a transaction block.
+        with self.get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            start = time.perf_counter()
+            connection.execute(text(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name}" '
+                f'ON public."{self.data_table}" USING hnsw ({expression}) '
+                f"WITH (m = {hnsw_m or self.settings.hnsw_m}, "
+                f"ef_construction = {ef_construction or self.settings.hnsw_ef_construction})"
+            ))
+            build_seconds = time.perf_counter() - start
+            size_bytes = connection.execute(
+                text("SELECT pg_relation_size(CAST(:index AS regclass))"),
+                {"index": f'public."{index_name}"'},
+            ).scalar()
+
+        print(f"Quantized index {index_name}: built in {build_seconds:.1f}s, size {size_bytes / 1024 / 1024:.1f} MiB")
+        return {"index": index_name, "build_seconds": build_seconds, "size_bytes": size_bytes}
+
+    def create_matryoshka_index(
+        self, dim: int = 256, hnsw_m: Optional[int] = None, ef_construction: Optional[int] = None
+    ) -> dict:
+        """
+        Stores a truncated, renormalized copy of every embedding and indexes it.
+
+        text-embedding-3-small is trained Matryoshka-style, so its first `dim`
+        components renormalized to unit length are a valid shortened embedding.
+        The column is backfilled only for rows that do not have it yet, so
+        repeated runs only touch newly ingested nodes.
+
+        Args:
+            dim (int): Reduced dimension, e.g. 256 or 512
+            hnsw_m (Optional[int]): HNSW graph degree (default: the table's settings)
+            ef_construction (Optional[int]): HNSW build-time candidate list size (default: the table's settings)
+
+        Returns:
+            dict: 'index', 'rows_backfilled', 'build_seconds' and 'size_bytes'
+        """
+        if not 0 < dim < self.embed_dim:
+            raise ValueError(f"Matryoshka dimension must be between 1 and {self.embed_dim - 1}, got {dim}.")
+
+        column = f"embedding_{dim}"
+        index_name = f"{self.data_table}_{column}_idx"
+
+        with self.get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text(
+                f'ALTER TABLE public."{self.data_table}" ADD COLUMN IF NOT EXISTS {column} vector({dim})'
+            ))
+            rows_backfilled = connection.execute(text(
+                f'UPDATE public."{self.data_table}" '
+                f"SET {column} = l2_normalize(subvector(embedding, 1, {dim}))::vector({dim}) "
+                f"WHERE {column} IS NULL AND embedding IS NOT NULL"
+            )).rowcount
+
+            start = time.perf_counter()
+            connection.execute(text(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index_name}" '
+                f'ON public."{self.data_table}" USING hnsw ({column} vector_cosine_ops) '
+                f"WITH (m = {hnsw_m or self.settings.hnsw_m}, "
+                f"ef_construction = {ef_construction or self.settings.hnsw_ef_construction})"
+            ))
+            build_seconds = time.perf_counter() - start
+            size_bytes = connection.execute(
+                text("SELECT pg_relation_size(CAST(:index AS regclass))"),
+                {"index": f'public."{index_name}"'},
+            ).scalar()
+
+        print(
+            f"Matryoshka index {index_name}: backfilled {rows_backfilled} rows, "
+            f"built in {build_seconds:.1f}s, size {size_bytes / 1024 / 1024:.1f} MiB"
+        )
+        return {
+            "index": index_name,
+            "rows_backfilled": rows_backfilled,
+            "build_seconds": build_seconds,
+            "size_bytes": size_bytes,
+        }
+
+
+class _CopyStream:
+    """Read-only file object over a byte chunk iterator, so COPY consumes rows as they are encoded."""
+
+    def __init__(self, chunks: Iterator[bytes]):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class BulkLoader:
+    """
+    Bulk-load path for initial and large ingestions (VECTOR_LOAD_MODE=bulk).
+
+    Nodes are streamed with binary COPY into an unindexed staging table
+    (`<data table>_staging`) instead of being inserted row by row into the
+    live table, where every insert also updates the HNSW graph. finish() then
+    either:
+        rebuilds  when the live table is empty or the staged rows are at least
+                  `rebuild_ratio` of it: live rows are copied into staging,
+                  every index of the live table is built once on staging with
+                  a large maintenance_work_mem and parallel workers, and the
+                  tables are swapped in one transaction
+        merges    otherwise: the staged rows are inserted into the live table
+                  with a single INSERT ... SELECT
+    The live table keeps serving reads throughout. The staging table survives
+    an interruption and is picked up by the next run, since the registry has
+    already recorded its nodes.
+    """
+
+    COPY_COLUMNS = ("node_id", "text", "metadata_", "embedding")
+
+    def __init__(
+        self,
+        db: DatabaseConnection,
+        vector_store: PGVectorStore,
+        rebuild_ratio: float = 0.5,
+        maintenance_work_mem: str = "2GB",
+        parallel_workers: int = 4,
+    ):
+        """
+        Args:
+            db (DatabaseConnection): Connection whose data table is loaded
+            vector_store (PGVectorStore): Store that owns the live table (creates it, deletes nodes)
+            rebuild_ratio (float): Staged rows, relative to live rows, from which indexes are rebuilt
+            maintenance_work_mem (str): Memory for the index builds, e.g. '2GB'
+            parallel_workers (int): max_parallel_maintenance_workers for the index builds
+        """
+        self.db = db
+        self.vector_store = vector_store
+        self.rebuild_ratio = rebuild_ratio
+        self.maintenance_work_mem = maintenance_work_mem
+        self.parallel_workers = parallel_workers
+        self.live_table = db.data_table
+        self.staging_table = f"{db.data_table}_staging"
+        self.staged = 0
+        # Ids staged by this run; delete_nodes leaves them in staging
+        self._staged_ids = set()
+        self._prepared = False
+        self._jsonb = False
+
+    def _prepare(self) -> None:
+        if self._prepared:
+            return
+        # PGVectorStore creates the live table and its indexes on first use
+        self.vector_store.add([])
+        with self.db.get_engine().begin() as connection:
+            connection.execute(text(
+                f'CREATE TABLE IF NOT EXISTS public."{self.staging_table}" '
+                f'(LIKE public."{self.live_table}" INCLUDING ALL EXCLUDING INDEXES)'
+            ))
+            self.staged = connection.execute(text(f'SELECT COUNT(*) FROM public."{self.staging_table}"')).scalar()
+            self._jsonb = connection.execute(
+                text(
+                    "SELECT data_type FROM information_schema.columns "
+                    "WHERE table_schema = 'public' AND table_name = :table AND column_name = 'metadata_'"
+                ),
+                {"table": self.live_table},
+            ).scalar() == "jsonb"
+        self._prepared = True
+        if self.staged:
+            print(f"Continuing interrupted bulk load: {self.staged} rows already staged in {self.staging_table}")
+
+    def _encode_row(self, node: BaseNode) -> bytes:
+        metadata = json.dumps(node_to_metadata_dict(node, remove_text=True, flat_metadata=False)).encode("utf-8")
+        if self._jsonb:
+            # jsonb's binary format is a version byte followed by the text
+            metadata = b"\x01" + metadata
+        embedding = node.get_embedding()
+        fields = [
+            node.node_id.encode("utf-8"),
+            # Postgres text cannot hold NUL bytes
+            node.get_content(metadata_mode=MetadataMode.NONE).replace("\x00", "").encode("utf-8"),
+            metadata,
+            # pgvector binary format: dimensions, unused, then big-endian float4 values
+            struct.pack(f"!hh{len(embedding)}f", len(embedding), 0, *embedding),
+        ]
+        return struct.pack("!h", len(fields)) + b"".join(struct.pack("!i", len(field)) + field for field in fields)
+
+    def _copy_chunks(self, nodes: Iterable[BaseNode]) -> Iterator[bytes]:
+        yield COPY_SIGNATURE
+        for node in nodes:
+            yield self._encode_row(node)
+        yield COPY_TRAILER
+
+    def add(self, nodes: List[BaseNode], **kwargs) -> List[str]:
+        """
+        Stages embedded nodes with binary COPY. Same signature as PGVectorStore.add.
+
+        Returns:
+            List[str]: Ids of the staged nodes
+        """
+        self._prepare()
+        nodes = [node for node in nodes if node.embedding is not None]
+        if not nodes:
+            return []
+
+        columns = ", ".join(self.COPY_COLUMNS)
+        connection = self.db.get_engine().raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.copy_expert(
+                f'COPY public."{self.staging_table}" ({columns}) FROM STDIN WITH (FORMAT binary)',
+                _CopyStream(self._copy_chunks(nodes)),
+            )
+            cursor.close()
+            connection.commit()
+        finally:
+            connection.close()
+
+        self.staged += len(nodes)
+        self._staged_ids.update(node.node_id for node in nodes)
+        return [node.node_id for node in nodes]
+
+    def delete_nodes(self, node_ids: List[str], **kwargs) -> None:
+        """
+        Deletes nodes from the live table and from staging. Same signature as PGVectorStore.delete_nodes.
+
+        Staged rows are only deleted if this run did not stage them: node ids are
+        not unique, and a stale id re-added in this run must keep its new row.
+        """
+        if not node_ids:
+            return
+        self.vector_store.delete_nodes(node_ids=node_ids)
+        staged_earlier = [node_id for node_id in node_ids if node_id not in self._staged_ids]
+        if self._prepared and staged_earlier:
+            with self.db.get_engine().begin() as connection:
+                connection.execute(
+                    text(f'DELETE FROM public."{self.staging_table}" WHERE node_id IN :node_ids').bindparams(
+                        bindparam("node_ids", expanding=True)
+                    ),
+                    {"node_ids": staged_earlier},
+                )
+
+    def _copyable_columns(self, connection) -> str:
+        rows = connection.execute(
+            text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = 'public' AND table_name = :table AND is_generated = 'NEVER' "
+                "ORDER BY ordinal_position"
+            ),
+            {"table": self.live_table},
+        )
+        return ", ".join(f'"{row.column_name}"' for row in rows)
+
+    def _merge(self) -> None:
+        start = time.perf_counter()
+        with self.db.get_engine().begin() as connection:
+            columns = ", ".join(self.COPY_COLUMNS)
+            connection.execute(text(
+                f'INSERT INTO public."{self.live_table}" ({columns}) '
+                f'SELECT {columns} FROM public."{self.staging_table}"'
+            ))
+            connection.execute(text(f'DROP TABLE public."{self.staging_table}"'))
+        print(f"Bulk load: merged {self.staged} staged rows into {self.live_table} in {time.perf_counter() - start:.1f}s")
+
+    def _rebuild_and_swap(self) -> None:
+        start = time.perf_counter()
+        with self.db.get_engine().begin() as connection:
+            # Blocks other writers until the swap; readers keep using the live table and its indexes
+            connection.execute(text(f'LOCK TABLE public."{self.live_table}" IN SHARE MODE'))
+            columns = self._copyable_columns(connection)
+            copied = connection.execute(text(
+                f'INSERT INTO public."{self.staging_table}" ({columns}) '
+                f'SELECT {columns} FROM public."{self.live_table}"'
+            )).rowcount
+
+            connection.execute(text(f"SET LOCAL maintenance_work_mem = '{self.maintenance_work_mem}'"))
+            connection.execute(text(f"SET LOCAL max_parallel_maintenance_workers = {int(self.parallel_workers)}"))
+            indexes = connection.execute(
+                text(
+                    "SELECT i.relname AS name, pg_get_indexdef(i.oid) AS definition, x.indisprimary AS is_primary "
+                    "FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid "
+                    "WHERE x.indrelid = CAST(:table AS regclass)"
+                ),
+                {"table": f'public."{self.live_table}"'},
+            ).fetchall()
+
+            renames = []
+            # B-tree indexes first, the HNSW graphs last
+            for number, index in enumerate(sorted(indexes, key=lambda index: " USING hnsw " in index.definition)):
+                temporary = f"bulk_{number}_{self.live_table}"[:63]
+                index_start = time.perf_counter()
+                connection.execute(text(INDEX_DEFINITION_PATTERN.sub(
+                    lambda match: f'CREATE {match.group(1) or ""}INDEX "{temporary}" ON public."{self.staging_table}" ',
+                    index.definition,
+                )))
+                if index.is_primary:
+                    connection.execute(text(
+                        f'ALTER TABLE public."{self.staging_table}" '
+                        f'ADD CONSTRAINT "{temporary}" PRIMARY KEY USING INDEX "{temporary}"'
+                    ))
+                renames.append((temporary, index.name, index.is_primary))
+                print(f"Bulk load: built {index.name} in {time.perf_counter() - index_start:.1f}s")
+            connection.execute(text(f'ANALYZE public."{self.staging_table}"'))
+
+            # The id sequence belongs to the live table; hand it over before that table is dropped
+            sequence = connection.execute(
+                text("SELECT pg_get_serial_sequence(:table, 'id')"), {"table": f'public."{self.live_table}"'}
+            ).scalar()
+            if sequence:
+                connection.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY public."{self.staging_table}".id'))
+
+            retired = f"{self.live_table}_retired"
+            connection.execute(text(f'ALTER TABLE public."{self.live_table}" RENAME TO "{retired}"'))
+            connection.execute(text(f'ALTER TABLE public."{self.staging_table}" RENAME TO "{self.live_table}"'))
+            connection.execute(text(f'DROP TABLE public."{retired}"'))
+            for temporary, name, is_primary in renames:
+                if is_primary:
+                    connection.execute(text(
+                        f'ALTER TABLE public."{self.live_table}" RENAME CONSTRAINT "{temporary}" TO "{name}"'
+                    ))
+                else:
+                    connection.execute(text(f'ALTER INDEX public."{temporary}" RENAME TO "{name}"'))
+
+        print(
+            f"Bulk load: rebuilt {self.live_table} from {self.staged} staged and {copied} existing rows, "
+            f"{len(renames)} indexes, swapped in after {time.perf_counter() - start:.1f}s"
+        )
+
+    def finish(self) -> bool:
+        """
+        Makes the staged nodes visible, rebuilding or merging as described above.
+
+        Returns:
+            bool: True when rows were loaded
+        """
+        if not self._prepared:
+            return False
+        if not self.staged:
+            with self.db.get_engine().begin() as connection:
+                connection.execute(text(f'DROP TABLE IF EXISTS public."{self.staging_table}"'))
+            self._prepared = False
+            return False
+
+        with self.db.get_engine().connect() as connection:
+            live_rows = connection.execute(text(f'SELECT COUNT(*) FROM public."{self.live_table}"')).scalar()
+        if live_rows == 0 or self.staged >= self.rebuild_ratio * live_rows:
+            self._rebuild_and_swap()
+        else:
+            self._merge()
+
+        self.staged = 0
+        self._staged_ids.clear()
+        self._prepared = False
+        self.db.bump_corpus_version()
+        return True
@@ -0,0 +1,182 @@
+import hashlib
+import json
+from typing import Dict, Iterable, List, NamedTuple
+
+from llama_index.core import Document
+from sqlalchemy import text
+
+from database.db import DatabaseConnection
+
+
+def source_doc_id(doc: Document) -> str:
+    """
+    Stable id of the source a Document came from. All segments of one YouTube
+    video and all pages of one Drive file share the id of their source.
+    """
+    metadata = doc.metadata or {}
+    source = metadata.get('source', '')
+    if source.startswith('google_drive'):
+        file_id = metadata.get('file_id') or metadata.get('file id')
+        if file_id:
+            return f"drive:{file_id}"
+    if metadata.get('url'):
+        return metadata['url']
+    return doc.id_
+
+
+def source_scope(doc: Document) -> str:
+    """Scope used to detect deleted sources: one per source type (per folder for Drive)."""
+    metadata = doc.metadata or {}
+    source = metadata.get('source', '')
+    if source.startswith('google_drive'):
+        return f"drive:{metadata.get('folder_id', '')}"
+    if source == 'youtube_transcript':
+        return 'youtube'
+    if source == 'web_scraper':
+        return 'web'
+    return source or 'unknown'
+
+
+def content_hash(documents: List[Document]) -> str:
+    """Hash over the text and metadata of all Documents produced by one source."""
+    digest = hashlib.sha256()
+    for doc in documents:
+        digest.update(doc.hash.encode())
+    return digest.hexdigest()
+
+
+class RegistryEntry(NamedTuple):
+    doc_id: str
+    scope: str
+    content_hash: str
+    node_ids: List[str]
+    status: str
+
+
+class DocumentRegistry:
+    """
+    Tracks every ingested source document by a stable doc id (video URL, page URL,
+    Drive file id) together with a hash of its content and the node ids it produced.
+
+    This replaces loading the whole vector table to de-duplicate by URL: lookups
+    only touch the rows for the documents in the current batch. Documents whose
+    source disappears are tombstoned and their nodes removed from the vector store.
+    """
+
+    ACTIVE = "active"
+    TOMBSTONED = "tombstoned"
+
+    def __init__(self, db_connection: DatabaseConnection):
+        self.db_connection = db_connection
+        self.table = f"{db_connection.data_table}_doc_registry"
+        self._ensure_table()
+
+    def _ensure_table(self) -> None:
+        with self.db_connection.get_engine().begin() as connection:
+            connection.execute(text(
+                f'CREATE TABLE IF NOT EXISTS public."{self.table}" ('
+                "doc_id VARCHAR PRIMARY KEY, "
+                "scope VARCHAR NOT NULL, "
+                "content_hash VARCHAR NOT NULL, "
+                "node_ids JSONB NOT NULL DEFAULT '[]'::jsonb, "
+                "status VARCHAR NOT NULL, "
+                "updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            ))
+            connection.execute(text(
+                f'CREATE INDEX IF NOT EXISTS "{self.table}_scope_idx" ON public."{self.table}" (scope, status)'
+            ))
+
+    def lookup(self, doc_ids: Iterable[str]) -> Dict[str, RegistryEntry]:
+        """
+        Fetches registry entries for the given doc ids.
+
+        Args:
+            doc_ids (Iterable[str]): Stable doc ids of the current batch
+
+        Returns:
+            Dict[str, RegistryEntry]: Entries keyed by doc id, missing ids are new documents
+        """
+        doc_ids = list(doc_ids)
+        if not doc_ids:
+            return {}
+
+        with self.db_connection.get_engine().connect() as connection:
+            rows = connection.execute(
+                text(
+                    f'SELECT doc_id, scope, content_hash, node_ids, status FROM public."{self.table}" '
+                    "WHERE doc_id = ANY(CAST(:doc_ids AS VARCHAR[]))"
+                ),
+                {"doc_ids": doc_ids},
+            ).fetchall()
+        return {row.doc_id: RegistryEntry(*row) for row in rows}
+
+    def record(self, entries: List[RegistryEntry]) -> None:
+        """Upserts entries for freshly ingested documents."""
+        if not entries:
+            return
+
+        with self.db_connection.get_engine().begin() as connection:
+            connection.execute(
+                text(
+                    f'INSERT INTO public."{self.table}" (doc_id, scope, content_hash, node_ids, status, updated_at) '
+                    "VALUES (:doc_id, :scope, :content_hash, CAST(:node_ids AS jsonb), :status, now()) "
+                    "ON CONFLICT (doc_id) DO UPDATE SET "
+                    "scope = EXCLUDED.scope, content_hash = EXCLUDED.content_hash, "
+                    "node_ids = EXCLUDED.node_ids, status = EXCLUDED.status, updated_at = now()"
+                ),
+                [
+                    {
+                        "doc_id": entry.doc_id,
+                        "scope": entry.scope,
+                        "content_hash": entry.content_hash,
+                        "node_ids": json.dumps(entry.node_ids),
+                        "status": entry.status,
+                    }
+                    for entry in entries
+                ],
+            )
+
+    def invalidate(self, doc_ids: List[str]) -> None:
+        """Clears the content hash of active documents, so the next run ingests them again even if unchanged."""
+        if not doc_ids:
+            return
+
+        with self.db_connection.get_engine().begin() as connection:
+            connection.execute(
+                text(
+                    f'UPDATE public."{self.table}" SET content_hash = \'\', updated_at = now() '
+                    "WHERE status = :active AND doc_id = ANY(CAST(:doc_ids AS VARCHAR[]))"
+                ),
+                {"active": self.ACTIVE, "doc_ids": list(doc_ids)},
+            )
+
+    def tombstone_missing(self, scope: str, seen_doc_ids: Iterable[str]) -> List[str]:
+        """
+        Tombstones active documents in `scope` that were not seen in this run.
+
+        Args:
+            scope (str): Source scope, e.g. 'web', 'youtube' or 'drive:<folder id>'
+            seen_doc_ids (Iterable[str]): Doc ids that still exist at the source
+
+        Returns:
+            List[str]: Node ids of the tombstoned documents, to delete from the vector store
+        """
+        with self.db_connection.get_engine().begin() as connection:
+            rows = connection.execute(
+                text(
+                    f'UPDATE public."{self.table}" SET status = :tombstoned, updated_at = now() '
+                    "WHERE scope = :scope AND status = :active AND NOT (doc_id = ANY(CAST(:seen AS VARCHAR[]))) "
+                    "RETURNING doc_id, node_ids"
+                ),
+                {
+                    "tombstoned": self.TOMBSTONED,
+                    "active": self.ACTIVE,
+                    "scope": scope,
+                    "seen": list(seen_doc_ids),
+                },
+            ).fetchall()
+
+        node_ids = [node_id for row in rows for node_id in row.node_ids]
+        for row in rows:
+            print(f"Tombstoned removed source: {row.doc_id}")
+        return node_ids
@@ -0,0 +1,127 @@
+import json
+import os
+import shutil
+import time
+import uuid
+
+import numpy as np
+from sqlalchemy import text
+
+from database.db import DatabaseConnection
+
+
+class SnapshotExporter:
+    """
+    Exports the vector table into a read-only snapshot for the rag service's
+    in-process replica (rag/database/replica.py).
+
+    Snapshot layout, one directory per version under `snapshot_dir`:
+        embeddings.f32   contiguous float32 matrix (count x dim), rows L2-normalized
+        records.bin      concatenated UTF-8 JSON records {node_id, text, metadata}
+        offsets.npy      int64 byte offsets into records.bin (count + 1 entries)
+        manifest.json    version, count, dim, source table and export time
+
+    A `CURRENT` file in `snapshot_dir` names the published version. It is
+    replaced atomically, so readers either see the old or the new snapshot.
+    """
+
+    def __init__(self, db_connection: DatabaseConnection, snapshot_dir: str, keep: int = 2, batch_size: int = 2000):
+        self.db_connection = db_connection
+        self.snapshot_dir = snapshot_dir
+        self.keep = keep
+        self.batch_size = batch_size
+
+    def export(self) -> dict:
+        """
+        Writes a new snapshot and publishes it.
+
+        Returns:
+            dict: The manifest of the published snapshot
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        # Unique even for exports within the same second (e.g. a build followed by its activation),
+        # and still sorted by time for _prune()
+        now = time.time()
+        version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))}.{int(now % 1 * 1e6):06d}-{uuid.uuid4().hex[:8]}"
+        target_dir = os.path.join(self.snapshot_dir, version)
+        staging_dir = target_dir + ".tmp"
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+
+        dim = self.db_connection.embed_dim
+        table = f'public."{self.db_connection.data_table}"'
+        start = time.perf_counter()
+
+        # A single repeatable-read transaction keeps the row count and the rows consistent.
+        engine = self.db_connection.get_engine()
+        with engine.connect().execution_options(isolation_level="REPEATABLE READ") as connection:
+            count = connection.execute(text(f"SELECT count(*) FROM {table} WHERE embedding IS NOT NULL")).scalar()
+
+            embeddings = np.memmap(
+                os.path.join(staging_dir, "embeddings.f32"), dtype=np.float32, mode="w+", shape=(max(count, 1), dim)
+            )
+            offsets = np.zeros(count + 1, dtype=np.int64)
+
+            rows = connection.execution_options(stream_results=True, yield_per=self.batch_size).execute(text(
+                f"SELECT node_id, text, metadata_, embedding::real[] AS embedding "
+                f"FROM {table} WHERE embedding IS NOT NULL ORDER BY id"
+            ))
+
+            written = 0
+            with open(os.path.join(staging_dir, "records.bin"), "wb") as records:
+                for row in rows:
+                    if written == count:
+                        break
+                    vector = np.asarray(row.embedding, dtype=np.float32)
+                    norm = np.linalg.norm(vector)
+                    embeddings[written] = vector / norm if norm else vector
+
+                    record = json.dumps(
+                        {"node_id": row.node_id, "text": row.text, "metadata": row.metadata_},
+                        ensure_ascii=False,
+                    ).encode("utf-8")
+                    records.write(record)
+                    offsets[written + 1] = offsets[written] + len(record)
+                    written += 1
+
+            embeddings.flush()
+            del embeddings
+
+        np.save(os.path.join(staging_dir, "offsets.npy"), offsets[: written + 1])
+
+        manifest = {
+            "version": version,
+            "count": written,
+            "dim": dim,
+            "table": self.db_connection.data_table,
+            "exported_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        with open(os.path.join(staging_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.replace(staging_dir, target_dir)
+        self._publish(version)
+        self._prune()
+
+        print(f"Published vector snapshot {version}: {written} nodes in {time.perf_counter() - start:.1f}s")
+        return manifest
+
+    def _publish(self, version: str) -> None:
+        """Atomically points CURRENT at the given version."""
+        current_path = os.path.join(self.snapshot_dir, "CURRENT")
+        temp_path = current_path + ".tmp"
+        with open(temp_path, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, current_path)
+
+    def _prune(self) -> None:
+        """Removes all but the newest `keep` snapshot versions."""
+        versions = sorted(
+            name for name in os.listdir(self.snapshot_dir)
+            if os.path.isdir(os.path.join(self.snapshot_dir, name)) and not name.endswith(".tmp")
+        )
+        for name in versions[:-self.keep]:
+            # Readers that still map an old version keep their pages until they reload.
+            shutil.rmtree(os.path.join(self.snapshot_dir, name), ignore_errors=True)
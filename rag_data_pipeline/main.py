@@ -6,22 +6,36 @@ from llama_index.core.extractors import TitleExtractor
 from llama_index.embeddings.openai import OpenAIEmbedding
 
 # Local imports
-from database.db import DatabaseConnection
+from database.db import BulkLoader, DatabaseConnection, VECTOR_LOAD_MODES
+from database.snapshot import SnapshotExporter
+from database.registry import DocumentRegistry, RegistryEntry, content_hash, source_doc_id, source_scope
 from src.youtube_transcripts.youtube_transcript_to_md import YouTubeTranscriptScraper
+from src.youtube_transcripts.llm_limiter import LLMRateLimiter
 from src.scraper.web_scraper import WebScraper
-from src.drive_reader.drive_reader import GoogleDriveLoader
+from src.scraper.boilerplate import BoilerplateModel
+from src.scraper.crawler import Crawler
+from src.scraper.http_cache import HttpCache
+from src.drive_reader.sync import DriveSync, GoogleDriveClient, LocalDriveClient
+from src.drive_reader.conversion import (
+    SUPPORTED_EXTENSIONS, DriveConverter, UnsupportedFormat, iter_markdown_parts, read_parts
+)
+from src.ingestion.citations import CitationEnricher
+from src.ingestion.cache import CachedTransformation, cache_store_from_url
+from src.ingestion.dedup import DEDUP_MODES, NearDuplicateFilter
+from src.ingestion.profiler import ProfiledTransformation, get_profiler
+from src.ingestion.streaming import IngestionCheckpoint, SourceUnit, StreamingIngestor
+from src.ingestion.titles import SourceTitleExtractor, TITLE_EXTRACTORS
+from src.ingestion.throughput import ConcurrentEmbedding, ParallelTransformation, ThroughputIngestor
 from config.config import get_config
 
 # Standard imports
+import asyncio
 import os
-from typing import List
-from pathlib import Path
+from collections import defaultdict
+from typing import Iterable, Iterator, List, Optional, Set
 
 # External lightweight libraries
-import pypandoc
-import pdfplumber
 from docx import Document as DocxDocument
-from markdownify import markdownify as md
 import requests
 import re
 
@@ -30,35 +44,11 @@ import re
 class LightweightConverter:
     def convert(self, source: str) -> str:
         """Convert document to Markdown using lightweight libraries."""
-        ext = Path(source).suffix.lower()
-
         try:
-            if ext in [".docx", ".pptx", ".odt"]:
-                # Use pypandoc for docx/pptx/odt
-                return pypandoc.convert_file(source, "md", extra_args=["--wrap=none"])
-
-            elif ext == ".pdf":
-                # Extract text from PDF
-                text = ""
-                with pdfplumber.open(source) as pdf:
-                    text = "\n".join([page.extract_text() or "" for page in pdf.pages])
-                return text
-
-            elif ext == ".txt":
-                # Plain text file
-                with open(source, "r", encoding="utf-8") as f:
-                    return f.read()
-
-            elif ext == ".html" or ext == ".htm":
-                # Convert HTML → Markdown
-                with open(source, "r", encoding="utf-8") as f:
-                    html_content = f.read()
-                return md(html_content)
-
-            else:
-                print(f"Unsupported format for {source}")
-                return ""
-
+            return "\n".join(part["text"] for part in iter_markdown_parts(source))
+        except UnsupportedFormat:
+            print(f"Unsupported format for {source}")
+            return ""
         except Exception as e:
             print(f"Error converting {source}: {e}")
             return ""
@@ -72,204 +62,626 @@ class RAGDataIngestion:
     RAG data ingestion pipeline - ingests web URLs, Google Drive docs, and YouTube transcripts into DB
     """
 
-    def __init__(self):
+    def __init__(self, table_name: Optional[str] = None, vector_load_mode: Optional[str] = None):
+        """
+        Args:
+            table_name (Optional[str]): Physical table to ingest into (default: the one DB_TABLE_NAME points at)
+            vector_load_mode (Optional[str]): Overrides VECTOR_LOAD_MODE, e.g. 'bulk' for table builds
+        """
         self.config = get_config()
-        self.db_connection = DatabaseConnection()
-        self.web_scraper = WebScraper()
-        self.drive_loader = GoogleDriveLoader()
-        self.youtube_scraper = YouTubeTranscriptScraper()
+        self.db_connection = DatabaseConnection(table_name)
+        self.vector_load_mode = vector_load_mode or self.config.vector_load_mode
+        self.profiler = get_profiler()
+
+        # Unchanged documents, chunks and transcript segments reuse their earlier outputs across runs
+        self.cache_store = cache_store_from_url(
+            self.config.ingestion_cache_url,
+            self.config.ingestion_cache_max_mb,
+            self.db_connection.get_engine(),
+        )
+        self.http_cache = (
+            HttpCache(
+                self.config.http_cache_dir,
+                offline=self.config.http_cache_offline,
+                max_bytes=self.config.http_cache_max_mb * 1024 * 1024,
+            )
+            if self.config.http_cache_dir else None
+        )
+        self.web_scraper = WebScraper(
+            max_workers=self.config.scraper_max_workers,
+            max_per_host=self.config.scraper_max_per_host,
+            host_delay=self.config.scraper_host_delay,
+            convert_processes=self.config.scraper_convert_processes,
+            http_cache=self.http_cache,
+            boilerplate=(
+                BoilerplateModel(self.config.boilerplate_path, min_pages=self.config.boilerplate_min_pages)
+                if self.config.boilerplate_path else None
+            ),
+        )
+        self.crawler = Crawler(
+            self.web_scraper,
+            self.config.crawl_frontier_path,
+            max_depth=self.config.crawl_max_depth,
+            max_pages=self.config.crawl_max_pages,
+            use_sitemaps=self.config.crawl_use_sitemaps,
+        )
+        drive_client = (
+            LocalDriveClient(self.config.drive_fake_dir, self.config.google_drive_folder_id)
+            if self.config.drive_fake_dir else GoogleDriveClient(self.config.google_credentials)
+        )
+        self.drive_sync = DriveSync(
+            drive_client,
+            self.db_connection.get_engine(),
+            self.config.drive_download_dir,
+            max_workers=self.config.drive_download_workers,
+            # Tables built by reindex.py sync from scratch; the original table keeps the shared state tables
+            table_prefix=(
+                "" if self.db_connection.table_name == self.db_connection.alias else f"{self.db_connection.data_table}_"
+            ),
+        )
+        # Plan of the current Drive sync and the changed files converted so far, committed after ingestion
+        self._drive_plan = None
+        self._drive_synced: Set[str] = set()
+        self.youtube_scraper = YouTubeTranscriptScraper(
+            http_cache=self.http_cache,
+            cache_store=self.cache_store,
+            formatter=self.config.transcript_formatter,
+            segment_tokens=self.config.youtube_segment_tokens or None,
+        )
 
         self.document_converter = LightweightConverter
         self.document_converter = LightweightConverter()
+        self.drive_converter = DriveConverter(
+            self.config.drive_conversion_cache_dir,
+            processes=self.config.drive_convert_processes,
+            timeout_seconds=self.config.drive_convert_timeout_seconds,
+            memory_mb=self.config.drive_convert_memory_mb,
+            max_part_chars=self.config.drive_pdf_part_chars,
+        )
 
         self.vector_store = self.db_connection.get_vector_store()
-
+        self.registry = DocumentRegistry(self.db_connection)
+
+        if self.vector_load_mode not in VECTOR_LOAD_MODES:
+            raise ValueError(
+                f"Unsupported VECTOR_LOAD_MODE '{self.vector_load_mode}'. Expected one of {list(VECTOR_LOAD_MODES)}."
+            )
+        self.bulk_loader = BulkLoader(
+            self.db_connection,
+            self.vector_store,
+            rebuild_ratio=self.config.bulk_rebuild_ratio,
+            maintenance_work_mem=self.config.bulk_maintenance_work_mem,
+            parallel_workers=self.config.bulk_parallel_workers,
+        ) if self.vector_load_mode == 'bulk' else None
+        # Nodes are written to the live table, or staged by the bulk loader until finish()
+        self.node_writer = self.bulk_loader or self.vector_store
+
+        settings = self.db_connection.settings
+        node_parser = MarkdownNodeParser(
+            chunk_size=settings.chunk_size,
+            chunk_overlap=settings.chunk_overlap,
+            include_metadata=True,
+            include_prev_next_rel=True,
+        )
+        if self.config.title_extractor not in TITLE_EXTRACTORS:
+            raise ValueError(
+                f"Unsupported TITLE_EXTRACTOR '{self.config.title_extractor}'. Expected one of {list(TITLE_EXTRACTORS)}."
+            )
+        if self.config.title_extractor == 'llm':
+            title_extractor = TitleExtractor()
+        else:
+            title_extractor = SourceTitleExtractor(
+                cache_store=self.cache_store, batch_size=self.config.title_llm_batch_size
+            )
+        self.title_extractor = title_extractor
+
+        if self.config.dedup_mode not in DEDUP_MODES:
+            raise ValueError(
+                f"Unsupported DEDUP_MODE '{self.config.dedup_mode}'. Expected one of {list(DEDUP_MODES)}."
+            )
+        self.dedup = NearDuplicateFilter(
+            self.db_connection.get_engine(),
+            f"{self.db_connection.data_table}_minhash",
+            mode=self.config.dedup_mode,
+            threshold=self.config.dedup_threshold,
+        ) if self.config.dedup_mode != 'off' else None
+        embed_model = OpenAIEmbedding(model=settings.embed_model, embed_dim=settings.embed_dim)
+
+        embedder = None
+        self.parallel_parser = None
+        if self.config.ingestion_parallel:
+            node_parser = self.parallel_parser = ParallelTransformation(
+                node_parser, workers=self.config.ingestion_parse_workers
+            )
+            embed_model = embedder = ConcurrentEmbedding(
+                embed_model,
+                batch_size=self.config.embed_batch_size,
+                max_concurrency=self.config.embed_concurrency,
+                tokens_per_minute=self.config.embed_tokens_per_minute,
+            )
+
+        if self.cache_store is not None:
+            node_parser = CachedTransformation(node_parser, self.cache_store)
+            title_extractor = CachedTransformation(title_extractor, self.cache_store)
+            embed_model = CachedTransformation(embed_model, self.cache_store, per_node=True)
+
+        self.cached_transformations = [
+            t for t in (node_parser, title_extractor, embed_model) if isinstance(t, CachedTransformation)
+        ]
+
+        stages = [(node_parser, 'node_parsing'), (CitationEnricher(), 'citations'), (title_extractor, 'title_extraction')]
+        if self.dedup is not None:
+            # Not cached: whether a chunk is a duplicate depends on what the index holds at the time
+            stages.append((self.dedup, 'dedup'))
+        stages.append((embed_model, 'embedding'))
+        transformations = [ProfiledTransformation(t, stage, self.profiler) for t, stage in stages]
+        # Nodes are written by ingest_documents through node_writer, timed as their own stage
         self.pipeline = IngestionPipeline(
-            transformations=[
-                MarkdownNodeParser(chunk_size=512, chunk_overlap=100, include_metadata=True, include_prev_next_rel=True),
-                TitleExtractor(),
-                OpenAIEmbedding(model="text-embedding-3-small", embed_dim=1536),
-            ],
-            vector_store=self.vector_store,
+            transformations=transformations,
+            # The persistent cache above replaces the pipeline's whole-batch in-memory cache
+            disable_cache=self.cache_store is not None,
         )
 
+        # In parallel mode embedding and vector store writes run outside the pipeline so they can overlap
+        self.throughput_ingestor = ThroughputIngestor(
+            IngestionPipeline(transformations=transformations[:-1], disable_cache=self.cache_store is not None),
+            transformations[-1],
+            self.node_writer,
+            embedder,
+        ) if embedder is not None else None
+
+    def close(self) -> None:
+        """Stops the node parser's worker processes once ingestion is done."""
+        if self.parallel_parser is not None:
+            self.parallel_parser.close()
+
     def convert_document_to_markdown(self, source: str) -> str:
         return self.document_converter.convert(source)
 
+    def _web_document(self, scraped_data: dict) -> Document:
+        return Document(
+            text=scraped_data['content_markdown'],
+            metadata={
+                'url': scraped_data['url'],
+                'title': scraped_data['metadata']['title'],
+                'description': scraped_data['metadata']['description'],
+                'source': 'web_scraper'
+            }
+        )
+
+    def scrape_web_page(self, url: str) -> Document:
+        """Scrapes one page, raising if it cannot be fetched."""
+        scraped_data = self.web_scraper.scrape_page(url)
+        if not scraped_data:
+            raise RuntimeError(f"Could not fetch {url}")
+        return self._web_document(scraped_data)
+
     def scrape_web_urls(self, urls: List[str]) -> List[Document]:
         documents = []
-        print("Scraping web URLs for markdown content...")
-        for url in urls:
-            scraped_data = self.web_scraper.get_markdown(url)
+        print("Crawling web URLs for markdown content...")
+        for scraped_data in self.crawler.crawl(urls, resume=self.config.crawl_resume):
             if scraped_data:
-                doc = Document(
-                    text=scraped_data['content_markdown'],
-                    metadata={
-                        'url': scraped_data['url'],
-                        'title': scraped_data['metadata']['title'],
-                        'description': scraped_data['metadata']['description'],
-                        'source': 'web_scraper'
-                    }
-                )
-                documents.append(doc)
+                documents.append(self._web_document(scraped_data))
         return documents
 
     def load_drive_documents(self, folder_id: str) -> List[Document]:
-        documents = self.drive_loader.load_documents(folder_id)
-        for doc in documents:
-            doc.metadata['source'] = 'google_drive'
-            doc.metadata['folder_id'] = folder_id
+        """Drive files are synced and converted in one pass; see convert_drive_documents_to_markdown."""
+        return self.convert_drive_documents_to_markdown(folder_id)
+
+    def convert_drive_documents_to_markdown(self, folder_id: str, seen: Optional[Set[str]] = None) -> List[Document]:
+        """
+        Syncs the Drive folder and converts the new or changed files to Markdown.
+
+        Args:
+            folder_id (str): Drive folder id
+            seen (Optional[Set[str]]): Receives the source id of every file in the folder, changed or not
+
+        Returns:
+            List[Document]: Documents of the new or changed files
+        """
+        return [doc for _, file_documents in self._iter_drive_files(folder_id, seen) for doc in file_documents]
+
+    def _iter_drive_files(self, folder_id: str, seen: Optional[Set[str]] = None) -> Iterator[SourceUnit]:
+        """
+        Syncs the Drive folder and yields (source id, Documents) per new or changed file.
+
+        Files are downloaded and converted up front (to disk); their parts are
+        only read into Documents when the file is reached, so at most one
+        file's text is in memory at a time.
+        """
+        plan = self.drive_sync.plan(folder_id)
+        self._drive_plan, self._drive_synced = plan, set()
+        if seen is not None:
+            seen.update(f"drive:{file_id}" for file_id in plan.files)
+
+        # Formats the converter cannot read are recorded as synced without downloading them
+        supported = [drive_file for drive_file in plan.changed if drive_file.extension in SUPPORTED_EXTENSIONS]
+        self._drive_synced.update(drive_file.file_id for drive_file in plan.changed if drive_file not in supported)
+        with self.profiler.stage('drive_download', items=len(supported)):
+            downloads = {path: drive_file for drive_file, path in self.drive_sync.download(supported) if path}
+        self.profiler.count('drive_download', errors=len(supported) - len(downloads))
+
+        self.drive_converter.reset_stats()
+        with self.profiler.stage('drive_conversion', items=len(downloads)):
+            converted = list(self.drive_converter.convert_many(list(downloads)))
+        for file_path, parts_path in converted:
+            if parts_path is None:
+                self.profiler.count('drive_conversion', errors=1)
+                continue
+            drive_file = downloads[file_path]
+            documents = []
+            for part in read_parts(parts_path):
+                if not part['text'].strip():
+                    continue
+                metadata = {
+                    'source': 'google_drive_converted',
+                    'folder_id': folder_id,
+                    'original_file_path': file_path,
+                    'file_id': drive_file.file_id,
+                    'file_name': drive_file.name,
+                    'type': 'converted_document'
+                }
+                # Large PDFs arrive as several parts of whole pages instead of one string
+                page_keys = [key for key in ('page_start', 'page_end') if key in part]
+                metadata.update({key: part[key] for key in page_keys})
+                documents.append(Document(
+                    text=part['text'],
+                    metadata=metadata,
+                    excluded_embed_metadata_keys=page_keys,
+                    excluded_llm_metadata_keys=page_keys,
+                ))
+            self._drive_synced.add(drive_file.file_id)
+            if documents:
+                yield f"drive:{drive_file.file_id}", documents
+        if downloads:
+            print(self.drive_converter.stats())
+
+    def commit_drive_sync(self) -> None:
+        """Records the synced Drive state; call only after the converted documents were ingested."""
+        if self._drive_plan is not None:
+            self.drive_sync.commit(self._drive_plan, self._drive_synced)
+            self._drive_plan = None
+
+    def _video_documents(self, link: str, video_data) -> List[Document]:
+        """Turns one processed video into Documents, empty if it failed or has no transcript."""
+        if isinstance(video_data, Exception):
+            print(f"Error processing YouTube video {link}: {video_data}")
+            return []
+        segments = video_data['segments']
+        if len(segments) == 1 and segments[0]['content_markdown'].startswith("Transcript not available"):
+            # Don't let a failed fetch replace the previously ingested transcript
+            print(f"Skipping {link}: {segments[0]['content_markdown']}")
+            return []
+        documents = []
+        for segment in segments:
+            video_doc = Document(
+                text=segment['content_markdown'],
+                metadata={
+                    'url': video_data['url'],
+                    'title': video_data['metadata'].get('title', ''),
+                    'description': video_data['metadata'].get('description', ''),
+                    'source': 'youtube_transcript',
+                    'start_seconds': segment['start_seconds'],
+                    'end_seconds': segment['end_seconds'],
+                }
+            )
+            documents.append(video_doc)
+        print(f"Processed {len(segments)} segments from {link}")
         return documents
 
-    def convert_drive_documents_to_markdown(self, folder_id: str) -> List[Document]:
-        documents = []
-        drive_documents = self.drive_loader.load_documents(folder_id)
-
-        for doc in drive_documents:
-            if 'file_path' in doc.metadata:
-                file_path = doc.metadata['file_path']
-                print(f"Converting document from Google Drive: {file_path}")
-                markdown_content = self.convert_document_to_markdown(file_path)
-
-                if markdown_content:
-                    converted_doc = Document(
-                        text=markdown_content,
-                        metadata={
-                            'source': 'google_drive_converted',
-                            'folder_id': folder_id,
-                            'original_file_path': file_path,
-                            'type': 'converted_document'
-                        }
-                    )
-                    documents.append(converted_doc)
-            else:
-                doc.metadata['source'] = 'google_drive'
-                doc.metadata['folder_id'] = folder_id
-                documents.append(doc)
+    def _youtube_limiter(self) -> LLMRateLimiter:
+        return LLMRateLimiter(
+            max_concurrency=self.config.youtube_llm_concurrency,
+            tokens_per_minute=self.config.youtube_llm_tokens_per_minute,
+        )
 
-        return documents
+    def list_youtube_urls(self, list_url: str) -> List[str]:
+        """
+        Reads the YouTube watch URLs from a Markdown file.
+
+        Raises:
+            requests.HTTPError: If the file cannot be fetched
+        """
+        response = requests.get(list_url, timeout=30)
+        response.raise_for_status()
+        youtube_url_pattern = r'https://www\.youtube\.com/watch\?v=[\w-]+'
+        # Keep the first occurrence of each URL, in file order
+        return list(dict.fromkeys(re.findall(youtube_url_pattern, response.text)))
+
+    def process_youtube_video(self, url: str, limiter: Optional[LLMRateLimiter] = None) -> List[Document]:
+        """
+        Processes one video, raising if its transcript or metadata could not be fetched.
+
+        Args:
+            url (str): YouTube video URL
+            limiter (Optional[LLMRateLimiter]): LLM limiter for the formatting calls (default: a new one)
+
+        Returns:
+            List[Document]: One Document per transcript segment, empty if the video has no transcript
+        """
+        video_data = asyncio.run(self.youtube_scraper.aget_many([url], limiter or self._youtube_limiter(), fetch_concurrency=1))[0]
+        if isinstance(video_data, Exception):
+            raise video_data
+        return self._video_documents(url, video_data)
 
     def process_youtube_videos(self, urls: List[str]) -> List[Document]:
         documents = []
         print("Processing YouTube videos for transcript segments...")
-        for link in urls:
-            try:
-                video_data = self.youtube_scraper.get_transcript_segments(link)
-                for segment in video_data['segments']:
-                    video_doc = Document(
-                        text=segment['content_markdown'],
-                        metadata={
-                            'url': video_data['url'],
-                            'title': video_data['metadata'].get('title', ''),
-                            'description': video_data['metadata'].get('description', ''),
-                            'source': 'youtube_transcript',
-                            'start_seconds': segment['start_seconds'],
-                            'end_seconds': segment['end_seconds'],
-                        }
-                    )
-                    documents.append(video_doc)
-                print(f"Processed {len(video_data['segments'])} segments from {link}")
-            except Exception as e:
-                print(f"Error processing YouTube video {link}: {e}")
+        limiter = self._youtube_limiter()
+        results = asyncio.run(
+            self.youtube_scraper.aget_many(urls, limiter, fetch_concurrency=self.config.youtube_fetch_concurrency)
+        )
+        for link, video_data in zip(urls, results):
+            documents.extend(self._video_documents(link, video_data))
+        print(f"Formatted {limiter.completed} transcript segments: {limiter.throughput()}")
+        if self.youtube_scraper.format_cache is not None:
+            print(self.youtube_scraper.format_cache.stats())
         return documents
 
+    def iter_youtube_sources(self, urls: List[str], chunk_size: int) -> Iterator[SourceUnit]:
+        """Yields (url, Documents) per video, processing `chunk_size` videos concurrently at a time."""
+        limiter = self._youtube_limiter()
+        for start in range(0, len(urls), chunk_size):
+            chunk = urls[start:start + chunk_size]
+            results = asyncio.run(
+                self.youtube_scraper.aget_many(chunk, limiter, fetch_concurrency=self.config.youtube_fetch_concurrency)
+            )
+            for link, video_data in zip(chunk, results):
+                yield link, self._video_documents(link, video_data)
+        print(f"Formatted {limiter.completed} transcript segments: {limiter.throughput()}")
+
+    def iter_web_sources(self, urls: List[str], resume: Optional[bool] = None) -> Iterator[SourceUnit]:
+        """Crawls (the frontier lives on disk), then yields one page at a time from it."""
+        print("Crawling web URLs for markdown content...")
+        self.crawler.run(urls, resume=self.config.crawl_resume if resume is None else resume)
+        for scraped_data in self.crawler.frontier.iter_results():
+            yield scraped_data['url'], [self._web_document(scraped_data)]
+
+    def iter_drive_sources(self, folder_id: str, seen: Set[str]) -> Iterator[SourceUnit]:
+        """Yields Drive documents one file at a time and records every file id in `seen`."""
+        yield from self._iter_drive_files(folder_id, seen)
+
+    def ingest_streaming(self, video_urls: List[str], web_urls: List[str], drive_folder_id: str) -> Set[str]:
+        """
+        Streams all sources through chunk, embed and write in bounded batches,
+        checkpointing completed sources so an interrupted run can resume.
+
+        Returns:
+            Set[str]: Drive source ids seen, for tombstoning
+        """
+        checkpoint = IngestionCheckpoint(
+            self.db_connection.get_engine(), self.db_connection.table_name, resume=self.config.ingestion_resume
+        )
+        ingestor = StreamingIngestor(self.ingest_documents, checkpoint, self.config.ingestion_batch_documents)
+        drive_seen: Set[str] = set()
+
+        def sources() -> Iterator[SourceUnit]:
+            if video_urls:
+                yield from self.iter_youtube_sources(ingestor.pending(video_urls), self.config.youtube_fetch_concurrency * 2)
+            if web_urls:
+                yield from self.iter_web_sources(web_urls)
+            if drive_folder_id:
+                yield from self.iter_drive_sources(drive_folder_id, drive_seen)
+
+        ingestor.run(sources())
+        checkpoint.complete()
+        return drive_seen
+
     def ingest_documents(self, documents: List[Document]) -> None:
+        """
+        Ingests documents incrementally using the document registry.
+
+        Documents are grouped by their source (video, page, Drive file). Sources
+        whose content hash is unchanged are skipped; changed sources are
+        re-embedded and their previous nodes deleted once the new ones are written.
+        """
         if not documents:
             return
 
-        filtered_documents = []
-        try:
-            existing_urls = set()
-            try:
-                all_nodes = self.vector_store._get_all() if hasattr(self.vector_store, '_get_all') else []
-                for node in all_nodes:
-                    url = node.metadata.get('url') if hasattr(node, 'metadata') and node.metadata else None
-                    if url:
-                        existing_urls.add(url)
-            except Exception as e:
-                print(f"Could not fetch existing URLs from vector store: {e}")
-
-            for doc in documents:
-                url = doc.metadata.get('url') if doc.metadata else None
-                if url and url in existing_urls:
-                    print(f"Skipping duplicate URL: {url}")
-                    continue
-                filtered_documents.append(doc)
-        except Exception as e:
-            print(f"Error during duplicate filtering: {e}")
-            filtered_documents = documents
+        by_source = defaultdict(list)
+        for doc in documents:
+            by_source[source_doc_id(doc)].append(doc)
+
+        existing = self.registry.lookup(by_source.keys())
+
+        to_ingest = []
+        pending = {}
+        stale_node_ids = []
+        for doc_id, source_docs in by_source.items():
+            # Identical Documents from one source (e.g. a Drive file converted once per page) are ingested once
+            unique_docs = list({doc.hash: doc for doc in source_docs}.values())
+            source_hash = content_hash(unique_docs)
+
+            entry = existing.get(doc_id)
+            if entry and entry.status == DocumentRegistry.ACTIVE and entry.content_hash == source_hash:
+                continue
+            if entry:
+                stale_node_ids.extend(entry.node_ids)
 
-        if not filtered_documents:
+            for i, doc in enumerate(unique_docs):
+                doc.id_ = f"{doc_id}#{i}"
+            to_ingest.extend(unique_docs)
+            pending[doc_id] = (source_scope(unique_docs[0]), source_hash)
+
+        skipped = len(by_source) - len(pending)
+        print(f"Document registry: {len(pending)} new or changed sources, {skipped} unchanged sources skipped.")
+
+        if not to_ingest:
             print("No new documents to ingest after filtering.")
             return
 
-        self.pipeline.run(documents=filtered_documents, show_progress=True)
+        if self.throughput_ingestor is not None:
+            nodes = self.throughput_ingestor.run(to_ingest)
+        else:
+            nodes = self.pipeline.run(documents=to_ingest, show_progress=True)
+            embedded = [node for node in nodes if node.embedding is not None]
+            with self.profiler.stage('vector_store_write', items=len(embedded)):
+                self.node_writer.add(embedded)
+
+        if self.cached_transformations:
+            print("Ingestion cache: " + ", ".join(t.stats() for t in self.cached_transformations))
+        if isinstance(self.title_extractor, SourceTitleExtractor):
+            print(self.title_extractor.stats())
+
+        node_ids_by_source = defaultdict(list)
+        for node in nodes:
+            node_ids_by_source[node.ref_doc_id.rsplit('#', 1)[0]].append(node.node_id)
+
+        if stale_node_ids:
+            self.node_writer.delete_nodes(node_ids=stale_node_ids)
+
+        self.registry.record([
+            RegistryEntry(doc_id, scope, source_hash, node_ids_by_source[doc_id], DocumentRegistry.ACTIVE)
+            for doc_id, (scope, source_hash) in pending.items()
+        ])
+        if self.dedup is not None:
+            self.dedup.commit()
+            print(self.dedup.stats())
+            # Signatures of ids written again in this batch were just recorded by commit()
+            written = {node.node_id for node in nodes}
+            self._forget_nodes([node_id for node_id in stale_node_ids if node_id not in written])
+        self.db_connection.bump_corpus_version()
+
+    def _forget_nodes(self, node_ids: List[str]) -> None:
+        """
+        Drops deleted nodes from the near-duplicate index. Sources whose duplicates
+        pointed at them lost that text, so they are queued for ingestion again.
+        """
+        if self.dedup is None or not node_ids:
+            return
+        doc_ids = self.dedup.remove(node_ids)
+        if doc_ids:
+            print(f"Near-duplicates: {len(doc_ids)} sources lost their canonical chunks and will be ingested again")
+            self.registry.invalidate(doc_ids)
+            self.drive_sync.forget([doc_id.split(':', 1)[1] for doc_id in doc_ids if doc_id.startswith('drive:')])
+
+    def tombstone_missing(self, scope: str, seen_doc_ids: Iterable[str]) -> None:
+        """
+        Removes sources in `scope` that no longer exist from the vector store.
+
+        Only call this after the full listing of a source succeeded (e.g. the
+        YouTube URL list or the Drive folder listing), otherwise a transient
+        failure would tombstone everything.
+        """
+        node_ids = self.registry.tombstone_missing(scope, seen_doc_ids)
+        if node_ids:
+            self.vector_store.delete_nodes(node_ids=node_ids)
+            self._forget_nodes(node_ids)
+            self.db_connection.bump_corpus_version()
 
 
 # ===============================
 # Main Entry Point
 # ===============================
-def main():
-    pipeline = RAGDataIngestion()
-
-    urls_to_scrape = [
-        "https://wso2.ai/",
-        "https://wso2.com/api-management/ai/",
-        "https://wso2.com/integration/ai/",
-        "https://wso2.com/identity-and-access-management/ai/",
-        "https://wso2.com/internal-developer-platform/ai/"
-    ]
-
-    # Fetch YouTube URLs from GitHub markdown file
-    
-    github_md_url = "https://raw.githubusercontent.com/RMCV-Rajapaksha/Agentic-RAG-AI/main/YouTubeURL.md"
-    
+def main(table_name: Optional[str] = None, vector_load_mode: Optional[str] = None) -> bool:
+    """
+    Runs a full ingestion of every source.
+
+    Args:
+        table_name (Optional[str]): Physical table to ingest into, e.g. a blue/green build
+            (default: the table DB_TABLE_NAME points at)
+        vector_load_mode (Optional[str]): Overrides VECTOR_LOAD_MODE
+
+    Returns:
+        bool: True if the ingestion completed without errors
+    """
+    pipeline = RAGDataIngestion(table_name, vector_load_mode)
+    # The profiler is process-wide; the report and the returned status describe this run only
+    pipeline.profiler.reset()
+    config = get_config()
+
+    urls_to_scrape = config.web_seed_urls
+
+    # Fetch YouTube URLs from the markdown list
     try:
-        response = requests.get(github_md_url)
-        response.raise_for_status()
-        md_content = response.text
-        
-        # Extract YouTube URLs using regex
-        youtube_url_pattern = r'https://www\.youtube\.com/watch\?v=[\w-]+'
-        urls_to_videos = re.findall(youtube_url_pattern, md_content)
-        
+        urls_to_videos = pipeline.list_youtube_urls(config.youtube_url_list)
         print(f"Found {len(urls_to_videos)} YouTube URLs from markdown file")
     except Exception as e:
         print(f"Error fetching URLs from markdown: {e}")
         urls_to_videos = []
-    
-    print(f"YouTube URLs to process: {urls_to_videos}")
 
+    print(f"YouTube URLs to process: {urls_to_videos}")
 
-    config = get_config()
     drive_folder_id = config.google_drive_folder_id
 
     try:
         all_documents = []
+        drive_seen = set()
 
-        if urls_to_videos:
-            youtube_documents = pipeline.process_youtube_videos(urls_to_videos)
-            all_documents.extend(youtube_documents)
-
-        if urls_to_scrape:
-            url_documents = pipeline.scrape_web_urls(urls_to_scrape)
-            all_documents.extend(url_documents)
-
-        if drive_folder_id:
-            print("Loading and converting Google Drive documents...")
-            drive_documents = pipeline.convert_drive_documents_to_markdown(drive_folder_id)
-            print(f"Loaded and converted {len(drive_documents)} documents from Google Drive.")
-            all_documents.extend(drive_documents)
-
-        if all_documents:
-            print(f"Ingesting {len(all_documents)} documents...")
-            pipeline.ingest_documents(all_documents)
+        if config.ingestion_mode == 'streaming':
+            drive_seen = pipeline.ingest_streaming(urls_to_videos, urls_to_scrape, drive_folder_id)
             print("✅ Data ingestion completed successfully!")
         else:
-            print("⚠️ No documents to ingest.")
+            if urls_to_videos:
+                youtube_documents = pipeline.process_youtube_videos(urls_to_videos)
+                all_documents.extend(youtube_documents)
+
+            if urls_to_scrape:
+                url_documents = pipeline.scrape_web_urls(urls_to_scrape)
+                all_documents.extend(url_documents)
+
+            if drive_folder_id:
+                print("Loading and converting Google Drive documents...")
+                drive_documents = pipeline.convert_drive_documents_to_markdown(drive_folder_id, drive_seen)
+                print(f"Loaded and converted {len(drive_documents)} documents from Google Drive.")
+                all_documents.extend(drive_documents)
+
+            if all_documents:
+                print(f"Ingesting {len(all_documents)} documents...")
+                pipeline.ingest_documents(all_documents)
+                print("✅ Data ingestion completed successfully!")
+            else:
+                print("⚠️ No documents to ingest.")
+
+        if pipeline.bulk_loader is not None:
+            with pipeline.profiler.stage('bulk_index_build'):
+                pipeline.bulk_loader.finish()
+        pipeline.commit_drive_sync()
+
+        # Remove sources that disappeared since the last run, only for listings that succeeded
+        if urls_to_videos:
+            pipeline.tombstone_missing('youtube', urls_to_videos)
+        if pipeline.crawler.exhausted:
+            # A crawl cut short by the page budget has not seen every page, so nothing is removed
+            pipeline.tombstone_missing('web', pipeline.crawler.frontier.urls())
+        if drive_seen:
+            pipeline.tombstone_missing(f"drive:{drive_folder_id}", drive_seen)
+
+        # Built with the HNSW settings recorded for the table, like its full-precision index
+        settings = pipeline.db_connection.table_settings(pipeline.db_connection.table_name)
+        if config.vector_index_quantization:
+            pipeline.db_connection.create_quantized_index(
+                config.vector_index_quantization, settings.hnsw_m, settings.hnsw_ef_construction
+            )
+
+        if config.matryoshka_dim:
+            pipeline.db_connection.create_matryoshka_index(
+                config.matryoshka_dim, settings.hnsw_m, settings.hnsw_ef_construction
+            )
+
+        # A table that is still being built is published once it is activated (see reindex.py)
+        if config.snapshot_dir and table_name is None:
+            SnapshotExporter(pipeline.db_connection, config.snapshot_dir).export()
 
     except Exception as e:
         print(f"❌ An error occurred during ingestion: {e}")
+        pipeline.profiler.metadata['error'] = str(e)
+    finally:
+        pipeline.close()
+
+    if config.run_report_dir:
+        pipeline.profiler.metadata.update({
+            'ingestion_mode': config.ingestion_mode,
+            'parallel': config.ingestion_parallel,
+            'table_name': pipeline.db_connection.table_name,
+            'vector_load_mode': pipeline.vector_load_mode,
+            'dedup_mode': config.dedup_mode,
+            'title_extractor': config.title_extractor,
+            'youtube_urls': len(urls_to_videos),
+            'web_seeds': len(urls_to_scrape),
+        })
+        pipeline.profiler.write(config.run_report_dir)
+    return 'error' not in pipeline.profiler.metadata
 
 
 if __name__ == "__main__":
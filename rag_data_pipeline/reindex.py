@@ -0,0 +1,126 @@
+# Local imports
+from main import main as run_ingestion
+from database.blue_green import BlueGreenIndex
+from database.db import DatabaseConnection, IndexSettings
+from database.snapshot import SnapshotExporter
+from config.config import get_config
+
+# Standard imports
+import argparse
+import json
+import sys
+
+
+def _print_versions(index: BlueGreenIndex) -> None:
+    pointer = index.pointer()
+    print(f"{index.alias} -> {pointer['active']}" + (f" (previous: {pointer['previous']})" if pointer['previous'] else ""))
+    for version in index.versions():
+        settings = version['settings']
+        recall = ((version['validation'] or {}).get('recall_check') or {}).get('recall')
+        print(
+            f"  v{version['version']:<3} {version['table_name']:<28} {version['status']:<10} "
+            f"{settings['embed_model']}/{settings['embed_dim']} chunk {settings['chunk_size']}/{settings['chunk_overlap']} "
+            f"hnsw m={settings['hnsw_m']} ef={settings['hnsw_ef_construction']}"
+            + (f"  recall {recall:.0%}" if recall is not None else "")
+        )
+
+
+def _validate(index: BlueGreenIndex, table_name: str) -> dict:
+    config = get_config()
+    return index.validate(
+        table_name,
+        min_source_ratio=config.blue_green_min_source_ratio,
+        min_recall=config.blue_green_min_recall,
+        sample_size=config.blue_green_sample_size,
+        top_k=config.blue_green_top_k,
+    )
+
+
+def _publish(table_name: str) -> None:
+    config = get_config()
+    if config.snapshot_dir:
+        # The rag replica only serves snapshots of the table the alias points at
+        SnapshotExporter(DatabaseConnection(table_name), config.snapshot_dir).export()
+
+
+def main():
+    config = get_config()
+    defaults = IndexSettings.from_config()
+    parser = argparse.ArgumentParser(
+        description="Blue/green vector tables: build a new table next to the live one, validate it, switch the alias."
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    commands.add_parser('status', help="show where the alias points and every table version")
+
+    build = commands.add_parser('build', help="ingest every source into a new table, validate and activate it")
+    build.add_argument('--embed-model', default=defaults.embed_model)
+    build.add_argument('--embed-dim', type=int, default=defaults.embed_dim)
+    build.add_argument('--chunk-size', type=int, default=defaults.chunk_size)
+    build.add_argument('--chunk-overlap', type=int, default=defaults.chunk_overlap)
+    build.add_argument('--hnsw-m', type=int, default=defaults.hnsw_m)
+    build.add_argument('--hnsw-ef-construction', type=int, default=defaults.hnsw_ef_construction)
+    build.add_argument('--no-activate', action='store_true', help="stop after validation")
+
+    validate = commands.add_parser('validate', help="compare a built table with the live one")
+    validate.add_argument('table_name')
+
+    activate = commands.add_parser('activate', help="point the alias at a validated table")
+    activate.add_argument('table_name')
+    activate.add_argument('--force', action='store_true', help="activate without a passed validation")
+
+    commands.add_parser('rollback', help="point the alias back at the previous table")
+
+    drop = commands.add_parser('drop', help="drop a table that is neither active nor the rollback target")
+    drop.add_argument('table_name')
+
+    args = parser.parse_args()
+    index = BlueGreenIndex(DatabaseConnection())
+
+    if args.command == 'status':
+        _print_versions(index)
+
+    elif args.command == 'build':
+        settings = IndexSettings(
+            embed_model=args.embed_model,
+            embed_dim=args.embed_dim,
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            hnsw_m=args.hnsw_m,
+            hnsw_ef_construction=args.hnsw_ef_construction,
+        )
+        table_name = index.create_version(settings)
+        # Bulk loading builds the indexes once at the end; nothing reads the new table yet
+        if not run_ingestion(table_name, 'bulk'):
+            print(f"❌ Build of {table_name} did not complete; run the build again to resume it.")
+            sys.exit(1)
+        report = _validate(index, table_name)
+        if not report['passed']:
+            print(f"❌ {table_name} failed validation: {'; '.join(report['errors'])}")
+            sys.exit(1)
+        if args.no_activate:
+            print(f"✅ {table_name} is validated; activate it with: python reindex.py activate {table_name}")
+        else:
+            index.activate(table_name)
+            _publish(table_name)
+            print(f"✅ {config.db_table_name} now serves {table_name}")
+
+    elif args.command == 'validate':
+        report = _validate(index, args.table_name)
+        print(json.dumps(report, indent=2))
+        if not report['passed']:
+            sys.exit(1)
+
+    elif args.command == 'activate':
+        index.activate(args.table_name, force=args.force)
+        _publish(args.table_name)
+
+    elif args.command == 'rollback':
+        _publish(index.rollback())
+
+    elif args.command == 'drop':
+        index.drop(args.table_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+# Local imports
+from main import RAGDataIngestion
+from database.db import DatabaseConnection
+from database.registry import DocumentRegistry
+from src.ingestion.streaming import SourceUnit
+from src.jobs.api import make_server
+from src.jobs.queue import Job, JobQueue
+from src.jobs.runner import JobRunner, Schedule
+from src.youtube_transcripts.llm_limiter import LLMRateLimiter
+from config.config import get_config
+
+# Standard imports
+import argparse
+import json
+import signal
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+
+# Job types and the payload field that names their source
+JOB_TYPES = {
+    'youtube_video': 'url',         # one video
+    'web_page': 'url',              # one page, also outside the crawl's link prefixes
+    'drive_folder': 'folder_id',    # incremental sync: only new or changed files are downloaded and converted
+    'youtube_list': 'url',          # Markdown URL list: enqueues videos not ingested yet, tombstones removed ones
+    'web_crawl': 'seeds',           # crawl from seed URLs; a complete crawl tombstones pages that are gone
+}
+
+
+def validate_job(job_type: str, payload: Dict[str, Any]) -> None:
+    """Raises ValueError for unknown job types and payloads without their source."""
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Unsupported job type '{job_type}'. Expected one of {list(JOB_TYPES)}.")
+    key = JOB_TYPES[job_type]
+    value = payload.get(key)
+    if job_type == 'web_crawl':
+        if not isinstance(value, list) or not value or not all(isinstance(url, str) and url for url in value):
+            raise ValueError("web_crawl jobs need 'seeds', a list of URLs")
+    elif not isinstance(value, str) or not value:
+        raise ValueError(f"{job_type} jobs need '{key}'")
+
+
+def job_dedupe_key(job_type: str, payload: Dict[str, Any]) -> str:
+    """One pending job per source: enqueueing a source that is already queued or running is a no-op."""
+    value = payload[JOB_TYPES[job_type]]
+    return f"{job_type}:{','.join(value) if isinstance(value, list) else value}"
+
+
+def enqueue_job(queue: JobQueue, job_type: str, payload: Dict[str, Any], priority: int = 100) -> Optional[int]:
+    validate_job(job_type, payload)
+    return queue.enqueue(
+        job_type,
+        payload,
+        dedupe_key=job_dedupe_key(job_type, payload),
+        priority=priority,
+        max_attempts=get_config().job_max_attempts,
+    )
+
+
+def open_queue() -> JobQueue:
+    # Keyed by the alias, so queued jobs survive a blue/green switch of the physical table
+    db_connection = DatabaseConnection()
+    return JobQueue(db_connection.get_engine(), db_connection.alias)
+
+
+class IngestionService:
+    """
+    Long-running ingestion service: per-source jobs from a persistent queue
+    run on a JobRunner against one RAGDataIngestion, so new content is
+    indexed minutes after it is enqueued or found by a scheduled re-sync.
+
+    Fetching, transcript formatting, scraping and conversion run concurrently
+    on the workers of each job type. Writes to the index (ingest_documents,
+    tombstoning, Drive sync commits) are serialized, since the registry, the
+    near-duplicate index and the pipeline's transformations are shared. The
+    crawl frontier and the Drive sync plan allow one run at a time, so crawl
+    and Drive jobs also hold a lock of their own.
+
+    When reindex.py points DB_TABLE_NAME at another table, the next job after
+    the check (every TABLE_ALIAS_REFRESH_SECONDS) gets a pipeline for the new
+    table; jobs already running finish on the one they started with.
+    """
+
+    def __init__(self, queue: JobQueue):
+        self.config = get_config()
+        self.queue = queue
+        self.pipeline = self._open_pipeline()
+        self._alias_checked = time.monotonic()
+        self._pipeline_lock = threading.Lock()
+        self._ingest_lock = threading.Lock()
+        self._crawl_lock = threading.Lock()
+        self._drive_lock = threading.Lock()
+        # Shared by every youtube_video worker, so the LLM limits hold for the whole service
+        self._youtube_limiter = LLMRateLimiter(
+            max_concurrency=self.config.youtube_llm_concurrency,
+            tokens_per_minute=self.config.youtube_llm_tokens_per_minute,
+        )
+
+        handlers = {
+            'youtube_video': self.run_youtube_video,
+            'web_page': self.run_web_page,
+            'drive_folder': self.run_drive_folder,
+            'youtube_list': self.run_youtube_list,
+            'web_crawl': self.run_web_crawl,
+        }
+        self.runner = JobRunner(
+            queue,
+            {job_type: self._profiled(job_type, handler) for job_type, handler in handlers.items()},
+            self.config.job_concurrency,
+            schedules=self._schedules(),
+            lease_seconds=self.config.job_lease_seconds,
+            poll_seconds=self.config.job_poll_seconds,
+            retry_base_seconds=self.config.job_retry_base_seconds,
+            retry_max_seconds=self.config.job_retry_max_seconds,
+            max_attempts=self.config.job_max_attempts,
+        )
+
+    def _schedules(self) -> List[Schedule]:
+        scheduled = [
+            ('youtube_list', self.config.youtube_resync_minutes, {'url': self.config.youtube_url_list}),
+            ('web_crawl', self.config.web_resync_minutes, {'seeds': self.config.web_seed_urls}),
+            ('drive_folder', self.config.drive_resync_minutes, {'folder_id': self.config.google_drive_folder_id}),
+        ]
+        schedules = []
+        for job_type, minutes, payload in scheduled:
+            if minutes and all(payload.values()):
+                schedules.append(Schedule(
+                    f"resync:{job_dedupe_key(job_type, payload)}", minutes * 60, job_type, payload,
+                    dedupe_key=job_dedupe_key(job_type, payload),
+                ))
+        return schedules
+
+    @staticmethod
+    def _open_pipeline() -> RAGDataIngestion:
+        pipeline = RAGDataIngestion()
+        if pipeline.bulk_loader is not None:
+            raise ValueError("The ingestion service writes to the live table; set VECTOR_LOAD_MODE=insert.")
+        return pipeline
+
+    def _current_pipeline(self) -> RAGDataIngestion:
+        """The pipeline for the table the alias points at, rebuilt after a blue/green switch."""
+        with self._pipeline_lock:
+            if time.monotonic() - self._alias_checked >= self.config.table_alias_refresh_seconds:
+                self._alias_checked = time.monotonic()
+                try:
+                    table_name = self.pipeline.db_connection.resolve_alias()
+                except Exception as e:
+                    print(f"Error resolving table alias, keeping {self.pipeline.db_connection.table_name}: {e}")
+                    table_name = self.pipeline.db_connection.table_name
+                if table_name != self.pipeline.db_connection.table_name:
+                    print(f"{self.config.db_table_name} now points at {table_name}; switching the pipeline")
+                    # Waits for the write in progress on the old table
+                    with self._ingest_lock:
+                        self.pipeline.close()
+                        self.pipeline = self._open_pipeline()
+            return self.pipeline
+
+    def _profiled(self, job_type: str, handler):
+        def run(job: Job) -> Dict[str, Any]:
+            pipeline = self._current_pipeline()
+            with pipeline.profiler.stage(f"job_{job_type}", items=1):
+                return handler(job, pipeline)
+        return run
+
+    def _ingest(self, pipeline: RAGDataIngestion, units: Iterable[SourceUnit]) -> Dict[str, int]:
+        """Writes the Documents of the sources in batches, keeping each source's Documents in one batch."""
+        batch: list = []
+        documents = sources = 0
+        for _, source_documents in units:
+            if not source_documents:
+                continue
+            batch.extend(source_documents)
+            sources += 1
+            if len(batch) >= self.config.ingestion_batch_documents:
+                self._write(pipeline, batch)
+                documents += len(batch)
+                batch = []
+        if batch:
+            self._write(pipeline, batch)
+            documents += len(batch)
+        return {'documents': documents, 'sources': sources}
+
+    def _write(self, pipeline: RAGDataIngestion, documents: list) -> None:
+        with self._ingest_lock:
+            pipeline.ingest_documents(documents)
+
+    def _tombstone(self, pipeline: RAGDataIngestion, scope: str, seen: Set[str]) -> None:
+        with self._ingest_lock:
+            pipeline.tombstone_missing(scope, seen)
+
+    def run_youtube_video(self, job: Job, pipeline: RAGDataIngestion) -> Dict[str, Any]:
+        url = job.payload['url']
+        return self._ingest(pipeline, [(url, pipeline.process_youtube_video(url, self._youtube_limiter))])
+
+    def run_web_page(self, job: Job, pipeline: RAGDataIngestion) -> Dict[str, Any]:
+        url = job.payload['url']
+        return self._ingest(pipeline, [(url, [pipeline.scrape_web_page(url)])])
+
+    def run_drive_folder(self, job: Job, pipeline: RAGDataIngestion) -> Dict[str, Any]:
+        folder_id = job.payload['folder_id']
+        with self._drive_lock:
+            seen: Set[str] = set()
+            result = self._ingest(pipeline, pipeline.iter_drive_sources(folder_id, seen))
+            with self._ingest_lock:
+                pipeline.commit_drive_sync()
+            if seen:
+                self._tombstone(pipeline, f"drive:{folder_id}", seen)
+        return result
+
+    def run_youtube_list(self, job: Job, pipeline: RAGDataIngestion) -> Dict[str, Any]:
+        urls = pipeline.list_youtube_urls(job.payload['url'])
+        existing = pipeline.registry.lookup(urls)
+        new_urls = [
+            url for url in urls if url not in existing or existing[url].status != DocumentRegistry.ACTIVE
+        ]
+        enqueued = sum(
+            enqueue_job(self.queue, 'youtube_video', {'url': url, 'origin': 'youtube_list'}) is not None
+            for url in new_urls
+        )
+        if urls:
+            # Videos enqueued by hand are kept even though the list does not have them
+            self._tombstone(pipeline, 'youtube', set(urls) | self.queue.pinned_urls('youtube_video'))
+        return {'listed': len(urls), 'new': len(new_urls), 'enqueued': enqueued}
+
+    def run_web_crawl(self, job: Job, pipeline: RAGDataIngestion) -> Dict[str, Any]:
+        with self._crawl_lock:
+            # A retried crawl continues from its frontier instead of starting over
+            resume = job.attempts > 1 or self.config.crawl_resume
+            result = self._ingest(pipeline, pipeline.iter_web_sources(job.payload['seeds'], resume=resume))
+            if pipeline.crawler.exhausted:
+                # A crawl cut short by the page budget has not seen every page, so nothing is removed
+                seen = set(pipeline.crawler.frontier.urls()) | self.queue.pinned_urls('web_page')
+                self._tombstone(pipeline, 'web', seen)
+        return result
+
+    def enqueue(self, job_type: str, payload: Dict[str, Any], priority: int = 100) -> Optional[int]:
+        return enqueue_job(self.queue, job_type, payload, priority)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': [job._asdict() for job in self.runner.running()],
+            'table_name': self.pipeline.db_connection.table_name,
+            # Running totals per stage since the service started
+            'profile': self.pipeline.profiler.report(),
+        }
+
+    def serve(self, host: str, port: int) -> None:
+        """Runs the workers, the scheduler and the HTTP API until SIGINT or SIGTERM."""
+        server = make_server(self.queue, self.enqueue, self.stats, host, port)
+        # shutdown() waits for serve_forever to return, so it cannot run on the main thread
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=server.shutdown).start())
+        self.runner.start()
+        print(f"Ingestion service listening on http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("Stopping ingestion service, waiting for running jobs...")
+            server.server_close()
+            self.runner.stop(timeout=self.config.job_lease_seconds)
+            self.pipeline.close()
+            if self.config.run_report_dir:
+                self.pipeline.profiler.write(self.config.run_report_dir)
+
+
+# ===============================
+# Command Line Interface
+# ===============================
+def _print_jobs(jobs: List[Job]) -> None:
+    for job in jobs:
+        source = job.payload.get(JOB_TYPES.get(job.job_type, ''), job.payload)
+        print(
+            f"{job.job_id:>7}  {job.job_type:<14} {job.status:<10} {job.attempts}/{job.max_attempts}  "
+            f"{job.created_at:%Y-%m-%d %H:%M}  {source}"
+        )
+
+
+def main():
+    config = get_config()
+    parser = argparse.ArgumentParser(description="Ingestion job service: run workers, enqueue and inspect jobs.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="run workers, scheduled re-syncs and the HTTP API")
+    serve.add_argument('--host', default=config.job_api_host)
+    serve.add_argument('--port', type=int, default=config.job_api_port)
+
+    enqueue = commands.add_parser('enqueue', help="enqueue jobs, one per source (all seeds form one web_crawl job)")
+    enqueue.add_argument('job_type', choices=list(JOB_TYPES))
+    enqueue.add_argument('sources', nargs='+', help="URLs, or the Drive folder id")
+    enqueue.add_argument('--priority', type=int, default=100, help="lower runs first")
+
+    list_jobs = commands.add_parser('list', help="list recent jobs")
+    list_jobs.add_argument('--status', choices=list(JobQueue.STATUSES))
+    list_jobs.add_argument('--type', dest='job_type', choices=list(JOB_TYPES))
+    list_jobs.add_argument('--limit', type=int, default=50)
+
+    for name, help_text in (('show', "show one job"), ('retry', "queue a failed or cancelled job again"),
+                            ('cancel', "cancel a queued job")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('job_id', type=int)
+
+    commands.add_parser('stats', help="job counts per type and status")
+
+    args = parser.parse_args()
+    queue = open_queue()
+
+    if args.command == 'serve':
+        IngestionService(queue).serve(args.host, args.port)
+
+    elif args.command == 'enqueue':
+        key = JOB_TYPES[args.job_type]
+        payloads = (
+            [{key: args.sources}] if args.job_type == 'web_crawl'
+            else [{key: source} for source in args.sources]
+        )
+        for payload in payloads:
+            job_id = enqueue_job(queue, args.job_type, payload, args.priority)
+            if job_id is None:
+                print(f"Already queued or running: {payload[key]}")
+            else:
+                print(f"Enqueued {args.job_type} job {job_id}: {payload[key]}")
+
+    elif args.command == 'list':
+        _print_jobs(queue.list(args.status, args.job_type, args.limit))
+
+    elif args.command == 'show':
+        job = queue.get(args.job_id)
+        if job is None:
+            print(f"Job {args.job_id} not found")
+        else:
+            print(json.dumps(job._asdict(), indent=2, default=str))
+
+    elif args.command == 'retry':
+        done = queue.retry(args.job_id)
+        print(f"Job {args.job_id} queued again" if done else f"Job {args.job_id} is not failed or cancelled, or is already pending")
+
+    elif args.command == 'cancel':
+        done = queue.cancel(args.job_id)
+        print(f"Job {args.job_id} cancelled" if done else f"Job {args.job_id} is not queued")
+
+    elif args.command == 'stats':
+        print(json.dumps(queue.counts(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import resource
+import signal
+import subprocess
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pdfplumber
+import pypandoc
+from markdownify import markdownify as md
+
+
+# Bump when the conversion output changes, so cached results are not reused
+CONVERSION_VERSION = "lightweight-v1"
+PANDOC_EXTENSIONS = (".docx", ".pptx", ".odt")
+HTML_EXTENSIONS = (".html", ".htm")
+SUPPORTED_EXTENSIONS = PANDOC_EXTENSIONS + HTML_EXTENSIONS + (".pdf", ".txt")
+
+
+class UnsupportedFormat(Exception):
+    """Raised for file types the converter does not handle."""
+
+
+class ConversionTimeout(Exception):
+    """Raised inside a worker when a conversion exceeds its time limit."""
+
+
+def _pandoc(source: str, timeout: Optional[float]) -> str:
+    # pandoc runs as a child process; subprocess.run kills it when the timeout expires
+    completed = subprocess.run(
+        [pypandoc.get_pandoc_path(), source, "--to", "markdown", "--wrap=none"],
+        capture_output=True,
+        check=True,
+        timeout=timeout,
+    )
+    return completed.stdout.decode("utf-8", errors="replace")
+
+
+def iter_markdown_parts(source: str, max_part_chars: int = 20000, timeout: Optional[float] = None) -> Iterator[dict]:
+    """
+    Converts a file to Markdown, yielding it in parts.
+
+    PDFs are read page by page and yielded in groups of whole pages of about
+    `max_part_chars`, each with 'page_start' and 'page_end', so a large PDF is
+    never held as one string. Other formats yield a single part.
+
+    Args:
+        source (str): Path of the downloaded file
+        max_part_chars (int): Target size of one PDF part
+        timeout (Optional[float]): Time limit for the pandoc subprocess
+
+    Returns:
+        Iterator[dict]: Parts with 'text' (and page numbers for PDFs)
+
+    Raises:
+        UnsupportedFormat: For file types other than docx/pptx/odt, pdf, txt and html
+    """
+    ext = Path(source).suffix.lower()
+
+    if ext in PANDOC_EXTENSIONS:
+        yield {"text": _pandoc(source, timeout)}
+
+    elif ext == ".pdf":
+        pages: List[str] = []
+        chars = 0
+        page_start = 1
+        with pdfplumber.open(source) as pdf:
+            for number, page in enumerate(pdf.pages, start=1):
+                pages.append(page.extract_text() or "")
+                chars += len(pages[-1])
+                # Drop the parsed layout of the page; pdfplumber otherwise keeps every page cached
+                page.close()
+                if chars >= max_part_chars:
+                    yield {"text": "\n".join(pages), "page_start": page_start, "page_end": number}
+                    pages, chars, page_start = [], 0, number + 1
+            if pages:
+                yield {"text": "\n".join(pages), "page_start": page_start, "page_end": page_start + len(pages) - 1}
+
+    elif ext == ".txt":
+        with open(source, "r", encoding="utf-8") as f:
+            yield {"text": f.read()}
+
+    elif ext in HTML_EXTENSIONS:
+        with open(source, "r", encoding="utf-8") as f:
+            yield {"text": md(f.read())}
+
+    else:
+        raise UnsupportedFormat(f"Unsupported format for {source}")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _limit_memory(memory_mb: int) -> None:
+    """Pool initializer: caps the address space a worker (and its pandoc child) may add."""
+    if not memory_mb:
+        return
+    with open("/proc/self/statm") as f:
+        current = int(f.read().split()[0]) * resource.getpagesize()
+    limit = current + memory_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _raise_timeout(signum, frame):
+    raise ConversionTimeout("conversion timed out")
+
+
+def _convert_to_file(source: str, target: str, max_part_chars: int, timeout: int) -> Dict[str, int]:
+    """Worker: streams the Markdown parts of `source` into a JSON lines file at `target`."""
+    signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.alarm(timeout)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    parts = chars = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for part in iter_markdown_parts(source, max_part_chars, timeout):
+                f.write(json.dumps(part) + "\n")
+                parts += 1
+                chars += len(part["text"])
+        os.replace(tmp_path, target)
+    finally:
+        signal.alarm(0)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {"parts": parts, "chars": chars}
+
+
+def read_parts(path: str) -> Iterator[dict]:
+    """Reads converted parts one at a time."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+class DriveConverter:
+    """
+    Converts downloaded Drive files to Markdown on a process pool.
+
+    Each conversion runs in a worker with a time limit (SIGALRM, plus the
+    pandoc subprocess timeout) and an address space cap, so one pathological
+    file fails on its own instead of stalling or exhausting the run. Results
+    are written as JSON lines of parts to a cache directory keyed by the
+    file's content hash and the converter version; unchanged files are never
+    converted twice. A worker that dies (e.g. killed by the OOM killer) breaks
+    the pool, so the files that were in flight are retried one per pool to
+    isolate the culprit.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        processes: Optional[int] = None,
+        timeout_seconds: int = 120,
+        memory_mb: int = 2048,
+        max_part_chars: int = 20000,
+    ):
+        """
+        Args:
+            cache_dir (str): Directory for converted parts, keyed by content hash
+            processes (Optional[int]): Worker processes (default: one per CPU)
+            timeout_seconds (int): Time limit per file
+            memory_mb (int): Address space a conversion may add, 0 disables the cap
+            max_part_chars (int): Target size of one PDF part
+        """
+        self.cache_dir = cache_dir
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout_seconds = timeout_seconds
+        self.memory_mb = memory_mb
+        self.max_part_chars = max_part_chars
+        os.makedirs(cache_dir, exist_ok=True)
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.converted = 0
+        self.cached = 0
+        self.failures: Counter = Counter()
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def _cache_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, f"{CONVERSION_VERSION}-{content_hash}.jsonl")
+
+    @staticmethod
+    def _failure_reason(error: BaseException) -> str:
+        if isinstance(error, (ConversionTimeout, subprocess.TimeoutExpired)):
+            return "timeout"
+        if isinstance(error, MemoryError):
+            return "memory"
+        if isinstance(error, UnsupportedFormat):
+            return "unsupported"
+        if isinstance(error, BrokenProcessPool):
+            return "crashed"
+        return "error"
+
+    def _run_pool(self, jobs: List[Tuple[str, str]], processes: int) -> Iterator[Tuple[str, Optional[BaseException]]]:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_limit_memory, initargs=(self.memory_mb,)) as pool:
+            futures = {
+                pool.submit(_convert_to_file, source, target, self.max_part_chars, self.timeout_seconds): source
+                for source, target in jobs
+            }
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    yield futures[future], None
+                except BaseException as e:
+                    yield futures[future], e
+
+    def convert_many(self, sources: List[str]) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        Converts files, yielding each as soon as it is done.
+
+        Args:
+            sources (List[str]): Paths of downloaded files
+
+        Returns:
+            Iterator[Tuple[str, Optional[str]]]: (source, parts file for read_parts), None for failed files
+        """
+        started = time.perf_counter()
+        targets: Dict[str, str] = {}
+        jobs = []
+        for source in sources:
+            try:
+                self.bytes += os.path.getsize(source)
+                target = self._cache_path(file_sha256(source))
+            except OSError as e:
+                print(f"Error converting {source}: {e}")
+                self.failures["error"] += 1
+                yield source, None
+                continue
+            targets[source] = target
+            if os.path.exists(target):
+                self.cached += 1
+                yield source, target
+            else:
+                jobs.append((source, target))
+
+        retry = []
+        if jobs:
+            for source, error in self._run_pool(jobs, min(self.processes, len(jobs))):
+                if isinstance(error, BrokenProcessPool):
+                    retry.append((source, targets[source]))
+                    continue
+                yield self._finish(source, targets[source], error)
+
+        # One pool per file, so a crash only takes down the file that caused it
+        for job in retry:
+            source, error = next(self._run_pool([job], 1))
+            yield self._finish(source, targets[source], error)
+
+        self.seconds += time.perf_counter() - started
+
+    def _finish(self, source: str, target: str, error: Optional[BaseException]) -> Tuple[str, Optional[str]]:
+        if error is None:
+            self.converted += 1
+            return source, target
+        reason = self._failure_reason(error)
+        self.failures[reason] += 1
+        print(f"Error converting {source} ({reason}): {error}")
+        return source, None
+
+    def stats(self) -> str:
+        files = self.converted + self.cached + sum(self.failures.values())
+        seconds = max(self.seconds, 1e-9)
+        failures = ", ".join(f"{reason} {count}" for reason, count in sorted(self.failures.items())) or "none"
+        return (
+            f"Drive conversion: {files} files ({self.converted} converted, {self.cached} cached), "
+            f"failures: {failures}; {self.bytes / 1024 / 1024:.1f} MiB in {self.seconds:.1f}s "
+            f"({files / seconds:.2f} files/sec, {self.bytes / 1024 / 1024 / seconds:.2f} MiB/sec)"
+        )
@@ -0,0 +1,415 @@
+import hashlib
+import io
+import mimetypes
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+# Native Google files have no binary content or md5; they are exported to a format the converter reads
+EXPORT_FORMATS = {
+    "application/vnd.google-apps.document": (
+        "application/vnd.openxmlformats-officedocument.wordprocessingml.document", ".docx"
+    ),
+    "application/vnd.google-apps.presentation": (
+        "application/vnd.openxmlformats-officedocument.presentationml.presentation", ".pptx"
+    ),
+}
+LIST_FIELDS = "nextPageToken, files(id, name, mimeType, modifiedTime, md5Checksum)"
+
+
+def _md5(path: str) -> str:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_key(file_id: str) -> str:
+    """Filesystem-safe name for a Drive file id."""
+    return hashlib.sha256(file_id.encode()).hexdigest()[:32]
+
+
+class DriveFile(NamedTuple):
+    file_id: str
+    name: str
+    mime_type: str
+    modified_time: str
+    # None for exported Google Docs, Slides
+    md5: Optional[str]
+
+    @property
+    def extension(self) -> str:
+        if self.mime_type in EXPORT_FORMATS:
+            return EXPORT_FORMATS[self.mime_type][1]
+        return os.path.splitext(self.name)[1].lower() or (mimetypes.guess_extension(self.mime_type) or "")
+
+
+class GoogleDriveClient:
+    """Drive API v3 access with a service account. API clients are not thread-safe, so each thread builds its own."""
+
+    def __init__(self, credentials_info: dict):
+        self._credentials_info = credentials_info
+        self._credentials = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _service(self):
+        if getattr(self._local, "service", None) is None:
+            from google.oauth2 import service_account
+            from googleapiclient.discovery import build
+
+            # Credentials are built on first use, so runs without Drive access never need them
+            with self._lock:
+                if self._credentials is None:
+                    self._credentials = service_account.Credentials.from_service_account_info(
+                        self._credentials_info, scopes=["https://www.googleapis.com/auth/drive.readonly"]
+                    )
+            self._local.service = build("drive", "v3", credentials=self._credentials, cache_discovery=False)
+        return self._local.service
+
+    def list_children(self, folder_id: str) -> List[dict]:
+        files, page_token = [], None
+        while True:
+            response = self._service().files().list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                fields=LIST_FIELDS,
+                pageSize=1000,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            ).execute()
+            files.extend(response.get("files", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return files
+
+    def start_page_token(self) -> str:
+        return self._service().changes().getStartPageToken(supportsAllDrives=True).execute()["startPageToken"]
+
+    def has_changes(self, page_token: str) -> bool:
+        response = self._service().changes().list(
+            pageToken=page_token, fields="changes(fileId)", pageSize=1,
+            supportsAllDrives=True, includeItemsFromAllDrives=True,
+        ).execute()
+        return bool(response.get("changes"))
+
+    def download(self, drive_file: DriveFile, path: str) -> None:
+        from googleapiclient.http import MediaIoBaseDownload
+
+        files = self._service().files()
+        if drive_file.mime_type in EXPORT_FORMATS:
+            request = files.export_media(fileId=drive_file.file_id, mimeType=EXPORT_FORMATS[drive_file.mime_type][0])
+        else:
+            request = files.get_media(fileId=drive_file.file_id, supportsAllDrives=True)
+        with io.FileIO(path, "wb") as f:
+            downloader = MediaIoBaseDownload(f, request, chunksize=8 * 1024 * 1024)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk()
+
+
+class LocalDriveClient:
+    """
+    Fake Drive backed by a local directory, for running the sync offline
+    (DRIVE_FAKE_DIR). The directory stands in for the synced folder; the
+    ids of everything below it are paths relative to it. modifiedTime is the
+    file mtime and md5Checksum the file's MD5, so edits, additions and
+    deletions in the directory behave like Drive changes.
+    """
+
+    def __init__(self, root: str, folder_id: str):
+        """
+        Args:
+            root (str): Directory standing in for the Drive folder
+            folder_id (str): Folder id the directory answers to
+        """
+        self.root = os.path.abspath(root)
+        self.folder_id = folder_id
+
+    def _path(self, item_id: str) -> str:
+        return self.root if item_id == self.folder_id else os.path.join(self.root, item_id)
+
+    def list_children(self, folder_id: str) -> List[dict]:
+        files = []
+        folder = self._path(folder_id)
+        for name in sorted(os.listdir(folder)):
+            path = os.path.join(folder, name)
+            stat = os.stat(path)
+            item = {
+                "id": os.path.relpath(path, self.root),
+                "name": name,
+                "modifiedTime": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+            }
+            if os.path.isdir(path):
+                item["mimeType"] = FOLDER_MIME_TYPE
+            else:
+                item["md5Checksum"] = _md5(path)
+                item["mimeType"] = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            files.append(item)
+        return files
+
+    def start_page_token(self) -> str:
+        digest = hashlib.sha256()
+        for directory, _, names in sorted(os.walk(self.root)):
+            for name in sorted(names):
+                stat = os.stat(os.path.join(directory, name))
+                digest.update(f"{directory}/{name}:{stat.st_mtime_ns}:{stat.st_size}\n".encode())
+        return digest.hexdigest()
+
+    def has_changes(self, page_token: str) -> bool:
+        return page_token != self.start_page_token()
+
+    def download(self, drive_file: DriveFile, path: str) -> None:
+        shutil.copyfile(self._path(drive_file.file_id), path)
+
+
+class SyncPlan(NamedTuple):
+    folder_id: str
+    # Every file currently in the folder tree, changed or not
+    files: Dict[str, DriveFile]
+    changed: List[DriveFile]
+    removed: List[str]
+    page_token: str
+
+
+class DriveSync:
+    """
+    Incremental sync of a Drive folder tree.
+
+    The id, modifiedTime and md5 checksum of every ingested file are stored
+    per folder together with a Drive change token. A run first asks the
+    changes feed whether anything changed since the token; if nothing did,
+    the folder is not even listed. Otherwise the tree is listed (metadata
+    only) and compared with the stored state, and only new or changed files
+    are downloaded, in parallel. Files that disappeared are reported so their
+    nodes can be tombstoned.
+
+    State is only written by commit(), after ingestion, so a failed run
+    retries everything it did not finish.
+    """
+
+    STATE_TABLE = "drive_sync_state"
+    FILES_TABLE = "drive_sync_files"
+
+    def __init__(self, client, engine: Engine, download_dir: str, max_workers: int = 8, table_prefix: str = ""):
+        """
+        Args:
+            client: GoogleDriveClient, or LocalDriveClient for offline runs
+            engine (Engine): Database holding the sync state
+            download_dir (str): Where downloaded files are kept, one per file id
+            max_workers (int): Parallel downloads
+            table_prefix (str): Prefix of the state tables; the state describes what one vector table holds
+        """
+        self.STATE_TABLE = f"{table_prefix}{self.STATE_TABLE}"
+        self.FILES_TABLE = f"{table_prefix}{self.FILES_TABLE}"
+        self.client = client
+        self.engine = engine
+        self.download_dir = download_dir
+        self.max_workers = max_workers
+        # Files to download again on the next run, see forget(); cleared once a commit has left them out
+        self._forgotten: Set[str] = set()
+        os.makedirs(download_dir, exist_ok=True)
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.STATE_TABLE} ("
+                "folder_id VARCHAR PRIMARY KEY, page_token VARCHAR NOT NULL, complete BOOLEAN NOT NULL, "
+                "synced_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            ))
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.FILES_TABLE} ("
+                "folder_id VARCHAR NOT NULL, file_id VARCHAR NOT NULL, name VARCHAR NOT NULL, "
+                "mime_type VARCHAR NOT NULL, modified_time VARCHAR NOT NULL, md5 VARCHAR, "
+                "PRIMARY KEY (folder_id, file_id))"
+            ))
+
+    def _stored_files(self, folder_id: str) -> Dict[str, DriveFile]:
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    f"SELECT file_id, name, mime_type, modified_time, md5 FROM {self.FILES_TABLE} "
+                    "WHERE folder_id = :folder_id"
+                ),
+                {"folder_id": folder_id},
+            ).fetchall()
+        return {row.file_id: DriveFile(row.file_id, row.name, row.mime_type, row.modified_time, row.md5) for row in rows}
+
+    def _list_tree(self, folder_id: str) -> Dict[str, DriveFile]:
+        files, pending = {}, [folder_id]
+        while pending:
+            for item in self.client.list_children(pending.pop()):
+                if item["mimeType"] == FOLDER_MIME_TYPE:
+                    pending.append(item["id"])
+                elif item["mimeType"].startswith("application/vnd.google-apps.") and item["mimeType"] not in EXPORT_FORMATS:
+                    # Forms, Sheets, shortcuts... have nothing the converter can read
+                    continue
+                else:
+                    files[item["id"]] = DriveFile(
+                        item["id"], item["name"], item["mimeType"], item["modifiedTime"], item.get("md5Checksum")
+                    )
+        return files
+
+    def plan(self, folder_id: str) -> SyncPlan:
+        """
+        Works out which files to download.
+
+        Args:
+            folder_id (str): Root folder of the sync
+
+        Returns:
+            SyncPlan: Current files, changed files and removed file ids
+        """
+        # Taken before listing, so changes made during the sync show up next time
+        page_token = self.client.start_page_token()
+        stored = self._stored_files(folder_id)
+        with self.engine.connect() as connection:
+            state = connection.execute(
+                text(f"SELECT page_token, complete FROM {self.STATE_TABLE} WHERE folder_id = :folder_id"),
+                {"folder_id": folder_id},
+            ).fetchone()
+
+        if state is not None and state.complete and not self.client.has_changes(state.page_token):
+            print(f"Drive sync: no changes in folder {folder_id} since the last run ({len(stored)} files)")
+            return SyncPlan(folder_id, stored, [], [], page_token)
+
+        files = self._list_tree(folder_id)
+        changed = [
+            drive_file for file_id, drive_file in files.items()
+            if file_id not in stored
+            or stored[file_id].modified_time != drive_file.modified_time
+            or stored[file_id].md5 != drive_file.md5
+        ]
+        removed = [file_id for file_id in stored if file_id not in files]
+        print(
+            f"Drive sync: {len(files)} files in folder {folder_id}, {len(changed)} new or changed, "
+            f"{len(removed)} removed, {len(files) - len(changed)} unchanged"
+        )
+        return SyncPlan(folder_id, files, changed, removed, page_token)
+
+    def _local_path(self, drive_file: DriveFile) -> str:
+        return os.path.join(self.download_dir, f"{_file_key(drive_file.file_id)}{drive_file.extension}")
+
+    def _download(self, drive_file: DriveFile) -> str:
+        path = self._local_path(drive_file)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            self.client.download(drive_file, tmp_path)
+            if drive_file.md5 and _md5(tmp_path) != drive_file.md5:
+                raise IOError(f"checksum mismatch for {drive_file.name}")
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def download(self, files: List[DriveFile]) -> Iterator[Tuple[DriveFile, Optional[str]]]:
+        """
+        Downloads files in parallel, yielding each as it finishes.
+
+        Returns:
+            Iterator[Tuple[DriveFile, Optional[str]]]: (file, local path), None when the download failed
+        """
+        if not files:
+            return
+        started = time.perf_counter()
+        downloaded = failed = 0
+        size = 0
+
+        def fetch(drive_file: DriveFile) -> Tuple[DriveFile, Optional[str]]:
+            try:
+                return drive_file, self._download(drive_file)
+            except Exception as e:
+                print(f"Error downloading {drive_file.name} from Google Drive: {e}")
+                return drive_file, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for drive_file, path in pool.map(fetch, files):
+                if path is None:
+                    failed += 1
+                else:
+                    downloaded += 1
+                    size += os.path.getsize(path)
+                yield drive_file, path
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"Drive sync: downloaded {downloaded} files ({size / 1024 / 1024:.1f} MiB) in {elapsed:.1f}s, "
+            f"{failed} failed"
+        )
+
+    def commit(self, plan: SyncPlan, synced: Set[str]) -> None:
+        """
+        Stores the state after ingestion.
+
+        Args:
+            plan (SyncPlan): The plan that was executed
+            synced (Set[str]): Ids of changed files that were downloaded and ingested
+        """
+        changed = {drive_file.file_id for drive_file in plan.changed}
+        rows = [
+            {"folder_id": plan.folder_id, **drive_file._asdict()}
+            for file_id, drive_file in plan.files.items()
+            if (file_id not in changed or file_id in synced) and file_id not in self._forgotten
+        ]
+        complete = all(drive_file.file_id in synced for drive_file in plan.changed) and not self._forgotten
+
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(f"DELETE FROM {self.FILES_TABLE} WHERE folder_id = :folder_id"), {"folder_id": plan.folder_id}
+            )
+            if rows:
+                connection.execute(
+                    text(
+                        f"INSERT INTO {self.FILES_TABLE} (folder_id, file_id, name, mime_type, modified_time, md5) "
+                        "VALUES (:folder_id, :file_id, :name, :mime_type, :modified_time, :md5)"
+                    ),
+                    rows,
+                )
+            connection.execute(
+                text(f"DELETE FROM {self.STATE_TABLE} WHERE folder_id = :folder_id"), {"folder_id": plan.folder_id}
+            )
+            connection.execute(
+                text(
+                    f"INSERT INTO {self.STATE_TABLE} (folder_id, page_token, complete) "
+                    "VALUES (:folder_id, :page_token, :complete)"
+                ),
+                {"folder_id": plan.folder_id, "page_token": plan.page_token, "complete": complete},
+            )
+
+        # Their rows are gone and the state is incomplete, so the next plan lists them as changed
+        self._forgotten.clear()
+
+        # Downloads of removed files are no longer needed
+        removed = {_file_key(file_id) for file_id in plan.removed}
+        for name in os.listdir(self.download_dir):
+            if os.path.splitext(name)[0] in removed:
+                os.remove(os.path.join(self.download_dir, name))
+        if not complete:
+            print("Drive sync: some files failed and will be retried on the next run")
+
+    def forget(self, file_ids: List[str]) -> None:
+        """
+        Marks files as not synced, so the next run downloads and ingests them again.
+
+        Args:
+            file_ids (List[str]): Drive file ids, in any folder
+        """
+        if not file_ids:
+            return
+        self._forgotten.update(file_ids)
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(f"DELETE FROM {self.FILES_TABLE} WHERE file_id = ANY(CAST(:file_ids AS VARCHAR[]))"),
+                {"file_ids": list(file_ids)},
+            )
+            # The change token alone would skip the listing that finds them again
+            connection.execute(text(f"UPDATE {self.STATE_TABLE} SET complete = FALSE"))
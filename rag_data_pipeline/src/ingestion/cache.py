@@ -0,0 +1,298 @@
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.ingestion.pipeline import get_transformation_hash
+from llama_index.core.schema import BaseNode, TransformComponent
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from sqlalchemy import bindparam, create_engine, make_url, text
+from sqlalchemy.engine import Engine
+
+
+class TransformationCacheStore:
+    """
+    Persistent key/value store for cached transformation outputs.
+
+    Works on any SQLAlchemy engine, so the same code backs a local SQLite file
+    (`sqlite:///.cache/ingestion_cache.db`) and the pipeline's Postgres database.
+    Entries carry their size and last access time; once the store grows past
+    `max_bytes`, the least recently used entries are evicted down to 90%.
+    Puts only add to a running total, an upper bound of the stored size; the
+    table is summed up again only when that bound crosses `max_bytes`.
+    """
+
+    TABLE = "ingestion_transform_cache"
+
+    def __init__(self, engine: Engine, max_bytes: int = 1024 * 1024 * 1024):
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self._total_bytes: Optional[int] = None
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+                "cache_key VARCHAR(64) PRIMARY KEY, "
+                "collection VARCHAR(128) NOT NULL, "
+                "value TEXT NOT NULL, "
+                "size_bytes INTEGER NOT NULL, "
+                "last_access DOUBLE PRECISION NOT NULL)"
+            ))
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {self.TABLE}_last_access_idx ON {self.TABLE} (last_access)"
+            ))
+
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Returns decoded values for the keys that are cached and refreshes their access time."""
+        if not keys:
+            return {}
+
+        found = {}
+        with self.engine.begin() as connection:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = connection.execute(
+                    text(f"SELECT cache_key, value FROM {self.TABLE} WHERE cache_key IN :keys").bindparams(
+                        bindparam("keys", expanding=True)
+                    ),
+                    {"keys": chunk},
+                ).fetchall()
+                found.update({row.cache_key: json.loads(row.value) for row in rows})
+                if rows:
+                    connection.execute(
+                        text(f"UPDATE {self.TABLE} SET last_access = :now WHERE cache_key IN :keys").bindparams(
+                            bindparam("keys", expanding=True)
+                        ),
+                        {"now": time.time(), "keys": [row.cache_key for row in rows]},
+                    )
+        return found
+
+    def put_many(self, collection: str, values: Dict[str, Any]) -> None:
+        if not values:
+            return
+
+        now = time.time()
+        rows = []
+        for key, value in values.items():
+            encoded = json.dumps(value)
+            rows.append({
+                "cache_key": key,
+                "collection": collection,
+                "value": encoded,
+                "size_bytes": len(encoded),
+                "last_access": now,
+            })
+
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(f"DELETE FROM {self.TABLE} WHERE cache_key IN :keys").bindparams(bindparam("keys", expanding=True)),
+                {"keys": list(values)},
+            )
+            connection.execute(
+                text(
+                    f"INSERT INTO {self.TABLE} (cache_key, collection, value, size_bytes, last_access) "
+                    "VALUES (:cache_key, :collection, :value, :size_bytes, :last_access)"
+                ),
+                rows,
+            )
+
+        if self._total_bytes is None:
+            self._total_bytes = self._stored_bytes()
+        else:
+            # Replaced entries are still counted, so this overestimates until the next sum
+            self._total_bytes += sum(row["size_bytes"] for row in rows)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def drop_stale_collections(self, prefix: str, current: str) -> int:
+        """
+        Deletes entries of collections starting with `prefix` other than `current`,
+        e.g. outputs produced with a previous version of a prompt.
+
+        Returns:
+            int: Number of entries deleted
+        """
+        with self.engine.begin() as connection:
+            result = connection.execute(
+                text(f"DELETE FROM {self.TABLE} WHERE collection LIKE :prefix AND collection <> :current"),
+                {"prefix": prefix + "%", "current": current},
+            )
+        return result.rowcount
+
+    def _stored_bytes(self) -> int:
+        with self.engine.connect() as connection:
+            return connection.execute(text(f"SELECT COALESCE(SUM(size_bytes), 0) FROM {self.TABLE}")).scalar()
+
+    def _evict(self) -> None:
+        with self.engine.begin() as connection:
+            total = connection.execute(text(f"SELECT COALESCE(SUM(size_bytes), 0) FROM {self.TABLE}")).scalar()
+            self._total_bytes = total
+            if total <= self.max_bytes:
+                return
+
+            to_free = total - int(self.max_bytes * 0.9)
+            victims = []
+            for row in connection.execute(
+                text(f"SELECT cache_key, size_bytes FROM {self.TABLE} ORDER BY last_access")
+            ):
+                victims.append(row.cache_key)
+                to_free -= row.size_bytes
+                self._total_bytes -= row.size_bytes
+                if to_free <= 0:
+                    break
+
+            for start in range(0, len(victims), 500):
+                connection.execute(
+                    text(f"DELETE FROM {self.TABLE} WHERE cache_key IN :keys").bindparams(
+                        bindparam("keys", expanding=True)
+                    ),
+                    {"keys": victims[start:start + 500]},
+                )
+        print(f"Ingestion cache: evicted {len(victims)} entries to stay under {self.max_bytes / 1024 / 1024:.0f} MiB")
+
+
+class CachedTransformation(TransformComponent):
+    """
+    Wraps an IngestionPipeline transformation with a persistent cache keyed by
+    node content hash plus the transformation's configuration.
+
+    IngestionCache hashes the whole batch at once, so one changed document
+    invalidates everything. Here each unit is cached on its own:
+        per_node=False  one entry per source document (node parsers, extractors
+                        such as TitleExtractor that look at all nodes of a document)
+        per_node=True   one entry per node, storing only the embedding
+    Only the misses are sent to the wrapped transformation, in a single call.
+    Nodes restored from a per-document entry get new ids, as a fresh parse
+    would: the stored ids belong to rows an earlier run wrote, which are
+    deleted by id once the source's new nodes are written.
+    """
+
+    transformation: TransformComponent
+    per_node: bool = False
+
+    _store: TransformationCacheStore = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, transformation: TransformComponent, store: TransformationCacheStore, per_node: bool = False):
+        super().__init__(transformation=transformation, per_node=per_node)
+        self._store = store
+
+    @property
+    def target(self) -> TransformComponent:
+        """
+        Transformation whose configuration goes into the cache key. Execution
+        wrappers (ParallelTransformation, ConcurrentEmbedding) are looked through,
+        so both ingestion modes share their cached outputs.
+        """
+        return getattr(self.transformation, "wrapped", self.transformation)
+
+    @property
+    def name(self) -> str:
+        return type(self.target).__name__
+
+    @property
+    def hit_rate(self) -> float:
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    def stats(self) -> str:
+        return f"{self.name}: {self._hits}/{self._hits + self._misses} hits ({self.hit_rate:.0%})"
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        if self.per_node:
+            return self._call_per_node(nodes, **kwargs)
+        return self._call_per_document(nodes, **kwargs)
+
+    def _call_per_node(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        keys = [get_transformation_hash([node], self.target) for node in nodes]
+        cached = self._store.get_many(list(set(keys)))
+
+        misses = [node for node, key in zip(nodes, keys) if key not in cached]
+        for node, key in zip(nodes, keys):
+            if key in cached:
+                node.embedding = cached[key]
+        self._hits += len(nodes) - len(misses)
+        self._misses += len(misses)
+
+        if misses:
+            transformed = self.transformation(misses, **kwargs)
+            self._store.put_many(self.name, {
+                get_transformation_hash([node], self.target): node.embedding
+                for node in transformed
+                if node.embedding is not None
+            })
+        return nodes
+
+    @staticmethod
+    def _with_new_ids(nodes: List[BaseNode]) -> List[BaseNode]:
+        """Gives the nodes of one document new ids and points their relationships (prev/next) at them."""
+        new_ids = {node.node_id: str(uuid.uuid4()) for node in nodes}
+        for node in nodes:
+            node.id_ = new_ids[node.node_id]
+            for related in node.relationships.values():
+                for info in related if isinstance(related, list) else [related]:
+                    if info.node_id in new_ids:
+                        info.node_id = new_ids[info.node_id]
+        return nodes
+
+    def _call_per_document(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        groups: "OrderedDict[str, List[BaseNode]]" = OrderedDict()
+        for node in nodes:
+            groups.setdefault(node.ref_doc_id or node.node_id, []).append(node)
+
+        keys = {doc_id: get_transformation_hash(group, self.target) for doc_id, group in groups.items()}
+        cached = self._store.get_many(list(set(keys.values())))
+
+        outputs: Dict[str, List[BaseNode]] = {}
+        miss_nodes = []
+        for doc_id, group in groups.items():
+            if keys[doc_id] in cached:
+                outputs[doc_id] = self._with_new_ids([json_to_doc(node_json) for node_json in cached[keys[doc_id]]])
+            else:
+                miss_nodes.extend(group)
+        self._hits += len(outputs)
+        self._misses += len(groups) - len(outputs)
+
+        if miss_nodes:
+            transformed = defaultdict(list)
+            for node in self.transformation(miss_nodes, **kwargs):
+                transformed[node.ref_doc_id or node.node_id].append(node)
+
+            new_entries = {}
+            for doc_id in groups:
+                if doc_id not in outputs:
+                    outputs[doc_id] = transformed.get(doc_id, [])
+                    new_entries[keys[doc_id]] = [doc_to_json(node) for node in outputs[doc_id]]
+            self._store.put_many(self.name, new_entries)
+
+        return [node for doc_id in groups for node in outputs[doc_id]]
+
+
+def cache_store_from_url(url: str, max_mb: int, postgres_engine: Optional[Engine] = None) -> Optional[TransformationCacheStore]:
+    """
+    Builds the cache store from INGESTION_CACHE_URL.
+
+    Args:
+        url (str): 'postgres' to reuse the pipeline database, any SQLAlchemy URL
+            (e.g. 'sqlite:///.cache/ingestion_cache.db'), or empty to disable
+        max_mb (int): Size limit before least recently used entries are evicted
+        postgres_engine (Optional[Engine]): Engine used when url is 'postgres'
+
+    Returns:
+        Optional[TransformationCacheStore]: The store, or None when caching is disabled
+    """
+    if not url:
+        return None
+
+    if url == "postgres":
+        engine = postgres_engine
+    else:
+        parsed = make_url(url)
+        if parsed.drivername.startswith("sqlite") and parsed.database:
+            os.makedirs(os.path.dirname(os.path.abspath(parsed.database)), exist_ok=True)
+        engine = create_engine(parsed)
+
+    return TransformationCacheStore(engine, max_bytes=max_mb * 1024 * 1024)
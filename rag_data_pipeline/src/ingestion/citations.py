@@ -0,0 +1,94 @@
+import re
+from typing import Any, List, Optional, Sequence
+
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+
+
+# Timestamps written into YouTube transcript Markdown, e.g. [123.45s]
+TIMESTAMP_PATTERN = re.compile(r"\[(\d+\.?\d*)s\]")
+HEADING_PATTERN = re.compile(r"^(#+)\s(.*)")
+
+# Citation fields added to every node. They are excluded from the embedding and
+# LLM metadata text so enrichment does not change the embeddings.
+CITATION_KEYS = [
+    "citation_url",
+    "citation_title",
+    "citation_heading_path",
+    "citation_start_seconds",
+    "citation_end_seconds",
+]
+
+# Metadata keys PGVectorStore builds btree indexes for (key, Postgres type).
+INDEXED_CITATION_KEYS = {
+    ("citation_url", "text"),
+    ("citation_start_seconds", "float"),
+}
+
+MAX_TITLE_LENGTH = 80
+HEADING_SEPARATOR = " > "
+
+
+class CitationEnricher(TransformComponent):
+    """
+    Computes citation fields for every node once at ingestion time, so the rag
+    service can format tool output straight from stored metadata.
+
+    Runs after MarkdownNodeParser and adds:
+        citation_url            canonical link, YouTube links carry &t=<start>s
+        citation_title          short display title
+        citation_heading_path   section headings leading to the node
+        citation_start_seconds  YouTube only, first timestamp in the node
+        citation_end_seconds    YouTube only, last timestamp in the node
+    """
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        for node in nodes:
+            node.metadata.update(self._citation_fields(node))
+            for key in CITATION_KEYS:
+                if key not in node.excluded_embed_metadata_keys:
+                    node.excluded_embed_metadata_keys.append(key)
+                if key not in node.excluded_llm_metadata_keys:
+                    node.excluded_llm_metadata_keys.append(key)
+        return nodes
+
+    def _citation_fields(self, node: BaseNode) -> dict:
+        metadata = node.metadata
+        content = node.get_content(metadata_mode=MetadataMode.NONE)
+
+        headings = self._heading_path(metadata.get("header_path", ""), content)
+        fields = {
+            "citation_url": metadata.get("url") or "N/A",
+            "citation_title": self._display_title(metadata.get("title"), headings),
+            "citation_heading_path": HEADING_SEPARATOR.join(headings),
+        }
+
+        if metadata.get("source") == "youtube_transcript":
+            timestamps = [float(t) for t in TIMESTAMP_PATTERN.findall(content)]
+            start = timestamps[0] if timestamps else metadata.get("start_seconds")
+            end = timestamps[-1] if len(timestamps) > 1 else metadata.get("end_seconds")
+            fields["citation_start_seconds"] = start
+            fields["citation_end_seconds"] = end
+            if metadata.get("url") and start is not None:
+                fields["citation_url"] = f"{metadata['url']}&t={int(float(start))}s"
+
+        return fields
+
+    @staticmethod
+    def _heading_path(header_path: str, content: str) -> List[str]:
+        """Parent headings from MarkdownNodeParser plus the node's own heading."""
+        headings = [h for h in header_path.split("/") if h.strip()]
+        first_line = content.lstrip().split("\n", 1)[0]
+        match = HEADING_PATTERN.match(first_line)
+        if match:
+            headings.append(match.group(2))
+        return [TIMESTAMP_PATTERN.sub("", h).strip() for h in headings]
+
+    @staticmethod
+    def _display_title(title: Optional[str], headings: List[str]) -> str:
+        title = (title or "").strip()
+        if len(title) > MAX_TITLE_LENGTH:
+            title = title[:MAX_TITLE_LENGTH - 1].rstrip() + "…"
+        section = headings[-1] if headings else ""
+        if title and section:
+            return f"{title} - {section}"
+        return title or section or "N/A"
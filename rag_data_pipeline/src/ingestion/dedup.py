@@ -0,0 +1,274 @@
+import hashlib
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from src.ingestion.citations import TIMESTAMP_PATTERN
+from src.youtube_transcripts.llm_limiter import count_tokens
+
+
+# DEDUP_MODE values: keep every chunk, drop near-duplicates, or keep them linked to their canonical chunk
+DEDUP_MODES = ("off", "drop", "link")
+# Metadata set on linked duplicates; excluded from the embedding and LLM text
+DUPLICATE_KEYS = ["duplicate_of", "duplicate_similarity"]
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def _shingles(content: str, size: int) -> List[str]:
+    """Word shingles of a chunk, ignoring case, punctuation, Markdown markup and transcript timestamps."""
+    words = re.findall(r"\w+", TIMESTAMP_PATTERN.sub(" ", content).lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def _lsh_shape(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Bands and rows per band for the LSH index.
+
+    Picks the largest number of rows whose collision threshold (1/bands)^(1/rows)
+    stays 0.1 below `threshold`, so pairs at the threshold are almost always
+    candidates and precision comes from comparing the full signatures afterwards.
+    """
+    shape = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows == 0 and (1 / (num_perm // rows)) ** (1 / rows) <= threshold - 0.1:
+            shape = (num_perm // rows, rows)
+    return shape
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, with a fixed seed so signatures are comparable across runs."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # a * h stays below 2**64 for 32 bit shingle hashes, so uint64 arithmetic never wraps
+        self._a = rng.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, content: str) -> Optional[np.ndarray]:
+        shingles = _shingles(content, self.shingle_size)
+        if not shingles:
+            return None
+        hashes = np.array(
+            [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles],
+            dtype=np.uint64,
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(MERSENNE_PRIME) & np.uint64(MAX_HASH)
+        return permuted.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateFilter(TransformComponent):
+    """
+    Finds chunks that nearly repeat a chunk already in the index.
+
+    Runs between the node parser and embedding. Each chunk gets a MinHash
+    signature over its word shingles; an LSH index over the signatures of
+    every chunk in the vector store (persisted in `<table>_minhash`, loaded
+    on first use) yields candidates, which count as duplicates when their
+    estimated Jaccard similarity reaches `threshold`. Only chunks of other
+    sources are matched, so a changed document never collapses onto its own
+    previous version. Duplicates are dropped before embedding ('drop') or kept
+    with `duplicate_of` pointing at the canonical chunk ('link').
+
+    New signatures are held in memory until commit(), which the caller runs
+    once the nodes are written.
+    """
+
+    mode: str = "drop"
+    threshold: float = 0.9
+
+    _engine: Engine = PrivateAttr()
+    _table: str = PrivateAttr()
+    _hasher: MinHasher = PrivateAttr()
+    _bands: int = PrivateAttr()
+    _rows: int = PrivateAttr()
+    _loaded: bool = PrivateAttr(default=False)
+    # Canonical chunks: node id -> (source doc id, signature), and LSH buckets -> node ids
+    _signatures: Dict[str, Tuple[str, np.ndarray]] = PrivateAttr(default_factory=dict)
+    _buckets: Dict[Tuple[int, bytes], List[str]] = PrivateAttr(default_factory=lambda: defaultdict(list))
+    _pending: List[dict] = PrivateAttr(default_factory=list)
+    _counts: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def __init__(
+        self,
+        engine: Engine,
+        table: str,
+        mode: str = "drop",
+        threshold: float = 0.9,
+        num_perm: int = 128,
+        shingle_size: int = 5,
+    ):
+        """
+        Args:
+            engine (Engine): Database holding the signature index
+            table (str): Signature table name
+            mode (str): 'drop' or 'link'
+            threshold (float): Estimated Jaccard similarity at which a chunk is a duplicate
+            num_perm (int): MinHash permutations per signature
+            shingle_size (int): Words per shingle
+        """
+        super().__init__(mode=mode, threshold=threshold)
+        self._engine = engine
+        self._table = table
+        self._hasher = MinHasher(num_perm, shingle_size)
+        self._bands, self._rows = _lsh_shape(num_perm, threshold)
+        self._counts = {"chunks": 0, "dropped": 0, "linked": 0, "tokens_saved": 0}
+        with self._engine.begin() as connection:
+            connection.execute(text(
+                f'CREATE TABLE IF NOT EXISTS public."{table}" ('
+                "node_id VARCHAR PRIMARY KEY, "
+                "doc_id VARCHAR NOT NULL, "
+                "signature BYTEA NOT NULL, "
+                "canonical_id VARCHAR, "
+                "dropped BOOLEAN NOT NULL DEFAULT FALSE)"
+            ))
+            connection.execute(text(
+                f'CREATE INDEX IF NOT EXISTS "{table}_canonical_idx" ON public."{table}" (canonical_id)'
+            ))
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "NearDuplicateFilter"
+
+    @staticmethod
+    def _doc_id(node: BaseNode) -> str:
+        return (node.ref_doc_id or node.node_id).rsplit("#", 1)[0]
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [
+            (band, signature[band * self._rows:(band + 1) * self._rows].tobytes()) for band in range(self._bands)
+        ]
+
+    def _index(self, node_id: str, doc_id: str, signature: np.ndarray) -> None:
+        self._signatures[node_id] = (doc_id, signature)
+        for key in self._band_keys(signature):
+            self._buckets[key].append(node_id)
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._engine.connect() as connection:
+            rows = connection.execute(text(
+                f'SELECT node_id, doc_id, signature FROM public."{self._table}" WHERE canonical_id IS NULL'
+            )).fetchall()
+        for row in rows:
+            self._index(row.node_id, row.doc_id, np.frombuffer(bytes(row.signature), dtype=np.uint32))
+        self._loaded = True
+
+    def _match(self, doc_id: str, signature: np.ndarray) -> Optional[Tuple[str, float]]:
+        best = None
+        candidates = {node_id for key in self._band_keys(signature) for node_id in self._buckets.get(key, ())}
+        for node_id in candidates:
+            if node_id not in self._signatures:
+                continue
+            other_doc_id, other = self._signatures[node_id]
+            if other_doc_id == doc_id:
+                continue
+            similarity = float(np.mean(signature == other))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (node_id, similarity)
+        return best
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        self._load()
+        kept = []
+        for node in nodes:
+            content = node.get_content(metadata_mode=MetadataMode.NONE)
+            signature = self._hasher.signature(content)
+            if signature is None:
+                kept.append(node)
+                continue
+            self._counts["chunks"] += 1
+            doc_id = self._doc_id(node)
+            match = self._match(doc_id, signature)
+            row = {"node_id": node.node_id, "doc_id": doc_id, "signature": signature.tobytes(), "canonical_id": None, "dropped": False}
+
+            if match is None:
+                self._index(node.node_id, doc_id, signature)
+                kept.append(node)
+            elif self.mode == "drop":
+                row.update(canonical_id=match[0], dropped=True)
+                self._counts["dropped"] += 1
+                self._counts["tokens_saved"] += count_tokens(content)
+            else:
+                row["canonical_id"] = match[0]
+                node.metadata["duplicate_of"] = match[0]
+                node.metadata["duplicate_similarity"] = round(match[1], 3)
+                for key in DUPLICATE_KEYS:
+                    if key not in node.excluded_embed_metadata_keys:
+                        node.excluded_embed_metadata_keys.append(key)
+                    if key not in node.excluded_llm_metadata_keys:
+                        node.excluded_llm_metadata_keys.append(key)
+                self._counts["linked"] += 1
+                kept.append(node)
+            self._pending.append(row)
+        return kept
+
+    def commit(self) -> None:
+        """Persists the signatures of the chunks seen since the last commit; call after the nodes are written."""
+        if not self._pending:
+            return
+        with self._engine.begin() as connection:
+            connection.execute(
+                text(
+                    f'INSERT INTO public."{self._table}" (node_id, doc_id, signature, canonical_id, dropped) '
+                    "VALUES (:node_id, :doc_id, :signature, :canonical_id, :dropped) "
+                    "ON CONFLICT (node_id) DO UPDATE SET doc_id = EXCLUDED.doc_id, signature = EXCLUDED.signature, "
+                    "canonical_id = EXCLUDED.canonical_id, dropped = EXCLUDED.dropped"
+                ),
+                self._pending,
+            )
+        self._pending = []
+
+    def remove(self, node_ids: List[str]) -> List[str]:
+        """
+        Forgets deleted chunks.
+
+        Args:
+            node_ids (List[str]): Node ids removed from the vector store
+
+        Returns:
+            List[str]: Doc ids of other sources whose duplicates pointed at the removed chunks;
+                they must be ingested again, since their copy of the text is gone
+        """
+        if not node_ids:
+            return []
+        for node_id in node_ids:
+            self._signatures.pop(node_id, None)
+        with self._engine.begin() as connection:
+            connection.execute(
+                text(f'DELETE FROM public."{self._table}" WHERE node_id = ANY(CAST(:node_ids AS VARCHAR[]))'),
+                {"node_ids": node_ids},
+            )
+            rows = connection.execute(
+                text(
+                    f'DELETE FROM public."{self._table}" WHERE canonical_id = ANY(CAST(:node_ids AS VARCHAR[])) '
+                    "RETURNING doc_id"
+                ),
+                {"node_ids": node_ids},
+            ).fetchall()
+        return sorted({row.doc_id for row in rows})
+
+    def stats(self) -> str:
+        counts = self._counts
+        chunks = max(counts["chunks"], 1)
+        with self._engine.connect() as connection:
+            total, dropped = connection.execute(text(
+                f'SELECT COUNT(*), COUNT(*) FILTER (WHERE dropped) FROM public."{self._table}"'
+            )).one()
+        return (
+            f"Near-duplicates: {counts['dropped']} dropped, {counts['linked']} linked of {counts['chunks']} chunks "
+            f"({(counts['dropped'] + counts['linked']) / chunks:.1%}), {counts['tokens_saved']:,} embedding tokens saved; "
+            f"index holds {total - dropped} of {total} chunks seen ({dropped / max(total, 1):.1%} smaller)"
+        )
@@ -0,0 +1,364 @@
+import contextvars
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence
+
+import psutil
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.instrumentation import get_dispatcher
+from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+from llama_index.core.instrumentation.events import BaseEvent
+from llama_index.core.instrumentation.events.embedding import EmbeddingEndEvent, EmbeddingStartEvent
+from llama_index.core.instrumentation.events.llm import (
+    LLMChatEndEvent,
+    LLMChatStartEvent,
+    LLMCompletionEndEvent,
+    LLMCompletionStartEvent,
+)
+from llama_index.core.schema import BaseNode, TransformComponent
+
+from src.youtube_transcripts.llm_limiter import count_tokens
+
+
+# USD per million (input, output) tokens; models missing here are reported with a cost of 0
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.0),
+    "text-embedding-3-large": (0.13, 0.0),
+    "text-embedding-ada-002": (0.10, 0.0),
+}
+
+# Stage the current code runs in, used to attribute LLM and embedding tokens
+_current_stage: contextvars.ContextVar = contextvars.ContextVar("ingestion_stage", default=None)
+
+
+# How often the memory of the process is sampled while a stage runs
+RSS_SAMPLE_SECONDS = 0.5
+
+
+def _peak_rss_mb() -> float:
+    """Highest RSS of the process, or of its largest worker process, since it started."""
+    # ru_maxrss is reported in KiB on Linux; worker processes count through RUSAGE_CHILDREN
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def _current_rss_mb() -> float:
+    """RSS of the process and its live worker processes right now."""
+    process = psutil.Process()
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            # Exited since it was listed
+            pass
+    return rss / 1024 / 1024
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int = 0) -> float:
+    """Estimated USD cost of a call, matching versioned model names like gpt-4o-mini-2024-07-18."""
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            input_price, output_price = MODEL_PRICES[name]
+            return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+    return 0.0
+
+
+class StageStats:
+    """
+    Counters of one pipeline stage. All are running totals, so a long-running
+    service can keep one profiler without it growing.
+    """
+
+    def __init__(self):
+        # Wall time with at least one block of the stage running, so concurrent calls are not counted twice
+        self.seconds = 0.0
+        self.busy_seconds = 0.0
+        self.calls = 0
+        self.items = 0
+        self.retries = 0
+        self.errors = 0
+        self.llm_prompt_tokens = 0
+        self.llm_completion_tokens = 0
+        self.embedding_tokens = 0
+        self.cost = 0.0
+        self.peak_rss_mb = 0.0
+
+    def as_dict(self, running_seconds: float = 0.0) -> Dict[str, Any]:
+        """
+        Args:
+            running_seconds (float): Time since the stage's blocks still running started
+        """
+        seconds = self.seconds + running_seconds
+        return {
+            "seconds": round(seconds, 3),
+            "busy_seconds": round(self.busy_seconds, 3),
+            "calls": self.calls,
+            "items": self.items,
+            "items_per_sec": round(self.items / seconds, 3) if seconds else None,
+            "llm_prompt_tokens": self.llm_prompt_tokens,
+            "llm_completion_tokens": self.llm_completion_tokens,
+            "embedding_tokens": self.embedding_tokens,
+            "cost_usd": round(self.cost, 6),
+            "retries": self.retries,
+            "errors": self.errors,
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+        }
+
+
+class RunProfiler:
+    """
+    Per-stage instrumentation of one ingestion run.
+
+    Code marks its stages with `stage()`; each records wall time (overlapping
+    calls counted once, plus the summed busy time), items processed, retries,
+    errors and the highest RSS of the process and its workers sampled while
+    the stage ran (every RSS_SAMPLE_SECONDS and when a block ends). LLM
+    and embedding tokens are collected from llama-index's instrumentation
+    events and charged to the stage active where the call was made, with an
+    estimated cost from MODEL_PRICES. `write()` saves a JSON report and
+    prints a summary table.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageStats] = {}
+        # Blocks running per stage and since when the stage has been running without a break
+        self._active: Dict[str, int] = {}
+        self._active_since: Dict[str, float] = {}
+        self._sampler: Optional[threading.Thread] = None
+        self.started = time.time()
+        self._started = time.perf_counter()
+        self.metadata: Dict[str, Any] = {}
+
+    def _stats(self, name: str) -> StageStats:
+        if name not in self._stages:
+            self._stages[name] = StageStats()
+        return self._stages[name]
+
+    def reset(self) -> None:
+        """Starts a new run: clears the stages and metadata, e.g. an error of an earlier run in this process."""
+        with self._lock:
+            self._stages = {}
+            self.metadata = {}
+            self.started = time.time()
+            self._started = time.perf_counter()
+            for name in self._active_since:
+                self._active_since[name] = self._started
+
+    def _sample_rss(self) -> None:
+        while True:
+            time.sleep(RSS_SAMPLE_SECONDS)
+            with self._lock:
+                active = [name for name, running in self._active.items() if running]
+            if not active:
+                continue
+            rss_mb = _current_rss_mb()
+            with self._lock:
+                for name in active:
+                    stats = self._stats(name)
+                    stats.peak_rss_mb = max(stats.peak_rss_mb, rss_mb)
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        """
+        Times a block of work as part of stage `name`.
+
+        Args:
+            name (str): Stage name, e.g. 'scraping' or 'embedding'
+            items (int): Items the block processes, if known up front (see count() otherwise)
+        """
+        started = time.perf_counter()
+        with self._lock:
+            if not self._active.get(name):
+                self._active_since[name] = started
+            self._active[name] = self._active.get(name, 0) + 1
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+                self._sampler.start()
+        token = _current_stage.set(name)
+        failed = False
+        try:
+            yield
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            _current_stage.reset(token)
+            stopped = time.perf_counter()
+            rss_mb = _current_rss_mb()
+            with self._lock:
+                self._active[name] -= 1
+                stats = self._stats(name)
+                if not self._active[name]:
+                    stats.seconds += stopped - self._active_since.pop(name)
+                stats.busy_seconds += stopped - started
+                stats.calls += 1
+                stats.items += items
+                stats.errors += failed
+                stats.peak_rss_mb = max(stats.peak_rss_mb, rss_mb)
+
+    def count(self, name: str, items: int = 0, retries: int = 0, errors: int = 0) -> None:
+        """Adds items, retries or errors to a stage outside of a timed block."""
+        with self._lock:
+            stats = self._stats(name)
+            stats.items += items
+            stats.retries += retries
+            stats.errors += errors
+
+    def add_tokens(self, model: str, prompt_tokens: int = 0, completion_tokens: int = 0, embedding: bool = False) -> None:
+        """Charges the tokens of one model call to the current stage."""
+        name = _current_stage.get() or ("embedding" if embedding else "llm")
+        with self._lock:
+            stats = self._stats(name)
+            if embedding:
+                stats.embedding_tokens += prompt_tokens
+            else:
+                stats.llm_prompt_tokens += prompt_tokens
+                stats.llm_completion_tokens += completion_tokens
+            stats.cost += token_cost(model, prompt_tokens, completion_tokens)
+
+    def report(self) -> Dict[str, Any]:
+        now = time.perf_counter()
+        with self._lock:
+            stages = {
+                name: stats.as_dict(now - self._active_since[name] if name in self._active_since else 0.0)
+                for name, stats in self._stages.items()
+            }
+        return {
+            "started_at": datetime.fromtimestamp(self.started, timezone.utc).isoformat(),
+            "seconds": round(time.perf_counter() - self._started, 3),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "metadata": self.metadata,
+            "stages": stages,
+            "totals": {
+                key: round(sum(stage[key] for stage in stages.values()), 6)
+                for key in ("llm_prompt_tokens", "llm_completion_tokens", "embedding_tokens", "cost_usd", "retries", "errors")
+            },
+        }
+
+    def summary(self, report: Optional[Dict[str, Any]] = None) -> str:
+        report = report or self.report()
+        header = f"{'stage':<20} {'seconds':>9} {'items':>8} {'items/s':>9} {'LLM tok':>11} {'embed tok':>11} {'cost $':>9} {'retries':>8} {'RSS MiB':>8}"
+        lines = [header, "-" * len(header)]
+        for name, stage in report["stages"].items():
+            rate = f"{stage['items_per_sec']:.2f}" if stage["items_per_sec"] is not None else "-"
+            lines.append(
+                f"{name:<20} {stage['seconds']:>9.1f} {stage['items']:>8} {rate:>9} "
+                f"{stage['llm_prompt_tokens'] + stage['llm_completion_tokens']:>11,} {stage['embedding_tokens']:>11,} "
+                f"{stage['cost_usd']:>9.4f} {stage['retries']:>8} {stage['peak_rss_mb']:>8.0f}"
+            )
+        totals = report["totals"]
+        lines.append("-" * len(header))
+        lines.append(
+            f"{'total':<20} {report['seconds']:>9.1f} {'':>8} {'':>9} "
+            f"{int(totals['llm_prompt_tokens'] + totals['llm_completion_tokens']):>11,} {int(totals['embedding_tokens']):>11,} "
+            f"{totals['cost_usd']:>9.4f} {int(totals['retries']):>8} {report['peak_rss_mb']:>8.0f}"
+        )
+        return "\n".join(lines)
+
+    def write(self, directory: str) -> str:
+        """
+        Saves the run report as JSON and prints the summary table.
+
+        Args:
+            directory (str): Directory for run reports, one file per run
+
+        Returns:
+            str: Path of the report
+        """
+        report = self.report()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"run-{datetime.fromtimestamp(self.started, timezone.utc):%Y%m%dT%H%M%SZ}.json")
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(self.summary(report))
+        print(f"Run report written to {path}")
+        return path
+
+
+class TokenUsageHandler(BaseEventHandler):
+    """Feeds the token usage of every LLM and embedding call made through llama-index to a RunProfiler."""
+
+    _profiler: RunProfiler = PrivateAttr()
+    _models: Dict[str, str] = PrivateAttr(default_factory=dict)
+
+    def __init__(self, profiler: RunProfiler):
+        super().__init__()
+        self._profiler = profiler
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TokenUsageHandler"
+
+    @staticmethod
+    def _model_name(model_dict: dict) -> str:
+        return str(model_dict.get("model") or model_dict.get("model_name") or "unknown")
+
+    def handle(self, event: BaseEvent, **kwargs: Any) -> None:
+        if isinstance(event, (LLMChatStartEvent, LLMCompletionStartEvent, EmbeddingStartEvent)):
+            self._models[event.span_id] = self._model_name(event.model_dict)
+
+        elif isinstance(event, EmbeddingEndEvent):
+            model = self._models.pop(event.span_id, "unknown")
+            self._profiler.add_tokens(model, sum(count_tokens(chunk) for chunk in event.chunks), embedding=True)
+
+        elif isinstance(event, (LLMChatEndEvent, LLMCompletionEndEvent)):
+            model = self._models.pop(event.span_id, "unknown")
+            if event.response is None:
+                return
+            usage = event.response.additional_kwargs or {}
+            prompt_tokens = usage.get("prompt_tokens")
+            completion_tokens = usage.get("completion_tokens")
+            if prompt_tokens is None:
+                # Providers that report no usage: count the text sent and received
+                prompt = event.prompt if isinstance(event, LLMCompletionEndEvent) else "\n".join(
+                    str(message.content or "") for message in event.messages
+                )
+                prompt_tokens = count_tokens(prompt)
+                completion_tokens = count_tokens(str(event.response))
+            self._profiler.add_tokens(model, int(prompt_tokens), int(completion_tokens or 0))
+
+
+class ProfiledTransformation(TransformComponent):
+    """Runs a pipeline transformation as a profiler stage, counting the nodes it returns."""
+
+    transformation: TransformComponent
+
+    _stage: str = PrivateAttr()
+    _profiler: RunProfiler = PrivateAttr()
+
+    def __init__(self, transformation: TransformComponent, stage: str, profiler: RunProfiler):
+        super().__init__(transformation=transformation)
+        self._stage = stage
+        self._profiler = profiler
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        with self._profiler.stage(self._stage):
+            nodes = self.transformation(nodes, **kwargs)
+        self._profiler.count(self._stage, items=len(nodes))
+        return nodes
+
+
+_profiler: Optional[RunProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> RunProfiler:
+    """The profiler of this run; the first call also subscribes it to llama-index's events."""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = RunProfiler()
+            get_dispatcher().add_event_handler(TokenUsageHandler(_profiler))
+        return _profiler
@@ -0,0 +1,176 @@
+import resource
+import time
+from typing import Callable, Iterable, List, Set, Tuple
+
+from llama_index.core import Document
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+# One unit of work: a stable source key (video URL, page URL, Drive file) and its Documents
+SourceUnit = Tuple[str, List[Document]]
+
+
+class IngestionCheckpoint:
+    """
+    Records which sources an ingestion run has fully written, so an interrupted
+    run resumes where it stopped instead of starting over.
+
+    A run stays 'running' until complete() is called. When the next run starts
+    and finds an unfinished run, it resumes it and skips its completed sources.
+    """
+
+    RUNS_TABLE = "ingestion_runs"
+    CHECKPOINT_TABLE = "ingestion_checkpoint"
+
+    def __init__(self, engine: Engine, table_name: str, resume: bool = True):
+        self.engine = engine
+        self.table_name = table_name
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.RUNS_TABLE} ("
+                "run_id SERIAL PRIMARY KEY, table_name VARCHAR NOT NULL, status VARCHAR NOT NULL, "
+                "started_at TIMESTAMPTZ NOT NULL DEFAULT now(), finished_at TIMESTAMPTZ)"
+            ))
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.CHECKPOINT_TABLE} ("
+                f"run_id INTEGER NOT NULL REFERENCES {self.RUNS_TABLE} (run_id) ON DELETE CASCADE, "
+                "source_key VARCHAR NOT NULL, completed_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+                "PRIMARY KEY (run_id, source_key))"
+            ))
+
+            unfinished = connection.execute(
+                text(
+                    f"SELECT run_id FROM {self.RUNS_TABLE} WHERE table_name = :table_name AND status = 'running' "
+                    "ORDER BY run_id DESC LIMIT 1"
+                ),
+                {"table_name": table_name},
+            ).scalar()
+            if unfinished is not None and not resume:
+                connection.execute(
+                    text(f"UPDATE {self.RUNS_TABLE} SET status = 'abandoned' WHERE run_id = :run_id"),
+                    {"run_id": unfinished},
+                )
+                unfinished = None
+
+            if unfinished is not None:
+                self.run_id = unfinished
+                self.completed = {
+                    row.source_key for row in connection.execute(
+                        text(f"SELECT source_key FROM {self.CHECKPOINT_TABLE} WHERE run_id = :run_id"),
+                        {"run_id": unfinished},
+                    )
+                }
+                print(f"Resuming ingestion run {self.run_id}: {len(self.completed)} sources already completed")
+            else:
+                self.run_id = connection.execute(
+                    text(
+                        f"INSERT INTO {self.RUNS_TABLE} (table_name, status) VALUES (:table_name, 'running') "
+                        "RETURNING run_id"
+                    ),
+                    {"table_name": table_name},
+                ).scalar()
+                self.completed: Set[str] = set()
+
+    def mark(self, source_keys: Iterable[str]) -> None:
+        rows = [{"run_id": self.run_id, "source_key": key} for key in source_keys]
+        if not rows:
+            return
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"INSERT INTO {self.CHECKPOINT_TABLE} (run_id, source_key) VALUES (:run_id, :source_key) "
+                    "ON CONFLICT DO NOTHING"
+                ),
+                rows,
+            )
+        self.completed.update(row["source_key"] for row in rows)
+
+    def complete(self) -> None:
+        """Closes the run; its checkpoints are no longer needed."""
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(f"UPDATE {self.RUNS_TABLE} SET status = 'completed', finished_at = now() WHERE run_id = :run_id"),
+                {"run_id": self.run_id},
+            )
+            connection.execute(
+                text(f"DELETE FROM {self.CHECKPOINT_TABLE} WHERE run_id = :run_id"), {"run_id": self.run_id}
+            )
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class StreamingIngestor:
+    """
+    Pulls source units from generators and writes them in bounded batches.
+
+    Sources are consumed lazily, so nothing upstream produces more than one
+    batch ahead of the writer (backpressure by pull). After each batch is
+    chunked, embedded and written, its sources are checkpointed.
+    """
+
+    def __init__(
+        self,
+        ingest_batch: Callable[[List[Document]], None],
+        checkpoint: IngestionCheckpoint,
+        batch_documents: int = 64,
+    ):
+        """
+        Args:
+            ingest_batch (Callable): Chunks, embeds and writes a list of Documents
+            checkpoint (IngestionCheckpoint): Checkpoint of the current run
+            batch_documents (int): Documents buffered before a batch is written
+        """
+        self.ingest_batch = ingest_batch
+        self.checkpoint = checkpoint
+        self.batch_documents = batch_documents
+        self.batches = 0
+        self.sources = 0
+        self.documents = 0
+
+    def _flush(self, keys: List[str], documents: List[Document]) -> None:
+        self.ingest_batch(documents)
+        self.checkpoint.mark(keys)
+        self.batches += 1
+        self.sources += len(keys)
+        self.documents += len(documents)
+        print(
+            f"Batch {self.batches}: {len(keys)} sources, {len(documents)} documents written "
+            f"(total {self.sources} sources, peak RSS {_peak_rss_mb():.0f} MiB)"
+        )
+
+    def run(self, sources: Iterable[SourceUnit]) -> None:
+        """
+        Ingests every source unit not already checkpointed in this run.
+
+        Args:
+            sources (Iterable[SourceUnit]): Lazily produced (source key, Documents) pairs
+        """
+        started = time.perf_counter()
+        keys: List[str] = []
+        documents: List[Document] = []
+        for key, source_documents in sources:
+            # Sources that produced nothing (e.g. a failed fetch) are left unchecked, so a resume retries them
+            if key in self.checkpoint.completed or not source_documents:
+                continue
+            keys.append(key)
+            documents.extend(source_documents)
+            if len(documents) >= self.batch_documents:
+                self._flush(keys, documents)
+                keys, documents = [], []
+
+        if keys:
+            self._flush(keys, documents)
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"Streaming ingestion: {self.sources} sources, {self.documents} documents in {self.batches} batches, "
+            f"{elapsed:.1f}s, peak RSS {_peak_rss_mb():.0f} MiB"
+        )
+
+    def pending(self, keys: Iterable[str]) -> List[str]:
+        """Filters out keys already completed in this run, so producers can skip fetching them."""
+        return [key for key in keys if key not in self.checkpoint.completed]
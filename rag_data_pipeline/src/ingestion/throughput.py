@@ -0,0 +1,267 @@
+import asyncio
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, List, Optional, Sequence
+
+from llama_index.core import Document
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from llama_index.core.vector_stores.types import BasePydanticVectorStore
+
+from src.ingestion.profiler import get_profiler
+from src.youtube_transcripts.llm_limiter import LLMRateLimiter, count_tokens
+
+
+# Transformation of a pool worker process, pickled once when the worker starts
+_worker_transformation: Optional[TransformComponent] = None
+
+
+def _init_worker(transformation: TransformComponent) -> None:
+    global _worker_transformation
+    _worker_transformation = transformation
+
+
+def _run_transformation(nodes: List[BaseNode]) -> List[BaseNode]:
+    return list(_worker_transformation(nodes))
+
+
+class ParallelTransformation(TransformComponent):
+    """
+    Runs a CPU-bound transformation such as the node parser in a process pool.
+
+    Nodes are split into contiguous shards of whole documents, so parsers that
+    link chunks within a document (prev/next relationships) see each document
+    in one piece and the output keeps the input order.
+
+    The pool is started on first use and kept until close(), so batches of a
+    streaming run do not each pay for starting the workers and pickling the
+    transformation.
+    """
+
+    transformation: TransformComponent
+
+    _workers: int = PrivateAttr()
+    _pool: Optional[ProcessPoolExecutor] = PrivateAttr(default=None)
+    _pool_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, transformation: TransformComponent, workers: int):
+        super().__init__(transformation=transformation)
+        self._workers = workers
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self._workers, initializer=_init_worker, initargs=(self.transformation,)
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """Stops the worker processes; the next call starts them again."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+    @property
+    def wrapped(self) -> TransformComponent:
+        """The transformation doing the work; caches key on it so results are shared with the sequential mode."""
+        return self.transformation
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        groups: "OrderedDict[str, List[BaseNode]]" = OrderedDict()
+        for node in nodes:
+            groups.setdefault(node.ref_doc_id or node.node_id, []).append(node)
+
+        workers = min(self._workers, len(groups))
+        if workers <= 1:
+            return self.transformation(nodes, **kwargs)
+
+        shards: List[List[BaseNode]] = []
+        shard_size = -(-len(nodes) // workers)
+        for group in groups.values():
+            if not shards or len(shards[-1]) >= shard_size:
+                shards.append([])
+            shards[-1].extend(group)
+
+        results = self._get_pool().map(_run_transformation, shards)
+        return [node for shard in results for node in shard]
+
+
+class ConcurrentEmbedding(TransformComponent):
+    """
+    Embeds nodes with many requests in flight instead of one batch at a time.
+
+    Node texts are split into batches of `batch_size`; the batches are sent
+    concurrently on a private event loop, bounded by an LLMRateLimiter for
+    both the number of open requests and the tokens per minute of the
+    embedding account. Tokens and busy time are tracked for the report.
+    """
+
+    embed_model: BaseEmbedding
+    batch_size: int = 100
+
+    _limiter: LLMRateLimiter = PrivateAttr()
+    _loop: Optional[asyncio.AbstractEventLoop] = PrivateAttr(default=None)
+    _loop_lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _seconds: float = PrivateAttr(default=0.0)
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        batch_size: int = 100,
+        max_concurrency: int = 8,
+        tokens_per_minute: int = 1_000_000,
+    ):
+        """
+        Args:
+            embed_model (BaseEmbedding): Model used for each batch request
+            batch_size (int): Texts per embedding request
+            max_concurrency (int): Embedding requests in flight at once
+            tokens_per_minute (int): Token budget of the embedding account
+        """
+        super().__init__(embed_model=embed_model, batch_size=batch_size)
+        self._limiter = LLMRateLimiter(max_concurrency, tokens_per_minute, label="Embedding")
+
+    @property
+    def wrapped(self) -> BaseEmbedding:
+        """The embedding model; caches key on it so embeddings are shared with the sequential mode."""
+        return self.embed_model
+
+    @property
+    def concurrency(self) -> int:
+        return self._limiter.max_concurrency
+
+    def _run(self, coroutine):
+        # One long-lived loop keeps the model's async HTTP client bound to a single event loop
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="embedding-loop", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        async with self._limiter.limit(sum(count_tokens(text) for text in texts)):
+            return await self.embed_model.aget_text_embedding_batch(texts)
+
+    async def _embed_all(self, texts: List[str]) -> List[List[float]]:
+        batches = await asyncio.gather(*(
+            self._embed_batch(texts[start:start + self.batch_size]) for start in range(0, len(texts), self.batch_size)
+        ))
+        return [embedding for batch in batches for embedding in batch]
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> Sequence[BaseNode]:
+        if not nodes:
+            return nodes
+        started = time.perf_counter()
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        for node, embedding in zip(nodes, self._run(self._embed_all(texts))):
+            node.embedding = embedding
+        self._seconds += time.perf_counter() - started
+        return nodes
+
+    def stats(self) -> str:
+        seconds = max(self._seconds, 1e-9)
+        return (
+            f"Embedding: {self._limiter.completed} requests, {self._limiter.tokens:,} tokens in {self._seconds:.1f}s "
+            f"({self._limiter.tokens / seconds:,.0f} tokens/sec, up to {self.concurrency} requests in flight)"
+        )
+
+
+class ThroughputIngestor:
+    """
+    High-throughput replacement for IngestionPipeline.run with a vector store.
+
+    Documents are parsed and enriched by `parse_pipeline`, then embedded in
+    write batches sized to fill every concurrent embedding request. Finished
+    batches go to a writer thread through a bounded queue, so writing one
+    batch to the vector store overlaps with embedding the next, and embedding
+    pauses when the database falls `max_pending_writes` batches behind.
+    """
+
+    def __init__(
+        self,
+        parse_pipeline: IngestionPipeline,
+        embed_transformation: TransformComponent,
+        vector_store: BasePydanticVectorStore,
+        embedder: ConcurrentEmbedding,
+        max_pending_writes: int = 2,
+    ):
+        """
+        Args:
+            parse_pipeline (IngestionPipeline): Pipeline with every transformation before embedding, without a vector store
+            embed_transformation (TransformComponent): The embedding step, possibly wrapped in a cache
+            vector_store (BasePydanticVectorStore): Store the embedded nodes are written to (or a BulkLoader)
+            embedder (ConcurrentEmbedding): The concurrent embedding inside `embed_transformation`
+            max_pending_writes (int): Embedded batches allowed to wait for the writer
+        """
+        self.parse_pipeline = parse_pipeline
+        self.embed_transformation = embed_transformation
+        self.vector_store = vector_store
+        self.embedder = embedder
+        self.max_pending_writes = max_pending_writes
+        self.write_batch = embedder.batch_size * embedder.concurrency
+
+    def _write_loop(self, batches: "queue.Queue", state: dict) -> None:
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            # After a failure keep draining, so the producer never blocks on a full queue
+            if state["error"] is not None:
+                continue
+            try:
+                started = time.perf_counter()
+                with get_profiler().stage("vector_store_write", items=len(batch)):
+                    self.vector_store.add(batch)
+                state["seconds"] += time.perf_counter() - started
+            except Exception as e:
+                state["error"] = e
+
+    def run(self, documents: List[Document]) -> List[BaseNode]:
+        """
+        Parses, embeds and writes the documents.
+
+        Args:
+            documents (List[Document]): Documents to ingest
+
+        Returns:
+            List[BaseNode]: Every node produced, like IngestionPipeline.run
+        """
+        started = time.perf_counter()
+        nodes = self.parse_pipeline.run(documents=documents, show_progress=True)
+        parse_seconds = time.perf_counter() - started
+
+        batches: "queue.Queue" = queue.Queue(maxsize=self.max_pending_writes)
+        state = {"error": None, "seconds": 0.0}
+        writer = threading.Thread(target=self._write_loop, args=(batches, state), name="vector-store-writer", daemon=True)
+        writer.start()
+
+        embed_seconds = 0.0
+        try:
+            for start in range(0, len(nodes), self.write_batch):
+                if state["error"] is not None:
+                    break
+                batch_started = time.perf_counter()
+                batch = self.embed_transformation(nodes[start:start + self.write_batch])
+                embed_seconds += time.perf_counter() - batch_started
+                batches.put([node for node in batch if node.embedding is not None])
+        finally:
+            batches.put(None)
+            writer.join()
+        if state["error"] is not None:
+            raise state["error"]
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        print(
+            f"Parallel ingestion: {len(documents)} documents, {len(nodes)} nodes in {elapsed:.1f}s "
+            f"({len(documents) / elapsed:.2f} docs/sec, {len(nodes) / elapsed:.1f} nodes/sec); "
+            f"parse {parse_seconds:.1f}s, embed {embed_seconds:.1f}s, write {state['seconds']:.1f}s overlapped"
+        )
+        print(self.embedder.stats())
+        return nodes
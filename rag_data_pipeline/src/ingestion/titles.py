@@ -0,0 +1,213 @@
+import json
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+from llama_index.core import Settings
+from llama_index.core.async_utils import run_jobs
+from llama_index.core.bridge.pydantic import PrivateAttr, SerializeAsAny
+from llama_index.core.extractors import BaseExtractor
+from llama_index.core.llms import LLM
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from src.ingestion.cache import TransformationCacheStore
+from src.ingestion.citations import HEADING_PATTERN, TIMESTAMP_PATTERN
+from src.youtube_transcripts.format_cache import FormattingCache
+
+
+# TITLE_EXTRACTOR values: source titles first, or llama-index's TitleExtractor for every document
+TITLE_EXTRACTORS = ("source", "llm")
+
+# Metadata keys that carry a title given by the source: page <title>, video title, Drive file name
+TITLE_KEYS = ("title", "file name", "file_name")
+# Metadata keys holding a file path whose name can serve as the title
+PATH_KEYS = ("original_file_path", "file_path", "file path")
+
+GENERIC_TITLES = frozenset({
+    "", "n/a", "none", "null", "untitled", "untitled document", "document", "home", "index", "page",
+    "404", "not found", "page not found", "404 not found", "error", "transcript",
+})
+MAX_TITLE_LENGTH = 120
+
+title_instructions = """You write titles for documents in a search index.
+For each numbered excerpt below, write a concise, descriptive title of at most 10 words.
+Answer with a JSON array of strings, one title per excerpt in the same order, and nothing else."""
+
+
+def _clean(title: Optional[str]) -> str:
+    title = TIMESTAMP_PATTERN.sub("", str(title or ""))
+    return re.sub(r"\s+", " ", title).strip(" #-_|:")[:MAX_TITLE_LENGTH]
+
+
+def _usable(title: str) -> bool:
+    """Rejects empty, generic and machine-looking titles (URLs, ids, bare numbers)."""
+    if len(title) < 3 or title.lower() in GENERIC_TITLES:
+        return False
+    if re.match(r"^(https?://|www\.)", title, re.IGNORECASE):
+        return False
+    return bool(re.search(r"[A-Za-z]{3}", title))
+
+
+def source_title(metadata: Dict[str, Any]) -> Optional[str]:
+    """Title provided by the source itself, if any is usable."""
+    for key in TITLE_KEYS:
+        title = _clean(metadata.get(key))
+        if _usable(title):
+            return title
+    return None
+
+
+def file_title(metadata: Dict[str, Any]) -> Optional[str]:
+    """Name of the source file, e.g. a converted Drive document's temporary path."""
+    for key in PATH_KEYS:
+        if metadata.get(key):
+            name = os.path.splitext(os.path.basename(str(metadata[key])))[0]
+            title = _clean(name.replace("_", " "))
+            if _usable(title):
+                return title
+    return None
+
+
+def heading_title(nodes: Sequence[BaseNode]) -> Optional[str]:
+    """Top-level heading of a document, from MarkdownNodeParser's header_path or the first heading line."""
+    for node in nodes:
+        for heading in node.metadata.get("header_path", "").split("/"):
+            title = _clean(heading)
+            if _usable(title):
+                return title
+        first_line = node.get_content(metadata_mode=MetadataMode.NONE).lstrip().split("\n", 1)[0]
+        match = HEADING_PATTERN.match(first_line)
+        if match and _usable(_clean(match.group(2))):
+            return _clean(match.group(2))
+    return None
+
+
+class TitleCache(FormattingCache):
+    """Generated titles keyed by model, prompt and document excerpt."""
+
+    COLLECTION_PREFIX = "llm_title:"
+    LABEL = "LLM title cache"
+
+
+class SourceTitleExtractor(BaseExtractor):
+    """
+    Sets `document_title` like TitleExtractor without an LLM call per node.
+
+    Titles are taken, in order, from the source metadata (page <title>, video
+    title, Drive file name), the document's top-level Markdown heading, and
+    the name of the file it was converted from. Only documents with none of
+    these are sent to the LLM, `batch_size` excerpts per call, and the
+    generated titles are cached.
+    """
+
+    llm: SerializeAsAny[LLM]
+    batch_size: int = 8
+    excerpt_chars: int = 1000
+
+    _cache: Optional[TitleCache] = PrivateAttr(default=None)
+    _counts: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def __init__(
+        self,
+        llm: Optional[LLM] = None,
+        cache_store: Optional[TransformationCacheStore] = None,
+        batch_size: int = 8,
+        excerpt_chars: int = 1000,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            llm (Optional[LLM]): LLM for documents without a usable title (default: Settings.llm)
+            cache_store (Optional[TransformationCacheStore]): Store for generated titles
+            batch_size (int): Documents titled per LLM call
+            excerpt_chars (int): Characters of each document shown to the LLM
+        """
+        super().__init__(llm=llm or Settings.llm, batch_size=batch_size, excerpt_chars=excerpt_chars, **kwargs)
+        if cache_store is not None:
+            self._cache = TitleCache(cache_store, getattr(self.llm, "model", type(self.llm).__name__), title_instructions)
+        self._counts = {"source": 0, "heading": 0, "generated": 0, "llm_calls": 0}
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "SourceTitleExtractor"
+
+    def _excerpt(self, nodes: Sequence[BaseNode]) -> str:
+        text = "\n".join(node.get_content(metadata_mode=MetadataMode.NONE) for node in nodes[:3])
+        return re.sub(r"\s+", " ", TIMESTAMP_PATTERN.sub("", text)).strip()[:self.excerpt_chars]
+
+    async def _generate_batch(self, excerpts: List[str]) -> List[str]:
+        prompt = title_instructions + "\n\n" + "\n\n".join(
+            f"[{number}] {excerpt}" for number, excerpt in enumerate(excerpts, start=1)
+        )
+        response = await self.llm.acomplete(prompt)
+        self._counts["llm_calls"] += 1
+        try:
+            answer = re.sub(r"^```(?:json)?|```$", "", response.text.strip()).strip()
+            titles = [_clean(title) for title in json.loads(answer)]
+        except (ValueError, TypeError):
+            titles = []
+        if len(titles) != len(excerpts):
+            print(f"Title generation returned an unusable answer for {len(excerpts)} documents")
+            titles = [""] * len(excerpts)
+        # Fall back to the opening words of the excerpt when the model gives nothing usable
+        return [title if _usable(title) else _clean(" ".join(excerpt.split()[:8])) for title, excerpt in zip(titles, excerpts)]
+
+    async def _generate(self, excerpts: List[str]) -> Dict[str, str]:
+        generated = {}
+        pending = []
+        for excerpt in dict.fromkeys(excerpts):
+            cached = self._cache.get(excerpt) if self._cache is not None else None
+            if cached is not None:
+                generated[excerpt] = cached
+            else:
+                pending.append(excerpt)
+
+        batches = [pending[start:start + self.batch_size] for start in range(0, len(pending), self.batch_size)]
+        results = await run_jobs(
+            [self._generate_batch(batch) for batch in batches], workers=self.num_workers, show_progress=self.show_progress
+        )
+        for batch, titles in zip(batches, results):
+            for excerpt, title in zip(batch, titles):
+                generated[excerpt] = title
+                if self._cache is not None:
+                    self._cache.put(excerpt, title)
+        return generated
+
+    async def aextract(self, nodes: Sequence[BaseNode]) -> List[Dict]:
+        groups: "OrderedDict[str, List[BaseNode]]" = OrderedDict()
+        for node in nodes:
+            groups.setdefault(node.ref_doc_id or node.node_id, []).append(node)
+
+        titles: Dict[str, str] = {}
+        excerpts: Dict[str, str] = {}
+        for doc_id, group in groups.items():
+            title = source_title(group[0].metadata)
+            if title:
+                self._counts["source"] += 1
+            else:
+                title = heading_title(group)
+                self._counts["heading"] += bool(title)
+            if not title:
+                title = file_title(group[0].metadata)
+                self._counts["source"] += bool(title)
+            if title:
+                titles[doc_id] = title
+            else:
+                excerpts[doc_id] = self._excerpt(group)
+
+        if excerpts:
+            generated = await self._generate(list(excerpts.values()))
+            for doc_id, excerpt in excerpts.items():
+                titles[doc_id] = generated[excerpt]
+            self._counts["generated"] += len(excerpts)
+
+        return [{"document_title": titles[node.ref_doc_id or node.node_id]} for node in nodes]
+
+    def stats(self) -> str:
+        counts = self._counts
+        summary = (
+            f"Titles: {counts['source']} from source metadata, {counts['heading']} from headings, "
+            f"{counts['generated']} generated in {counts['llm_calls']} LLM calls"
+        )
+        return summary + (f"; {self._cache.stats()}" if self._cache is not None else "")
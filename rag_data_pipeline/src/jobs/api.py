@@ -0,0 +1,106 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from src.jobs.queue import JobQueue
+
+
+# Validates and enqueues a job: (job_type, payload, priority) -> job id, None if an equal job is pending
+EnqueueFunction = Callable[[str, Dict[str, Any], int], Optional[int]]
+
+
+def make_server(
+    queue: JobQueue,
+    enqueue: EnqueueFunction,
+    stats: Callable[[], Dict[str, Any]],
+    host: str = "127.0.0.1",
+    port: int = 8090,
+) -> ThreadingHTTPServer:
+    """
+    Small JSON API over the job queue.
+
+        GET  /health                liveness
+        GET  /stats                 job counts per type and status, plus `stats()`
+        GET  /jobs?status=&type=&limit=
+        GET  /jobs/<id>
+        POST /jobs                  {"type": ..., "payload": {...}, "priority": 100}
+        POST /jobs/<id>/retry       queue a failed or cancelled job again
+        POST /jobs/<id>/cancel      cancel a queued job
+
+    Args:
+        queue (JobQueue): Queue to inspect and change
+        enqueue (EnqueueFunction): Validates and enqueues jobs; raises ValueError for bad requests
+        stats (Callable[[], Dict[str, Any]]): Extra service statistics for /stats
+        host (str): Interface to listen on
+        port (int): Port to listen on
+
+    Returns:
+        ThreadingHTTPServer: The server; call serve_forever() to run it
+    """
+
+    class JobRequestHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, body: Any) -> None:
+            data = json.dumps(body, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _job_id(self, part: str) -> Optional[int]:
+            return int(part) if part.isdigit() else None
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            try:
+                if parts == ["health"]:
+                    self._send(200, {"status": "ok"})
+                elif parts == ["stats"]:
+                    self._send(200, {"jobs": queue.counts(), **stats()})
+                elif parts == ["jobs"]:
+                    jobs = queue.list(query.get("status"), query.get("type"), int(query.get("limit", 50)))
+                    self._send(200, [job._asdict() for job in jobs])
+                elif len(parts) == 2 and parts[0] == "jobs" and self._job_id(parts[1]) is not None:
+                    job = queue.get(self._job_id(parts[1]))
+                    if job is None:
+                        self._send(404, {"error": "job not found"})
+                    else:
+                        self._send(200, job._asdict())
+                else:
+                    self._send(404, {"error": "not found"})
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+
+        def do_POST(self):
+            parts = [part for part in urlparse(self.path).path.split("/") if part]
+            try:
+                if parts == ["jobs"]:
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    job_id = enqueue(body.get("type", ""), body.get("payload") or {}, int(body.get("priority", 100)))
+                    if job_id is None:
+                        self._send(409, {"error": "an equal job is already queued or running"})
+                    else:
+                        self._send(201, {"job_id": job_id})
+                elif len(parts) == 3 and parts[0] == "jobs" and self._job_id(parts[1]) is not None:
+                    job_id = self._job_id(parts[1])
+                    if parts[2] == "retry":
+                        done = queue.retry(job_id)
+                    elif parts[2] == "cancel":
+                        done = queue.cancel(job_id)
+                    else:
+                        return self._send(404, {"error": "not found"})
+                    self._send(200 if done else 409, {"job_id": job_id, parts[2]: done})
+                else:
+                    self._send(404, {"error": "not found"})
+            except ValueError as e:
+                self._send(400, {"error": str(e)})
+
+        def log_message(self, format, *args):
+            # Job activity is logged by the runner; skip per-request access logs
+            pass
+
+    return ThreadingHTTPServer((host, port), JobRequestHandler)
@@ -0,0 +1,382 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+class PermanentJobError(Exception):
+    """Raised by job handlers for failures a retry cannot fix; the job fails without further attempts."""
+
+
+class Job(NamedTuple):
+    job_id: int
+    job_type: str
+    payload: Dict[str, Any]
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int
+    run_at: datetime
+    worker: Optional[str]
+    last_error: Optional[str]
+    result: Optional[Dict[str, Any]]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+
+_JOB_COLUMNS = ", ".join(Job._fields)
+
+
+class JobQueue:
+    """
+    Persistent ingestion job queue in Postgres, one queue per vector table.
+
+    Jobs move from 'queued' to 'running' when a worker claims them
+    (SELECT ... FOR UPDATE SKIP LOCKED, so workers in several processes never
+    claim the same job) and end 'succeeded', 'failed' or 'cancelled'. A
+    claimed job holds a lease the worker keeps extending; a job whose lease
+    ran out belonged to a worker that died and is queued again, so stopped
+    jobs resume on the next start. A job may carry a dedupe key: while one
+    job with that key is queued or running, enqueueing another is a no-op.
+    """
+
+    JOBS_TABLE = "ingestion_jobs"
+    SCHEDULES_TABLE = "ingestion_schedules"
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED)
+
+    def __init__(self, engine: Engine, table_name: str):
+        self.engine = engine
+        self.table_name = table_name
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.JOBS_TABLE} ("
+                "job_id SERIAL PRIMARY KEY, "
+                "table_name VARCHAR NOT NULL, "
+                "job_type VARCHAR NOT NULL, "
+                "payload JSONB NOT NULL, "
+                "dedupe_key VARCHAR, "
+                "status VARCHAR NOT NULL, "
+                "priority INTEGER NOT NULL DEFAULT 100, "
+                "attempts INTEGER NOT NULL DEFAULT 0, "
+                "max_attempts INTEGER NOT NULL, "
+                "run_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+                "lease_until TIMESTAMPTZ, "
+                "worker VARCHAR, "
+                "last_error TEXT, "
+                "result JSONB, "
+                "created_at TIMESTAMPTZ NOT NULL DEFAULT now(), "
+                "started_at TIMESTAMPTZ, "
+                "finished_at TIMESTAMPTZ)"
+            ))
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {self.JOBS_TABLE}_claim_idx "
+                f"ON {self.JOBS_TABLE} (table_name, job_type, priority, run_at) WHERE status = '{self.QUEUED}'"
+            ))
+            connection.execute(text(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {self.JOBS_TABLE}_dedupe_idx "
+                f"ON {self.JOBS_TABLE} (table_name, dedupe_key) WHERE status IN ('{self.QUEUED}', '{self.RUNNING}')"
+            ))
+            connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {self.SCHEDULES_TABLE} ("
+                "table_name VARCHAR NOT NULL, name VARCHAR NOT NULL, last_enqueued_at TIMESTAMPTZ NOT NULL, "
+                "PRIMARY KEY (table_name, name))"
+            ))
+
+    @staticmethod
+    def _job(row) -> Job:
+        return Job(**{field: row._mapping[field] for field in Job._fields})
+
+    def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        dedupe_key: Optional[str] = None,
+        priority: int = 100,
+        delay_seconds: float = 0,
+        max_attempts: int = 5,
+    ) -> Optional[int]:
+        """
+        Adds a job to the queue.
+
+        Args:
+            job_type (str): Handler that runs the job
+            payload (Dict[str, Any]): JSON arguments of the job
+            dedupe_key (Optional[str]): Skip the job while another with this key is queued or running
+            priority (int): Lower runs first among due jobs of the same type
+            delay_seconds (float): Run no earlier than this many seconds from now
+            max_attempts (int): Attempts before the job is marked failed
+
+        Returns:
+            Optional[int]: Id of the new job, None if an equal job is already pending
+        """
+        with self.engine.begin() as connection:
+            return connection.execute(
+                text(
+                    f"INSERT INTO {self.JOBS_TABLE} "
+                    "(table_name, job_type, payload, dedupe_key, status, priority, max_attempts, run_at) "
+                    "VALUES (:table_name, :job_type, CAST(:payload AS JSONB), :dedupe_key, :status, :priority, "
+                    ":max_attempts, now() + :delay * interval '1 second') "
+                    f"ON CONFLICT (table_name, dedupe_key) WHERE status IN ('{self.QUEUED}', '{self.RUNNING}') "
+                    "DO NOTHING RETURNING job_id"
+                ),
+                {
+                    "table_name": self.table_name,
+                    "job_type": job_type,
+                    "payload": json.dumps(payload),
+                    "dedupe_key": dedupe_key,
+                    "status": self.QUEUED,
+                    "priority": priority,
+                    "max_attempts": max_attempts,
+                    "delay": delay_seconds,
+                },
+            ).scalar()
+
+    def claim(self, job_type: str, worker: str, lease_seconds: float) -> Optional[Job]:
+        """Takes the next due job of a type, or None when there is none."""
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                text(
+                    f"UPDATE {self.JOBS_TABLE} SET status = :running, attempts = attempts + 1, worker = :worker, "
+                    "started_at = now(), finished_at = NULL, lease_until = now() + :lease * interval '1 second' "
+                    f"WHERE job_id = (SELECT job_id FROM {self.JOBS_TABLE} "
+                    "WHERE table_name = :table_name AND job_type = :job_type AND status = :queued AND run_at <= now() "
+                    "ORDER BY priority, run_at, job_id LIMIT 1 FOR UPDATE SKIP LOCKED) "
+                    f"RETURNING {_JOB_COLUMNS}"
+                ),
+                {
+                    "running": self.RUNNING,
+                    "queued": self.QUEUED,
+                    "worker": worker,
+                    "lease": lease_seconds,
+                    "table_name": self.table_name,
+                    "job_type": job_type,
+                },
+            ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def heartbeat(self, job_ids: List[int], lease_seconds: float) -> None:
+        """Extends the lease of jobs the calling process is still running."""
+        if not job_ids:
+            return
+        with self.engine.begin() as connection:
+            connection.execute(
+                text(
+                    f"UPDATE {self.JOBS_TABLE} SET lease_until = now() + :lease * interval '1 second' "
+                    "WHERE job_id = ANY(CAST(:job_ids AS INTEGER[])) AND status = :running"
+                ),
+                {"lease": lease_seconds, "job_ids": job_ids, "running": self.RUNNING},
+            )
+
+    def succeed(self, job_id: int, worker: str, result: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Records the result of a finished job.
+
+        Only the worker still holding the job can finish it: once its lease ran
+        out the job may be running again on another worker, whose run is the one
+        that counts.
+
+        Returns:
+            bool: False if the job was no longer running on `worker` and the result was dropped
+        """
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                text(
+                    f"UPDATE {self.JOBS_TABLE} SET status = :succeeded, result = CAST(:result AS JSONB), "
+                    "last_error = NULL, lease_until = NULL, finished_at = now() "
+                    "WHERE job_id = :job_id AND status = :running AND worker = :worker RETURNING job_id"
+                ),
+                {
+                    "succeeded": self.SUCCEEDED,
+                    "result": json.dumps(result or {}),
+                    "job_id": job_id,
+                    "running": self.RUNNING,
+                    "worker": worker,
+                },
+            ).fetchone()
+        return row is not None
+
+    def fail(self, job_id: int, worker: str, error: str, retry_in: Optional[float]) -> Optional[str]:
+        """
+        Records a failed attempt.
+
+        Args:
+            job_id (int): The job
+            worker (str): Worker that claimed the job
+            error (str): Error message of the attempt
+            retry_in (Optional[float]): Seconds until the next attempt, None to fail the job now
+
+        Returns:
+            Optional[str]: The job's new status, 'queued' if it will be retried; None if the job
+                was no longer running on `worker` and the failure was dropped
+        """
+        with self.engine.begin() as connection:
+            return connection.execute(
+                text(
+                    f"UPDATE {self.JOBS_TABLE} SET "
+                    "status = CASE WHEN :retry AND attempts < max_attempts THEN :queued ELSE :failed END, "
+                    "run_at = now() + :delay * interval '1 second', last_error = :error, lease_until = NULL, "
+                    "finished_at = CASE WHEN :retry AND attempts < max_attempts THEN NULL ELSE now() END "
+                    "WHERE job_id = :job_id AND status = :running AND worker = :worker RETURNING status"
+                ),
+                {
+                    "retry": retry_in is not None,
+                    "delay": retry_in or 0,
+                    "queued": self.QUEUED,
+                    "failed": self.FAILED,
+                    "error": error,
+                    "job_id": job_id,
+                    "running": self.RUNNING,
+                    "worker": worker,
+                },
+            ).scalar()
+
+    def requeue_expired(self) -> int:
+        """
+        Queues running jobs whose lease ran out (their worker stopped) again,
+        or fails them once they used up their attempts.
+
+        Returns:
+            int: Number of jobs recovered
+        """
+        with self.engine.begin() as connection:
+            rows = connection.execute(
+                text(
+                    f"UPDATE {self.JOBS_TABLE} SET "
+                    "status = CASE WHEN attempts < max_attempts THEN :queued ELSE :failed END, "
+                    "run_at = now(), lease_until = NULL, last_error = 'lease expired: worker stopped during the job', "
+                    "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE now() END "
+                    "WHERE table_name = :table_name AND status = :running AND lease_until < now() "
+                    "RETURNING job_id, job_type, status"
+                ),
+                {"queued": self.QUEUED, "failed": self.FAILED, "running": self.RUNNING, "table_name": self.table_name},
+            ).fetchall()
+        for row in rows:
+            print(f"Recovered {row.job_type} job {row.job_id} from a stopped worker: {row.status}")
+        return len(rows)
+
+    def retry(self, job_id: int) -> bool:
+        """Queues a failed or cancelled job again with fresh attempts; False if it is not retryable."""
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                text(
+                    f"UPDATE {self.JOBS_TABLE} AS job SET status = :queued, attempts = 0, run_at = now(), "
+                    "last_error = NULL, finished_at = NULL "
+                    "WHERE job.job_id = :job_id AND job.table_name = :table_name "
+                    "AND job.status IN (:failed, :cancelled) "
+                    f"AND NOT EXISTS (SELECT 1 FROM {self.JOBS_TABLE} AS other "
+                    "WHERE other.table_name = job.table_name AND other.dedupe_key = job.dedupe_key "
+                    "AND other.status IN (:queued, :running)) "
+                    "RETURNING job.job_id"
+                ),
+                {
+                    "queued": self.QUEUED,
+                    "running": self.RUNNING,
+                    "failed": self.FAILED,
+                    "cancelled": self.CANCELLED,
+                    "job_id": job_id,
+                    "table_name": self.table_name,
+                },
+            ).fetchone()
+        return row is not None
+
+    def cancel(self, job_id: int) -> bool:
+        """Cancels a queued job; running jobs are not interrupted. False if the job is not queued."""
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                text(
+                    f"UPDATE {self.JOBS_TABLE} SET status = :cancelled, finished_at = now() "
+                    "WHERE job_id = :job_id AND table_name = :table_name AND status = :queued RETURNING job_id"
+                ),
+                {"cancelled": self.CANCELLED, "queued": self.QUEUED, "job_id": job_id, "table_name": self.table_name},
+            ).fetchone()
+        return row is not None
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                text(f"SELECT {_JOB_COLUMNS} FROM {self.JOBS_TABLE} WHERE job_id = :job_id AND table_name = :table_name"),
+                {"job_id": job_id, "table_name": self.table_name},
+            ).fetchone()
+        return self._job(row) if row is not None else None
+
+    def list(self, status: Optional[str] = None, job_type: Optional[str] = None, limit: int = 50) -> List[Job]:
+        """Most recent jobs first, optionally of one status and type."""
+        clauses = ["table_name = :table_name"]
+        params: Dict[str, Any] = {"table_name": self.table_name, "limit": limit}
+        if status:
+            clauses.append("status = :status")
+            params["status"] = status
+        if job_type:
+            clauses.append("job_type = :job_type")
+            params["job_type"] = job_type
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    f"SELECT {_JOB_COLUMNS} FROM {self.JOBS_TABLE} WHERE {' AND '.join(clauses)} "
+                    "ORDER BY job_id DESC LIMIT :limit"
+                ),
+                params,
+            ).fetchall()
+        return [self._job(row) for row in rows]
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Number of jobs per type and status."""
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    f"SELECT job_type, status, COUNT(*) AS jobs FROM {self.JOBS_TABLE} "
+                    "WHERE table_name = :table_name GROUP BY job_type, status"
+                ),
+                {"table_name": self.table_name},
+            ).fetchall()
+        counts: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            counts.setdefault(row.job_type, {})[row.status] = row.jobs
+        return counts
+
+    def pinned_urls(self, job_type: str) -> Set[str]:
+        """
+        URLs of jobs of a type that succeeded after being enqueued by hand
+        (payloads without an 'origin'), so re-syncs of the source listing
+        do not tombstone them.
+        """
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    f"SELECT DISTINCT payload->>'url' AS url FROM {self.JOBS_TABLE} "
+                    "WHERE table_name = :table_name AND job_type = :job_type AND status = :succeeded "
+                    "AND payload->>'origin' IS NULL AND payload->>'url' IS NOT NULL"
+                ),
+                {"table_name": self.table_name, "job_type": job_type, "succeeded": self.SUCCEEDED},
+            ).fetchall()
+        return {row.url for row in rows}
+
+    def claim_schedule(self, name: str, interval_seconds: float) -> bool:
+        """
+        Marks a schedule as run if its interval has passed since it last ran,
+        atomically, so only one service process enqueues each re-sync.
+
+        Returns:
+            bool: True if the caller should enqueue the scheduled job now
+        """
+        with self.engine.begin() as connection:
+            row = connection.execute(
+                text(
+                    f"INSERT INTO {self.SCHEDULES_TABLE} (table_name, name, last_enqueued_at) "
+                    "VALUES (:table_name, :name, now()) "
+                    "ON CONFLICT (table_name, name) DO UPDATE SET last_enqueued_at = now() "
+                    f"WHERE {self.SCHEDULES_TABLE}.last_enqueued_at <= now() - :interval * interval '1 second' "
+                    "RETURNING name"
+                ),
+                {"table_name": self.table_name, "name": name, "interval": interval_seconds},
+            ).fetchone()
+        return row is not None
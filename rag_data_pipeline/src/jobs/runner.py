@@ -0,0 +1,174 @@
+import os
+import random
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from src.jobs.queue import Job, JobQueue, PermanentJobError
+
+
+# A job handler gets the claimed job and returns a JSON-serializable result
+JobHandler = Callable[[Job], Optional[Dict[str, Any]]]
+
+
+class Schedule(NamedTuple):
+    """A job enqueued every `interval_seconds`, e.g. a re-sync of one source listing."""
+    name: str
+    interval_seconds: float
+    job_type: str
+    payload: Dict[str, Any]
+    dedupe_key: Optional[str] = None
+
+
+def retry_delay(attempts: int, base_seconds: float, max_seconds: float) -> float:
+    """Exponential backoff after the given number of attempts, with jitter so failed jobs do not retry in lockstep."""
+    return min(max_seconds, base_seconds * 2 ** max(attempts - 1, 0)) * random.uniform(0.5, 1.0)
+
+
+class JobRunner:
+    """
+    Runs queued jobs on worker threads, a fixed number per job type.
+
+    Each worker claims one job at a time, runs its handler and records the
+    result; failures are retried with exponential backoff until the job's
+    attempts are used up, except PermanentJobError which fails the job at
+    once. A maintenance thread extends the lease of running jobs, queues the
+    jobs of stopped workers again and enqueues scheduled jobs when due.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handlers: Dict[str, JobHandler],
+        concurrency: Dict[str, int],
+        schedules: Optional[List[Schedule]] = None,
+        lease_seconds: float = 300,
+        poll_seconds: float = 2,
+        retry_base_seconds: float = 30,
+        retry_max_seconds: float = 3600,
+        max_attempts: int = 5,
+    ):
+        """
+        Args:
+            queue (JobQueue): Queue to take jobs from
+            handlers (Dict[str, JobHandler]): Handler per job type
+            concurrency (Dict[str, int]): Worker threads per job type; types left out get one
+            schedules (Optional[List[Schedule]]): Jobs to enqueue periodically
+            lease_seconds (float): How long a claimed job stays running without a heartbeat
+            poll_seconds (float): Wait of an idle worker before it checks the queue again
+            retry_base_seconds (float): Delay before the first retry, doubled for every further one
+            retry_max_seconds (float): Upper bound of the retry delay
+            max_attempts (int): Attempts of scheduled jobs
+        """
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = {job_type: concurrency.get(job_type, 1) for job_type in handlers}
+        self.schedules = schedules or []
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.max_attempts = max_attempts
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._running: Dict[int, Job] = {}
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        # Jobs of a previous process that did not stop cleanly resume right away
+        self.queue.requeue_expired()
+        summary = ", ".join(f"{job_type}={count}" for job_type, count in self.concurrency.items())
+        print(f"Job runner {self.worker_id} starting with workers {summary}")
+        for job_type, workers in self.concurrency.items():
+            for i in range(workers):
+                thread = threading.Thread(
+                    target=self._work, args=(job_type,), name=f"{job_type}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        maintenance = threading.Thread(target=self._maintain, name="job-maintenance", daemon=True)
+        maintenance.start()
+        self._threads.append(maintenance)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Lets the workers finish their current job and stops them."""
+        self._stop.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+        if self.running():
+            # Their leases expire and the next start queues them again
+            print(f"Stopped with {len(self.running())} jobs still running")
+
+    def running(self) -> List[Job]:
+        with self._lock:
+            return list(self._running.values())
+
+    def _work(self, job_type: str) -> None:
+        handler = self.handlers[job_type]
+        worker = f"{self.worker_id}/{threading.current_thread().name}"
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(job_type, worker, self.lease_seconds)
+            except Exception as e:
+                print(f"Error claiming {job_type} job: {e}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_seconds)
+                continue
+            self._run(job, handler)
+
+    def _run(self, job: Job, handler: JobHandler) -> None:
+        with self._lock:
+            self._running[job.job_id] = job
+        print(f"Running {job.job_type} job {job.job_id} (attempt {job.attempts}/{job.max_attempts}): {job.payload}")
+        started = time.perf_counter()
+        try:
+            result = handler(job)
+            if self.queue.succeed(job.job_id, job.worker, result):
+                print(f"Finished {job.job_type} job {job.job_id} in {time.perf_counter() - started:.1f}s: {result}")
+            else:
+                print(f"Dropped the result of {job.job_type} job {job.job_id}: its lease expired and it was queued again")
+        except Exception as e:
+            retry_in = None if isinstance(e, PermanentJobError) else retry_delay(
+                job.attempts, self.retry_base_seconds, self.retry_max_seconds
+            )
+            try:
+                status = self.queue.fail(job.job_id, job.worker, f"{type(e).__name__}: {e}", retry_in)
+            except Exception as record_error:
+                # The lease runs out and the job is retried from there
+                print(f"Error recording failure of job {job.job_id}: {record_error}")
+                status = JobQueue.FAILED
+            if status == JobQueue.QUEUED:
+                print(f"{job.job_type} job {job.job_id} failed: {e}; retrying in {retry_in:.0f}s")
+            elif status is None:
+                print(f"{job.job_type} job {job.job_id} failed: {e}; dropped, its lease expired and it was queued again")
+            else:
+                print(f"{job.job_type} job {job.job_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._running.pop(job.job_id, None)
+
+    def _maintain(self) -> None:
+        # Heartbeats well within the lease, so a slow round trip never lets a live job expire
+        interval = min(self.lease_seconds / 3, 30)
+        while not self._stop.is_set():
+            try:
+                self.queue.heartbeat([job.job_id for job in self.running()], self.lease_seconds)
+                self.queue.requeue_expired()
+                for schedule in self.schedules:
+                    if self.queue.claim_schedule(schedule.name, schedule.interval_seconds):
+                        job_id = self.queue.enqueue(
+                            schedule.job_type,
+                            schedule.payload,
+                            dedupe_key=schedule.dedupe_key,
+                            max_attempts=self.max_attempts,
+                        )
+                        if job_id is not None:
+                            print(f"Scheduled {schedule.name}: {schedule.job_type} job {job_id}")
+            except Exception as e:
+                print(f"Error in job maintenance: {e}")
+            self._stop.wait(interval)
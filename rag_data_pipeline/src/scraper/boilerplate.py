@@ -0,0 +1,187 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import defaultdict
+
+from bs4 import NavigableString, Tag
+
+
+# Elements that can be stripped as a whole. Headings, main and article are never removed on their own.
+BLOCK_TAGS = frozenset({
+    "div", "section", "aside", "form", "ul", "ol", "li", "table", "p", "dl", "figure", "blockquote", "span",
+})
+
+# Blocks with less text than this are never counted or stripped, e.g. a lone "Read more"
+BLOCK_MIN_CHARS = 20
+
+
+def subtree_hashes(root):
+    """
+    Hashes every element under `root` by its tag names and text, ignoring attributes.
+
+    Each element's hash is built from its children's hashes (a Merkle tree),
+    so the whole page is hashed in one post-order pass, linear in its size.
+    Attributes are left out because repeated blocks often differ only in
+    per-page ids or share links.
+
+    Args:
+        root (Tag): Element to hash, usually the page body.
+
+    Returns:
+        dict: id(element) -> (hex hash, characters of normalized text)
+    """
+    hashes = {}
+    stack = [(root, False)]
+    while stack:
+        element, children_done = stack.pop()
+        if not children_done:
+            stack.append((element, True))
+            stack.extend((child, False) for child in reversed(element.contents) if isinstance(child, Tag))
+            continue
+
+        digest = hashlib.blake2b(element.name.encode("utf-8"), digest_size=8)
+        chars = 0
+        for child in element.contents:
+            if isinstance(child, Tag):
+                child_hash, child_chars = hashes[id(child)]
+                digest.update(child_hash.encode("ascii"))
+                chars += child_chars
+            elif type(child) is NavigableString:
+                # Comments, doctypes and CDATA are subclasses and are skipped
+                text = " ".join(child.split())
+                digest.update(text.encode("utf-8"))
+                chars += len(text)
+        hashes[id(element)] = (digest.hexdigest(), chars)
+    return hashes
+
+
+def strip_boilerplate(root, boilerplate):
+    """
+    Removes the outermost blocks under `root` whose hash is known boilerplate.
+
+    Args:
+        root (Tag): Page body, modified in place.
+        boilerplate (frozenset[str]): Block hashes learned for the page's site.
+
+    Returns:
+        tuple[list[str], int, int]: Hashes of the page's blocks (to learn from),
+            characters of text on the page and characters removed.
+    """
+    hashes = subtree_hashes(root)
+    page_hashes = set()
+    outermost = []
+    # Pre-order walk that does not descend into removed blocks, so every element is visited once
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        block_hash, chars = hashes[id(element)]
+        if element is not root and element.name in BLOCK_TAGS and chars >= BLOCK_MIN_CHARS:
+            page_hashes.add(block_hash)
+            if block_hash in boilerplate:
+                outermost.append(element)
+                # Blocks inside are still counted, so nested repeats are learned too
+                for child in element.find_all(BLOCK_TAGS):
+                    child_hash, child_chars = hashes[id(child)]
+                    if child_chars >= BLOCK_MIN_CHARS:
+                        page_hashes.add(child_hash)
+                continue
+        stack.extend(child for child in element.contents if isinstance(child, Tag))
+
+    total = hashes[id(root)][1]
+    removed = sum(hashes[id(element)][1] for element in outermost)
+    # A page made only of repeated blocks (e.g. a duplicate URL) is kept whole for the dedup stage to judge
+    if not outermost or total - removed < BLOCK_MIN_CHARS:
+        return list(page_hashes), total, 0
+    for element in outermost:
+        element.decompose()
+    return list(page_hashes), total, removed
+
+
+class BoilerplateModel:
+    """
+    Learns the blocks a site repeats on its pages: cookie banners, CTAs,
+    sidebars, related-post entries.
+
+    Pages report the hashes of their blocks as they are converted. A block
+    seen on `min_pages` different pages of the same host becomes boilerplate
+    and is stripped from every later page of that host before conversion.
+    The learned blocks are kept in SQLite, so the next crawl strips them from
+    its first page on. Shared by the fetch threads of WebScraper.
+    """
+
+    def __init__(self, path, min_pages=3):
+        """
+        Args:
+            path (str): SQLite file holding the learned blocks.
+            min_pages (int): Pages a block must appear on to count as boilerplate.
+        """
+        self.path = path
+        self.min_pages = min_pages
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: defaultdict(int))
+        self._known = defaultdict(set)
+        self._new = set()
+        self._snapshots = {}
+        self.pages = 0
+        self.stripped_pages = 0
+        self.chars = 0
+        self.stripped_chars = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with sqlite3.connect(path) as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS boilerplate_blocks ("
+                "host TEXT NOT NULL, block_hash TEXT NOT NULL, PRIMARY KEY (host, block_hash))"
+            )
+            for host, block_hash in connection.execute("SELECT host, block_hash FROM boilerplate_blocks"):
+                self._known[host].add(block_hash)
+
+    def snapshot(self, host):
+        """
+        Boilerplate of a host as passed to html_to_markdown.
+
+        Returns:
+            tuple[frozenset[str], str]: The block hashes and a short version of the set,
+                used to key cached conversions
+        """
+        with self._lock:
+            if host not in self._snapshots:
+                known = frozenset(self._known[host])
+                version = hashlib.blake2b("\n".join(sorted(known)).encode("ascii"), digest_size=6).hexdigest()
+                self._snapshots[host] = (known, version)
+            return self._snapshots[host]
+
+    def observe(self, host, block_hashes, total_chars, stripped_chars):
+        """Counts a converted page's blocks (each once per page) and how much was stripped from it."""
+        with self._lock:
+            self.pages += 1
+            self.stripped_pages += stripped_chars > 0
+            self.chars += total_chars
+            self.stripped_chars += stripped_chars
+            counts, known = self._counts[host], self._known[host]
+            for block_hash in block_hashes:
+                counts[block_hash] += 1
+                if counts[block_hash] >= self.min_pages and block_hash not in known:
+                    known.add(block_hash)
+                    self._new.add((host, block_hash))
+                    self._snapshots.pop(host, None)
+
+    def save(self):
+        """Stores the blocks learned since the last save."""
+        with self._lock:
+            rows, self._new = list(self._new), set()
+        if rows:
+            with sqlite3.connect(self.path) as connection:
+                connection.executemany("INSERT OR IGNORE INTO boilerplate_blocks (host, block_hash) VALUES (?, ?)", rows)
+
+    def stats(self):
+        with self._lock:
+            share = self.stripped_chars / self.chars if self.chars else 0.0
+            known = sum(len(blocks) for blocks in self._known.values())
+            return (
+                f"Boilerplate: stripped {self.stripped_chars:,} of {self.chars:,} characters ({share:.1%}) "
+                f"from {self.stripped_pages}/{self.pages} converted pages, {known} repeated blocks known"
+            )
@@ -0,0 +1,321 @@
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
+from urllib.robotparser import RobotFileParser
+
+from src.ingestion.profiler import get_profiler
+from src.scraper.web_scraper import LINK_PREFIXES, WebScraper
+
+
+# Query parameters that never change page content
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|gclid|fbclid|mc_cid|mc_eid|_ga)$", re.IGNORECASE)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+SITEMAP_LOC_PATTERN = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.IGNORECASE)
+
+
+def normalize_url(url):
+    """
+    Canonical form of a URL for the seen-set.
+
+    Lowercases scheme and host, drops default ports, fragments and tracking
+    parameters, and sorts the query string. Trailing slashes are kept since
+    the site serves distinct pages with and without them.
+
+    Args:
+        url (str): Absolute URL.
+
+    Returns:
+        str: The normalized URL.
+    """
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not TRACKING_PARAMS.match(key)
+    ))
+    return urlunparse((scheme, host, parts.path or "/", "", query, ""))
+
+
+class CrawlFrontier:
+    """
+    Persistent crawl frontier: a priority queue of URLs plus the seen-set, stored
+    in SQLite so an interrupted crawl can resume where it stopped.
+
+    Every URL is recorded once (normalized) with its depth and status. Lower
+    priority values are crawled first; the crawler uses the link depth, so the
+    crawl is breadth-first from the seeds.
+    """
+
+    QUEUED = "queued"
+    IN_PROGRESS = "in_progress"
+    DONE = "done"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS frontier ("
+            "url TEXT PRIMARY KEY, depth INTEGER NOT NULL, priority REAL NOT NULL, "
+            "status TEXT NOT NULL, result TEXT, updated_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS frontier_queue_idx ON frontier (status, priority)")
+        self.connection.commit()
+
+    def reset(self):
+        """Forgets the previous crawl."""
+        self.connection.execute("DELETE FROM frontier")
+        self.connection.commit()
+
+    def requeue_interrupted(self):
+        """Puts URLs that were in flight when a previous crawl stopped back on the queue."""
+        self.connection.execute(
+            "UPDATE frontier SET status = ? WHERE status = ?", (self.QUEUED, self.IN_PROGRESS)
+        )
+        self.connection.commit()
+
+    def push(self, urls, depth, priority=None):
+        """
+        Adds URLs that have not been seen before.
+
+        Returns:
+            int: Number of URLs newly queued.
+        """
+        priority = depth if priority is None else priority
+        now = time.time()
+        before = self.connection.total_changes
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO frontier (url, depth, priority, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+            [(url, depth, priority, self.QUEUED, now) for url in urls],
+        )
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    def pop(self):
+        """
+        Takes the highest priority queued URL and marks it in progress.
+
+        Returns:
+            tuple[str, int] or None: (url, depth), or None when the queue is empty.
+        """
+        row = self.connection.execute(
+            "SELECT url, depth FROM frontier WHERE status = ? ORDER BY priority, updated_at LIMIT 1", (self.QUEUED,)
+        ).fetchone()
+        if row is None:
+            return None
+        self.mark(row[0], self.IN_PROGRESS)
+        return row
+
+    def mark(self, url, status, result=None):
+        self.connection.execute(
+            "UPDATE frontier SET status = ?, result = ?, updated_at = ? WHERE url = ?",
+            (status, json.dumps(result) if result is not None else None, time.time(), url),
+        )
+        self.connection.commit()
+
+    def count(self, *statuses):
+        placeholders = ", ".join("?" for _ in statuses)
+        return self.connection.execute(
+            f"SELECT COUNT(*) FROM frontier WHERE status IN ({placeholders})", statuses
+        ).fetchone()[0]
+
+    def iter_results(self):
+        """Scraped pages of the crawl, including pages completed before a resume, read one at a time."""
+        rows = self.connection.execute(
+            "SELECT result FROM frontier WHERE status = ? ORDER BY depth, priority, url", (self.DONE,)
+        )
+        for row in rows:
+            yield json.loads(row[0])
+
+    def results(self):
+        return list(self.iter_results())
+
+    def urls(self):
+        """Every URL in the seen-set."""
+        return [row[0] for row in self.connection.execute("SELECT url FROM frontier")]
+
+
+class Crawler:
+    """
+    Recursive crawler built on WebScraper.
+
+    Starting from seed URLs (and optionally the sitemaps listed in each host's
+    robots.txt), it follows links accepted by extract_links up to `max_depth`
+    hops and `max_pages` fetched pages. Pages are fetched concurrently on a
+    thread pool (WebScraper's per-host limits apply) and parsed once in a
+    process pool, which yields both the Markdown and the outgoing links.
+    """
+
+    def __init__(
+        self,
+        scraper: WebScraper,
+        frontier_path,
+        max_depth=2,
+        max_pages=200,
+        use_sitemaps=True,
+        user_agent="*",
+    ):
+        """
+        Args:
+            scraper (WebScraper): Scraper whose session, limits and retries are used for fetching.
+            frontier_path (str): SQLite file holding the frontier.
+            max_depth (int): Maximum link hops from a seed, 0 scrapes only the seeds.
+            max_pages (int): Maximum number of pages fetched in one crawl.
+            use_sitemaps (bool): Seed the frontier from sitemaps advertised in robots.txt.
+            user_agent (str): User agent matched against robots.txt rules.
+        """
+        self.scraper = scraper
+        self.frontier = CrawlFrontier(frontier_path)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.use_sitemaps = use_sitemaps
+        self.user_agent = user_agent
+        self.exhausted = False
+        self._robots = {}
+
+    def _robots_for(self, url):
+        parts = urlparse(url)
+        root = f"{parts.scheme}://{parts.netloc}"
+        if root not in self._robots:
+            robots = RobotFileParser(root + "/robots.txt")
+            robots_txt = self.scraper._fetch_page(root + "/robots.txt")
+            # A missing robots.txt allows everything
+            robots.parse(robots_txt.splitlines() if robots_txt else [])
+            delay = robots.crawl_delay(self.user_agent)
+            if delay:
+                self.scraper.limiter.set_delay(parts.netloc, float(delay))
+            self._robots[root] = robots
+        return self._robots[root]
+
+    def _allowed(self, url):
+        return self._robots_for(url).can_fetch(self.user_agent, url)
+
+    def _sitemap_urls(self, seeds, max_sitemaps=20):
+        """Page URLs listed in the sitemaps of the seed hosts that match LINK_PREFIXES."""
+        pending = []
+        for seed in seeds:
+            pending.extend(self._robots_for(seed).site_maps() or [])
+
+        urls, visited = [], set()
+        while pending and len(visited) < max_sitemaps:
+            sitemap = pending.pop(0)
+            if sitemap in visited:
+                continue
+            visited.add(sitemap)
+            body = self.scraper._fetch_page(sitemap)
+            if not body:
+                continue
+            for loc in SITEMAP_LOC_PATTERN.findall(body):
+                loc = urljoin(sitemap, loc)
+                if urlparse(loc).path.endswith(".xml"):
+                    pending.append(loc)
+                elif loc.startswith(LINK_PREFIXES):
+                    urls.append(loc)
+        return urls
+
+    def crawl(self, seeds, resume=False):
+        """
+        Crawls from the seeds and returns every scraped page.
+
+        Args:
+            seeds (list[str]): Start URLs, always crawled regardless of LINK_PREFIXES.
+            resume (bool): Continue the crawl stored in the frontier instead of starting over.
+
+        Returns:
+            list[dict]: Pages in the same shape as WebScraper.get_markdown.
+        """
+        self.run(seeds, resume)
+        return self.frontier.results()
+
+    def run(self, seeds, resume=False):
+        """
+        Crawls from the seeds, leaving the scraped pages in the frontier.
+
+        Args:
+            seeds (list[str]): Start URLs, always crawled regardless of LINK_PREFIXES.
+            resume (bool): Continue the crawl stored in the frontier instead of starting over.
+        """
+        if resume:
+            self.frontier.requeue_interrupted()
+        else:
+            self.frontier.reset()
+
+        seeds = [normalize_url(url) for url in seeds]
+        self.frontier.push(seeds, depth=0)
+        if self.use_sitemaps:
+            sitemap_urls = [normalize_url(url) for url in self._sitemap_urls(seeds)]
+            added = self.frontier.push(sitemap_urls, depth=1)
+            print(f"Seeded {added} URLs from sitemaps")
+
+        started = time.perf_counter()
+        fetched = self.frontier.count(CrawlFrontier.DONE, CrawlFrontier.FAILED)
+        crawled_this_run = 0
+        workers = self.scraper.max_workers
+        converter = ProcessPoolExecutor(max_workers=self.scraper.convert_processes) \
+            if self.scraper.convert_processes != 0 else None
+
+        profiler = get_profiler()
+        in_flight = {}
+        try:
+            with profiler.stage("scraping"), ThreadPoolExecutor(max_workers=workers) as fetchers:
+                while True:
+                    while len(in_flight) < workers and fetched + len(in_flight) < self.max_pages:
+                        item = self.frontier.pop()
+                        if item is None:
+                            break
+                        url, depth = item
+                        if not self._allowed(url):
+                            self.frontier.mark(url, CrawlFrontier.SKIPPED)
+                            continue
+                        in_flight[fetchers.submit(self.scraper.scrape_page, url, converter)] = (url, depth)
+
+                    if not in_flight:
+                        break
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url, depth = in_flight.pop(future)
+                        fetched += 1
+                        crawled_this_run += 1
+                        try:
+                            result = future.result()
+                        except Exception as e:
+                            print(f"Error scraping {url}: {e}")
+                            result = None
+
+                        if result is None:
+                            self.frontier.mark(url, CrawlFrontier.FAILED)
+                            profiler.count("scraping", errors=1)
+                            continue
+
+                        self.frontier.mark(url, CrawlFrontier.DONE, result)
+                        profiler.count("scraping", items=1)
+                        if depth < self.max_depth:
+                            self.frontier.push({normalize_url(link) for link in result["links"]}, depth + 1)
+        finally:
+            if converter is not None:
+                converter.shutdown()
+
+        queued = self.frontier.count(CrawlFrontier.QUEUED)
+        self.exhausted = queued == 0
+        elapsed = time.perf_counter() - started
+        print(
+            f"Crawled {crawled_this_run} pages in {elapsed:.1f}s "
+            f"({crawled_this_run / elapsed if elapsed else 0:.2f} pages/sec), "
+            f"{self.frontier.count(CrawlFrontier.DONE)} scraped, {self.frontier.count(CrawlFrontier.FAILED)} failed, "
+            f"{queued} left in the frontier" + ("" if self.exhausted else " (page budget reached)")
+        )
+        if self.scraper.http_cache is not None:
+            print(self.scraper.http_cache.stats())
+        if self.scraper.boilerplate is not None:
+            self.scraper.boilerplate.save()
+            print(self.scraper.boilerplate.stats())
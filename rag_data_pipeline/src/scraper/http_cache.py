@@ -0,0 +1,268 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+
+class CachedPage(NamedTuple):
+    url: str
+    text: str
+    # sha256 of the body, None when the page was fetched without the cache
+    body_hash: Optional[str]
+    # True when the server answered 304 or the page was replayed offline
+    not_modified: bool
+
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode for URLs that were never cached."""
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache shared by the web scraper and the YouTube metadata fetch.
+
+    Bodies are stored content-addressed (bodies/<sha256[:2]>/<sha256>), so
+    identical pages are kept once, and an SQLite index maps each URL to its
+    body hash plus the ETag / Last-Modified validators. Requests are revalidated
+    with If-None-Match / If-Modified-Since; a 304 is answered from disk.
+
+    Results derived from a body (e.g. its Markdown conversion) can be stored
+    next to it by body hash, so unchanged pages skip conversion entirely.
+
+    A body no URL points at any more (the page changed) is deleted with its
+    derived results. Bodies carry their size and last access time; once the
+    cache grows past `max_bytes`, the least recently used bodies and the URLs
+    pointing at them are evicted down to 90%.
+
+    In offline mode nothing touches the network: cached URLs are replayed and
+    anything else raises OfflineCacheMiss, which makes ingestion runs
+    reproducible for benchmarking.
+    """
+
+    def __init__(self, cache_dir: str, offline: bool = False, max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.offline = offline
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(cache_dir, "bodies"), exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._index.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body_hash TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._index.execute("CREATE INDEX IF NOT EXISTS responses_body_hash_idx ON responses (body_hash)")
+        self._index.execute(
+            "CREATE TABLE IF NOT EXISTS bodies ("
+            "body_hash TEXT PRIMARY KEY, size_bytes INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._index.execute("CREATE INDEX IF NOT EXISTS bodies_last_access_idx ON bodies (last_access)")
+        self._index.commit()
+        with self._lock:
+            self._track_existing_bodies()
+            # Upper bound of the stored size, summed up again only when it crosses max_bytes
+            self._total_bytes = self._index.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM bodies").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def _track_existing_bodies(self) -> None:
+        """Registers the bodies of a cache written before sizes were tracked, deleting unreferenced ones."""
+        if self._index.execute("SELECT 1 FROM bodies LIMIT 1").fetchone() is not None:
+            return
+        referenced = {row[0] for row in self._index.execute("SELECT DISTINCT body_hash FROM responses")}
+        rows = []
+        for directory, _, files in os.walk(os.path.join(self.cache_dir, "bodies")):
+            for name in files:
+                if name in referenced:
+                    rows.append((name, self._stored_size(name), time.time()))
+                elif not name.endswith(".tmp"):
+                    self._remove_files(name)
+        self._index.executemany("INSERT OR REPLACE INTO bodies (body_hash, size_bytes, last_access) VALUES (?, ?, ?)", rows)
+        self._index.commit()
+
+    def _body_path(self, body_hash: str) -> str:
+        return os.path.join(self.cache_dir, "bodies", body_hash[:2], body_hash)
+
+    def _derived_path(self, body_hash: str, kind: str) -> str:
+        return os.path.join(self.cache_dir, "derived", kind, f"{body_hash}.json")
+
+    def _derived_paths(self, body_hash: str) -> List[str]:
+        derived_dir = os.path.join(self.cache_dir, "derived")
+        kinds = os.listdir(derived_dir) if os.path.isdir(derived_dir) else []
+        return [self._derived_path(body_hash, kind) for kind in kinds]
+
+    def _stored_size(self, body_hash: str) -> int:
+        """Bytes on disk of a body and everything derived from it."""
+        size = 0
+        for path in [self._body_path(body_hash)] + self._derived_paths(body_hash):
+            try:
+                size += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return size
+
+    def _remove_files(self, body_hash: str) -> None:
+        for path in [self._body_path(body_hash)] + self._derived_paths(body_hash):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _release(self, body_hash: str) -> None:
+        """Deletes a body and its derived results once no URL points at it; call with the lock held."""
+        if self._index.execute("SELECT 1 FROM responses WHERE body_hash = ? LIMIT 1", (body_hash,)).fetchone():
+            return
+        self._index.execute("DELETE FROM bodies WHERE body_hash = ?", (body_hash,))
+        self._remove_files(body_hash)
+
+    def _touch(self, body_hash: str) -> None:
+        with self._lock:
+            self._index.execute("UPDATE bodies SET last_access = ? WHERE body_hash = ?", (time.time(), body_hash))
+            self._index.commit()
+
+    def _evict(self) -> None:
+        """Evicts the least recently used bodies down to 90% of max_bytes; call with the lock held."""
+        total = self._index.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM bodies").fetchone()[0]
+        self._total_bytes = total
+        if total <= self.max_bytes:
+            return
+
+        to_free = total - int(self.max_bytes * 0.9)
+        victims = []
+        for body_hash, size_bytes in self._index.execute("SELECT body_hash, size_bytes FROM bodies ORDER BY last_access"):
+            victims.append(body_hash)
+            to_free -= size_bytes
+            self._total_bytes -= size_bytes
+            if to_free <= 0:
+                break
+
+        for body_hash in victims:
+            # The URLs are downloaded in full again on their next fetch
+            self._index.execute("DELETE FROM responses WHERE body_hash = ?", (body_hash,))
+            self._index.execute("DELETE FROM bodies WHERE body_hash = ?", (body_hash,))
+            self._remove_files(body_hash)
+        self._index.commit()
+        print(f"HTTP cache: evicted {len(victims)} bodies to stay under {self.max_bytes / 1024 / 1024:.0f} MiB")
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _entry(self, url: str):
+        with self._lock:
+            return self._index.execute(
+                "SELECT etag, last_modified, body_hash FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _read_body(self, body_hash: str) -> Optional[str]:
+        try:
+            with open(self._body_path(body_hash), "rb") as f:
+                return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def get(self, session, url: str, timeout: float = 15) -> CachedPage:
+        """
+        Fetches a URL through the cache.
+
+        Args:
+            session: requests-compatible session used for the request.
+            url (str): The URL to fetch.
+            timeout (float): Request timeout in seconds.
+
+        Returns:
+            CachedPage: The page body, from the network or from disk.
+
+        Raises:
+            OfflineCacheMiss: In offline mode, when the URL is not cached.
+            requests.HTTPError: For error responses, so callers can decide to retry.
+        """
+        entry = self._entry(url)
+        body = self._read_body(entry[2]) if entry else None
+
+        if self.offline:
+            if body is None:
+                raise OfflineCacheMiss(f"{url} is not in the HTTP cache")
+            self.hits += 1
+            self._touch(entry[2])
+            return CachedPage(url, body, entry[2], True)
+
+        headers = {}
+        if body is not None:
+            etag, last_modified, _ = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = session.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and body is not None:
+            self.hits += 1
+            self._touch(entry[2])
+            return CachedPage(url, body, entry[2], True)
+        response.raise_for_status()
+        self.misses += 1
+
+        data = response.text.encode("utf-8")
+        body_hash = hashlib.sha256(data).hexdigest()
+        # Under the lock, so a body is never released or evicted between its write and its index row
+        with self._lock:
+            now = time.time()
+            if not os.path.exists(self._body_path(body_hash)):
+                self._write_atomic(self._body_path(body_hash), data)
+            if self._index.execute(
+                "UPDATE bodies SET last_access = ? WHERE body_hash = ?", (now, body_hash)
+            ).rowcount == 0:
+                self._index.execute(
+                    "INSERT INTO bodies (body_hash, size_bytes, last_access) VALUES (?, ?, ?)", (body_hash, len(data), now)
+                )
+                self._total_bytes += len(data)
+            self._index.execute(
+                "INSERT OR REPLACE INTO responses (url, etag, last_modified, body_hash, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, response.headers.get("ETag"), response.headers.get("Last-Modified"), body_hash, now),
+            )
+            # The page changed: its previous body and conversions are dropped unless another URL has the same body
+            if entry is not None and entry[2] != body_hash:
+                self._release(entry[2])
+            self._index.commit()
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+        # Servers without validators still count as unchanged when the body is identical
+        return CachedPage(url, response.text, body_hash, entry is not None and entry[2] == body_hash)
+
+    def get_derived(self, body_hash: Optional[str], kind: str) -> Optional[dict]:
+        """Returns a result previously derived from this body, if any."""
+        if body_hash is None:
+            return None
+        try:
+            with open(self._derived_path(body_hash, kind)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put_derived(self, body_hash: Optional[str], kind: str, value: dict) -> None:
+        if body_hash is None:
+            return
+        data = json.dumps(value).encode("utf-8")
+        path = self._derived_path(body_hash, kind)
+        with self._lock:
+            # Nothing is derived from a body that was released or evicted in the meantime
+            if self._index.execute("SELECT 1 FROM bodies WHERE body_hash = ?", (body_hash,)).fetchone() is None:
+                return
+            replaced = os.path.getsize(path) if os.path.exists(path) else 0
+            self._write_atomic(path, data)
+            self._index.execute(
+                "UPDATE bodies SET size_bytes = size_bytes + ? WHERE body_hash = ?", (len(data) - replaced, body_hash)
+            )
+            self._index.commit()
+            self._total_bytes += len(data) - replaced
+
+    def stats(self) -> str:
+        return f"HTTP cache: {self.hits} served from disk, {self.misses} downloaded" + (" (offline)" if self.offline else "")
@@ -1,17 +1,244 @@
 import json
+import random
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlparse
+
 import html2text
 from bs4 import BeautifulSoup
 import cloudscraper
 
+from src.ingestion.profiler import get_profiler
+from src.scraper.boilerplate import strip_boilerplate
+from src.scraper.http_cache import CachedPage, OfflineCacheMiss
+
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Bump when html_to_markdown output changes, so cached conversions are not reused
+CONVERSION_CACHE_KIND = "markdown-v1"
+
+BASE_URL = "https://wso2.com"
+
+# Only links under these prefixes are followed
+LINK_PREFIXES = (
+    "https://wso2.com/library/blogs/",
+    "https://wso2.com/library/conference",
+    "https://wso2.com/customers",
+)
+
+
+def extract_links(soup, page_url, base_url=BASE_URL):
+    """
+    Extract and filter relevant links from a parsed page.
+
+    Args:
+        soup (BeautifulSoup): The parsed page.
+        page_url (str): The URL of the page, used to resolve relative links.
+        base_url (str): Site root that relative /library and /customers links belong to.
+
+    Returns:
+        list[str]: Absolute URLs starting with one of LINK_PREFIXES.
+    """
+    filtered_links = []
+    for a in soup.find_all("a", href=True):
+        link = a["href"].strip()
+        # Convert relative URLs to absolute URLs
+        if link.startswith("/library") or link.startswith("/customers"):
+            link = base_url + link
+        else:
+            link = urljoin(page_url, link)
+
+        # Apply filtering rules
+        if link.startswith(LINK_PREFIXES):
+            filtered_links.append(link)
+
+    return filtered_links
+
+
+def html_to_markdown(url, page_source, boilerplate=frozenset()):
+    """
+    Parse a page and convert its body to Markdown along with metadata.
+
+    The page is parsed once for both its content and its outgoing links.
+    Module-level so it can run in a worker process.
+
+    Args:
+        url (str): The URL the page was fetched from.
+        page_source (str): The HTML content of the page.
+        boilerplate (frozenset[str]): Hashes of blocks the site repeats across pages, stripped before conversion.
+
+    Returns:
+        dict: A dictionary with 'url', 'metadata', 'content_markdown' and 'links',
+              plus 'boilerplate' with the page's block hashes for BoilerplateModel.observe.
+    """
+    soup = BeautifulSoup(page_source, "html.parser")
+
+    # Links first, navigation is removed below
+    links = extract_links(soup, url)
+
+    # Metadata
+    title = soup.title.string if soup.title and soup.title.string else "No title found"
+    description_tag = soup.find("meta", attrs={"name": "description"})
+    description = description_tag.get("content", "") if description_tag else "No description found"
+
+    metadata = {
+        "title": title.strip(),
+        "description": description.strip(),
+        "source": url
+    }
+
+    # Remove unnecessary tags
+    for tag in soup(["script", "style", "nav", "header", "footer"]):
+        tag.decompose()
+
+    # Convert body HTML to Markdown
+    h = html2text.HTML2Text()
+    h.ignore_images = True
+    h.ignore_links = True
+    h.body_width = 0
+
+    full_content_html = soup.body if soup.body else soup
+    block_hashes, chars, stripped_chars = strip_boilerplate(full_content_html, boilerplate)
+    markdown_content = h.handle(str(full_content_html))
+
+    return {
+        "url": url,
+        "metadata": metadata,
+        "content_markdown": markdown_content,
+        "links": links,
+        "boilerplate": {"block_hashes": block_hashes, "chars": chars, "stripped_chars": stripped_chars},
+    }
+
+
+def _timed_html_to_markdown(url, page_source, boilerplate=frozenset()):
+    started = time.perf_counter()
+    result = html_to_markdown(url, page_source, boilerplate)
+    return result, time.perf_counter() - started
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _HostLimiter:
+    """Caps concurrent requests per host and spaces out request starts to the same host."""
+
+    def __init__(self, max_per_host, min_delay):
+        self.max_per_host = max_per_host
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+        self._delays = {}
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._semaphores[host]
+
+    def set_delay(self, host, delay):
+        """Raises the spacing for one host, e.g. to honour a robots.txt Crawl-delay."""
+        with self._lock:
+            self._delays[host] = max(delay, self.min_delay)
+
+    def acquire(self, host):
+        self._semaphore(host).acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self._delays.get(host, self.min_delay)
+        if start > now:
+            time.sleep(start - now)
+
+    def release(self, host):
+        self._semaphore(host).release()
+
 
 class WebScraper:
-    def __init__(self):
+    def __init__(
+        self, max_workers=16, max_per_host=4, host_delay=0.25, convert_processes=None, retries=3, http_cache=None,
+        boilerplate=None,
+    ):
         """
         Initialize the WebScraper instance.
         Sets the base URL for relative link resolution.
+
+        Args:
+            max_workers (int): Number of concurrent fetch threads for scrape_many.
+            max_per_host (int): Maximum concurrent requests to a single host.
+            host_delay (float): Minimum seconds between request starts to the same host.
+            convert_processes (int or None): Worker processes for HTML to Markdown
+                conversion, None for one per CPU and 0 to convert on the fetch threads.
+            retries (int): Retries for connection errors, 429 and 5xx responses.
+            http_cache (HttpCache or None): Conditional-GET cache for fetched pages.
+            boilerplate (BoilerplateModel or None): Learns and strips blocks repeated across a site's pages.
         """
         self.scraper = cloudscraper.create_scraper()
-        self.base_url = "https://wso2.com"
+        self.base_url = BASE_URL
+        self.max_workers = max_workers
+        self.convert_processes = convert_processes
+        self.retries = retries
+        self.http_cache = http_cache
+        self.boilerplate = boilerplate
+        self.limiter = _HostLimiter(max_per_host, host_delay)
+
+        # One session shared by all fetch threads; size its pool so threads reuse connections
+        for adapter in self.scraper.adapters.values():
+            adapter.init_poolmanager(max_workers, max_workers)
+
+    def _get(self, url):
+        if self.http_cache is not None:
+            return self.http_cache.get(self.scraper, url, timeout=15)
+        response = self.scraper.get(url, timeout=15)
+        response.raise_for_status()
+        return CachedPage(url, response.text, None, False)
+
+    def _fetch(self, url):
+        """
+        Fetch a page through the HTTP cache, if configured.
+
+        Retries transient failures with exponential backoff plus jitter and respects
+        the per-host concurrency and politeness limits.
+
+        Args:
+            url (str): The URL of the page to fetch.
+
+        Returns:
+            CachedPage or None: The page if successful, None otherwise.
+        """
+        if self.http_cache is not None and self.http_cache.offline:
+            try:
+                return self._get(url)
+            except OfflineCacheMiss as e:
+                print(f"Error fetching {url}: {e}")
+                return None
+
+        host = urlparse(url).netloc
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire(host)
+            try:
+                return self._get(url)
+            except Exception as e:
+                response = getattr(e, "response", None)
+                status_code = getattr(response, "status_code", None)
+                if attempt >= self.retries or (status_code is not None and status_code not in RETRY_STATUS_CODES):
+                    print(f"Error fetching {url}: {e}")
+                    return None
+                retry_after = response.headers.get("Retry-After") if response is not None else None
+                delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+                delay += random.uniform(0, delay)
+                print(f"Retrying {url} in {delay:.1f}s ({e})")
+                get_profiler().count("scraping", retries=1)
+            finally:
+                self.limiter.release(host)
+            time.sleep(delay)
 
     def _fetch_page(self, url):
         """
@@ -23,14 +250,69 @@ class WebScraper:
         Returns:
             str or None: The HTML content as a string if successful, None otherwise.
         """
-        try:
-            response = self.scraper.get(url, timeout=15)
-            response.raise_for_status()
-            return response.text
-        except Exception as e:
-            print(f"Error fetching {url}: {e}")
+        page = self._fetch(url)
+        return page.text if page else None
+
+    def _boilerplate_for(self, url):
+        """
+        Known boilerplate of the page's host and the cache kind of conversions made with it.
+
+        Returns:
+            tuple[frozenset[str], str]: Block hashes to strip and the conversion cache kind.
+        """
+        if self.boilerplate is None:
+            return frozenset(), CONVERSION_CACHE_KIND
+        known, version = self.boilerplate.snapshot(urlparse(url).netloc)
+        return known, f"{CONVERSION_CACHE_KIND}-{version}"
+
+    def _learn(self, url, result):
+        """Feeds the page's blocks to the boilerplate model and removes them from the result."""
+        blocks = result.pop("boilerplate", None)
+        if blocks is not None and self.boilerplate is not None:
+            self.boilerplate.observe(
+                urlparse(url).netloc, blocks["block_hashes"], blocks["chars"], blocks["stripped_chars"]
+            )
+        return result
+
+    def _cached_conversion(self, page, kind=CONVERSION_CACHE_KIND):
+        """Markdown previously converted from the same body, so unchanged pages skip parsing."""
+        if self.http_cache is None:
+            return None
+        result = self.http_cache.get_derived(page.body_hash, kind)
+        if result is not None:
+            result["url"] = page.url
+            result["metadata"]["source"] = page.url
+        return result
+
+    def _store_conversion(self, page, result, kind=CONVERSION_CACHE_KIND):
+        if self.http_cache is not None:
+            self.http_cache.put_derived(page.body_hash, kind, result)
+
+    def scrape_page(self, url, converter=None):
+        """
+        Fetch and convert one page, reusing the cached conversion when the body is unchanged.
+
+        Args:
+            url (str): The URL of the page to scrape.
+            converter (ProcessPoolExecutor or None): Pool to run the conversion in.
+
+        Returns:
+            dict or None: Same as get_markdown.
+        """
+        page = self._fetch(url)
+        if not page:
             return None
 
+        boilerplate, kind = self._boilerplate_for(url)
+        result = self._cached_conversion(page, kind)
+        if result is None:
+            if converter is not None:
+                result = converter.submit(html_to_markdown, url, page.text, boilerplate).result()
+            else:
+                result = html_to_markdown(url, page.text, boilerplate)
+            self._store_conversion(page, self._learn(url, result), kind)
+        return result
+
     def get_markdown(self, url):
         """
         Scrape the webpage and return its content as Markdown along with metadata.
@@ -43,43 +325,89 @@ class WebScraper:
                 - 'url': the URL of the page
                 - 'metadata': a dictionary with 'title' and 'description'
                 - 'content_markdown': the body content converted to Markdown
+                - 'links': filtered outgoing links, see extract_links
             Returns None if page fetch fails.
         """
-        page_source = self._fetch_page(url)
-        if not page_source:
-            return None
+        return self.scrape_page(url)
 
-        soup = BeautifulSoup(page_source, "html.parser")
+    def scrape_many(self, urls):
+        """
+        Scrape many pages concurrently.
+
+        Pages are fetched on a thread pool (bounded per host) and handed to a
+        process pool for the CPU-heavy HTML to Markdown conversion as soon as
+        they arrive, so parsing overlaps with the remaining fetches.
+
+        Args:
+            urls (list[str]): The URLs of the pages to scrape.
 
-        # Metadata
-        title = soup.title.string if soup.title else "No title found"
-        description_tag = soup.find("meta", attrs={"name": "description"})
-        description = description_tag["content"] if description_tag else "No description found"
+        Returns:
+            list[dict]: Results in the same shape as get_markdown, in input order.
+                        Pages that could not be fetched are left out.
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return []
 
-        metadata = {
-            "title": title.strip(),
-            "description": description.strip(),
-            "source": url
-        }
+        started = time.perf_counter()
+        fetch_latencies = []
+        convert_latencies = []
 
-        # Remove unnecessary tags
-        for tag in soup(["script", "style", "nav", "header", "footer"]):
-            tag.decompose()
+        def timed_fetch(url):
+            fetch_started = time.perf_counter()
+            page = self._fetch(url)
+            fetch_latencies.append(time.perf_counter() - fetch_started)
+            return page
 
-        # Convert body HTML to Markdown
-        h = html2text.HTML2Text()
-        h.ignore_images = True
-        h.ignore_links = True
-        h.body_width = 0
+        profiler = get_profiler()
+        use_processes = self.convert_processes != 0 and len(urls) > 1
+        converter = ProcessPoolExecutor(max_workers=self.convert_processes) if use_processes else None
+        conversions = {}
+        results = {}
+        try:
+            with profiler.stage("scraping"), ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as fetchers:
+                fetches = {fetchers.submit(timed_fetch, url): url for url in urls}
+                for future in as_completed(fetches):
+                    url = fetches[future]
+                    page = future.result()
+                    if not page:
+                        continue
+                    boilerplate, kind = self._boilerplate_for(url)
+                    cached = self._cached_conversion(page, kind)
+                    if cached is not None:
+                        results[url] = cached
+                        continue
+                    pool = converter if converter is not None else fetchers
+                    conversions[url] = (page, kind, pool.submit(_timed_html_to_markdown, url, page.text, boilerplate))
 
-        full_content_html = soup.body if soup.body else soup
-        markdown_content = h.handle(str(full_content_html))
+            for url, (page, kind, future) in conversions.items():
+                try:
+                    results[url], convert_seconds = future.result()
+                    convert_latencies.append(convert_seconds)
+                    self._store_conversion(page, self._learn(url, results[url]), kind)
+                except Exception as e:
+                    print(f"Error converting {url}: {e}")
+        finally:
+            if converter is not None:
+                converter.shutdown()
 
-        return {
-            "url": url,
-            "metadata": metadata,
-            "content_markdown": markdown_content
-        }
+        profiler.count("scraping", items=len(results), errors=len(urls) - len(results))
+        elapsed = time.perf_counter() - started
+        print(
+            f"Scraped {len(results)}/{len(urls)} pages in {elapsed:.1f}s "
+            f"({len(results) / elapsed if elapsed else 0:.2f} pages/sec), "
+            f"fetch latency p50 {_percentile(fetch_latencies, 0.5):.2f}s p95 {_percentile(fetch_latencies, 0.95):.2f}s"
+            + (
+                f", convert latency p50 {_percentile(convert_latencies, 0.5):.2f}s"
+                if convert_latencies else ""
+            )
+        )
+        if self.http_cache is not None:
+            print(f"{self.http_cache.stats()}, {len(results) - len(conversions)} conversions reused")
+        if self.boilerplate is not None:
+            self.boilerplate.save()
+            print(self.boilerplate.stats())
+        return [results[url] for url in urls if url in results]
 
     def get_urls(self, url):
         """
@@ -97,21 +425,5 @@ class WebScraper:
             return []
 
         soup = BeautifulSoup(page_source, "html.parser")
-        all_links = [a["href"] for a in soup.find_all("a", href=True)]
-
-        filtered_links = []
-        for link in all_links:
-            # Convert relative URLs to absolute URLs
-            if link.startswith("/library") or link.startswith("/customers"):
-                link = self.base_url + link
-
-            # Apply filtering rules
-            if (
-                link.startswith("https://wso2.com/library/blogs/")
-                or link.startswith("https://wso2.com/library/conference")
-                or link.startswith("https://wso2.com/customers")
-            ):
-                filtered_links.append(link)
-
-        return filtered_links
+        return extract_links(soup, url, self.base_url)
 
@@ -0,0 +1,52 @@
+import hashlib
+from typing import Optional
+
+from src.ingestion.cache import TransformationCacheStore
+
+
+class FormattingCache:
+    """
+    Persistent cache of LLM transcript-to-Markdown outputs.
+
+    The formatter runs at temperature 0, so its output is a function of the
+    model, the prompt and the segment text. Entries are keyed on a hash of all
+    three and live in the ingestion cache store (same size bound and LRU
+    eviction). Entries made with any other model or prompt are dropped on
+    startup, so editing the instructions invalidates the cache.
+    """
+
+    COLLECTION_PREFIX = "llm_format:"
+    LABEL = "LLM formatting cache"
+
+    def __init__(self, store: TransformationCacheStore, model: str, instructions: str):
+        self.store = store
+        self.model = model
+        self.instructions = instructions
+        prompt_hash = hashlib.sha256(f"{model}\0{instructions}".encode()).hexdigest()
+        self.collection = f"{self.COLLECTION_PREFIX}{prompt_hash[:16]}"
+        self.hits = 0
+        self.misses = 0
+
+        dropped = store.drop_stale_collections(self.COLLECTION_PREFIX, self.collection)
+        if dropped:
+            print(f"{self.LABEL}: prompt or model changed, dropped {dropped} entries")
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{self.instructions}\0{text}".encode()).hexdigest()
+
+    def get(self, text: str) -> Optional[str]:
+        key = self._key(text)
+        value = self.store.get_many([key]).get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, text: str, formatted: str) -> None:
+        self.store.put_many(self.collection, {self._key(text): formatted})
+
+    def stats(self) -> str:
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"{self.LABEL}: {self.hits}/{total} hits ({rate:.0%})"
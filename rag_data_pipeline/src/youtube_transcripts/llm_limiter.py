@@ -0,0 +1,107 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+import tiktoken
+
+
+_encoding = None
+_encoding_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """Counts tokens with the gpt-4o-mini tokenizer, falling back to ~4 characters per token."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            _encoding = tiktoken.encoding_for_model("gpt-4o-mini")
+        except Exception as e:
+            # tiktoken downloads its vocabulary on first use; estimate when that is not possible
+            print(f"tiktoken unavailable, estimating token counts: {e}")
+    if _encoding is None:
+        return len(text) // 4 + 1
+    return len(_encoding.encode(text))
+
+
+class LLMRateLimiter:
+    """
+    Bounds concurrent LLM calls and keeps tokens per minute under the account limit.
+
+    Concurrency is capped by a semaphore; tokens are tracked in a sliding
+    60 second window, and a call waits until its estimated tokens fit. Also
+    keeps the counters for the progress and throughput report.
+
+    The semaphore and the window are thread-safe rather than bound to one
+    event loop, so one limiter can be shared by the event loops of several
+    threads (e.g. the workers of the ingestion service) and by successive
+    asyncio.run calls, and its limits hold across all of them.
+    """
+
+    # How often a call waiting for a concurrency slot checks again
+    SLOT_POLL_SECONDS = 0.05
+
+    def __init__(self, max_concurrency: int = 8, tokens_per_minute: int = 200_000, label: str = "LLM"):
+        self.label = label
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._window = deque()
+        self._window_tokens = 0
+
+        self.scheduled = 0
+        self.completed = 0
+        self.tokens = 0
+        self.started = time.perf_counter()
+
+    async def _acquire_slot(self) -> None:
+        # Polled instead of blocking in asyncio.to_thread: a cancelled wait then never
+        # takes a slot it does not give back, and waiting calls do not fill the default executor
+        while not self._slots.acquire(blocking=False):
+            await asyncio.sleep(self.SLOT_POLL_SECONDS)
+
+    async def _reserve(self, tokens: int) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._window and now - self._window[0][0] >= 60:
+                    self._window_tokens -= self._window.popleft()[1]
+                # A single call larger than the budget still runs once the window is empty
+                if not self._window or self._window_tokens + tokens <= self.tokens_per_minute:
+                    self._window.append((now, tokens))
+                    self._window_tokens += tokens
+                    return
+                wait = 60 - (now - self._window[0][0])
+            await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def limit(self, tokens: int):
+        """
+        Waits for a concurrency slot and token budget for one call.
+
+        Args:
+            tokens (int): Estimated prompt plus completion tokens of the call
+        """
+        with self._lock:
+            self.scheduled += 1
+        await self._acquire_slot()
+        try:
+            await self._reserve(tokens)
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.completed += 1
+                    self.tokens += tokens
+                    completed, scheduled = self.completed, self.scheduled
+                if completed % 10 == 0:
+                    print(f"{self.label} progress: {completed}/{scheduled} calls done, {self.throughput()}")
+        finally:
+            self._slots.release()
+
+    def throughput(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return f"{self.completed / elapsed:.2f} calls/sec, {self.tokens / elapsed * 60:,.0f} tokens/min"
@@ -0,0 +1,152 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List
+
+
+WORD_PATTERN = re.compile(r"[a-z][a-z0-9'-]+")
+SENTENCE_END_PATTERN = re.compile(r"[.!?][\"')\]]*$")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here hers
+him his how i if in into is it its itself just let like me more most my no nor not now of off on once only or
+other our ours out over own really right same she should so some such than that the their them then there these
+they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours yeah okay ok um uh going gonna get got know think thing things want say said see also
+one two actually basically kind sort lot way well
+""".split())
+
+
+def _tokens(text: str) -> List[str]:
+    return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS and len(word) > 2]
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    if not a or not b:
+        return 0.0
+    dot = sum(weight * b[word] for word, weight in a.items() if word in b)
+    norm = math.sqrt(sum(v * v for v in a.values())) * math.sqrt(sum(v * v for v in b.values()))
+    return dot / norm if norm else 0.0
+
+
+class RuleBasedFormatter:
+    """
+    Deterministic, LLM-free replacement for the transcript-to-Markdown step.
+
+    Section boundaries are scored at every gap between snippets from three
+    signals: TextTiling-style lexical shift (depth of the TF-IDF similarity
+    valley between the windows before and after the gap), speaker pauses
+    (silence between snippets) and sentence ends. The best gaps become
+    headings, titled with the section's highest TF-IDF terms and stamped with
+    the section start in the same [123.45s] format the LLM produces. The
+    snippet lines themselves are kept word for word.
+    """
+
+    def __init__(
+        self,
+        window: int = 6,
+        pause_seconds: float = 1.5,
+        min_section_snippets: int = 8,
+        max_sections: int = 8,
+        title_words: int = 4,
+    ):
+        """
+        Args:
+            window (int): Snippets on each side of a gap compared for lexical shift
+            pause_seconds (float): Silence that counts as a pause
+            min_section_snippets (int): Minimum snippets between two headings
+            max_sections (int): Maximum headings per segment
+            title_words (int): Terms in each generated heading
+        """
+        self.window = window
+        self.pause_seconds = pause_seconds
+        self.min_section_snippets = min_section_snippets
+        self.max_sections = max_sections
+        self.title_words = title_words
+
+    def _idf(self, snippet_tokens: List[List[str]]) -> Dict[str, float]:
+        document_frequency = Counter(word for tokens in snippet_tokens for word in set(tokens))
+        total = len(snippet_tokens)
+        return {word: math.log((1 + total) / (1 + count)) + 1 for word, count in document_frequency.items()}
+
+    def _gap_scores(self, snippets: List[dict], snippet_tokens: List[List[str]], idf: Dict[str, float]) -> List[float]:
+        """Boundary score of the gap before each snippet (index 0 is never a boundary)."""
+        count = len(snippets)
+
+        # Lexical similarity across each gap, O(snippets * window)
+        similarities = [1.0] * count
+        for gap in range(1, count):
+            before = Counter()
+            for tokens in snippet_tokens[max(0, gap - self.window):gap]:
+                before.update(tokens)
+            after = Counter()
+            for tokens in snippet_tokens[gap:gap + self.window]:
+                after.update(tokens)
+            similarities[gap] = _cosine(
+                Counter({word: n * idf[word] for word, n in before.items()}),
+                Counter({word: n * idf[word] for word, n in after.items()}),
+            )
+
+        # Depth score: how far the similarity dips below the peaks on either side
+        scores = [0.0] * count
+        for gap in range(1, count):
+            left = max(similarities[max(1, gap - self.window):gap + 1])
+            right = max(similarities[gap:gap + self.window + 1])
+            depth = (left - similarities[gap]) + (right - similarities[gap])
+
+            previous = snippets[gap - 1]
+            silence = snippets[gap]["start"] - (previous["start"] + previous["duration"])
+            pause = min(silence / self.pause_seconds, 2.0) * 0.25 if silence >= self.pause_seconds else 0.0
+            sentence = 0.15 if SENTENCE_END_PATTERN.search(previous["text"].strip()) else 0.0
+            scores[gap] = depth + pause + sentence
+        return scores
+
+    def _boundaries(self, scores: List[float]) -> List[int]:
+        count = len(scores)
+        candidates = scores[1:]
+        if not candidates:
+            return [0]
+        mean = sum(candidates) / len(candidates)
+        deviation = math.sqrt(sum((s - mean) ** 2 for s in candidates) / len(candidates))
+        threshold = mean + deviation / 2
+
+        chosen = [0]
+        for gap in sorted(range(1, count), key=lambda i: scores[i], reverse=True):
+            if len(chosen) >= self.max_sections or scores[gap] < threshold:
+                break
+            if all(abs(gap - other) >= self.min_section_snippets for other in chosen) \
+                    and count - gap >= self.min_section_snippets:
+                chosen.append(gap)
+        return sorted(chosen)
+
+    def _title(self, section_tokens: List[List[str]], idf: Dict[str, float]) -> str:
+        counts = Counter(word for tokens in section_tokens for word in tokens)
+        ranked = sorted(counts, key=lambda word: (-counts[word] * idf[word], word))
+        words = ranked[:self.title_words]
+        return " ".join(word.capitalize() for word in words) if words else "Transcript"
+
+    def format(self, snippets: List[dict]) -> str:
+        """
+        Formats one transcript segment as Markdown.
+
+        Args:
+            snippets (List[dict]): Transcript entries with 'text', 'start' and 'duration'
+
+        Returns:
+            str: Markdown with timestamped headings and the original lines
+        """
+        if not snippets:
+            return ""
+
+        snippet_tokens = [_tokens(snippet["text"]) for snippet in snippets]
+        idf = self._idf(snippet_tokens)
+        boundaries = self._boundaries(self._gap_scores(snippets, snippet_tokens, idf))
+
+        sections = []
+        for number, (start, end) in enumerate(zip(boundaries, boundaries[1:] + [len(snippets)])):
+            level = "#" if number == 0 else "##"
+            title = self._title(snippet_tokens[start:end], idf)
+            lines = [f"[{snippet['start']:.2f}s] {snippet['text']}" for snippet in snippets[start:end]]
+            sections.append(f"{level} [{snippets[start]['start']:.2f}s] {title}\n" + "\n".join(lines))
+        return "\n\n".join(sections)
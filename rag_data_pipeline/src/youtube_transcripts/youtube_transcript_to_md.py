@@ -1,4 +1,5 @@
 from youtube_transcript_api import YouTubeTranscriptApi
+import asyncio
 import requests
 from bs4 import BeautifulSoup
 import sys
@@ -7,6 +8,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../'
 from llama_index.llms.openai import OpenAI
 from llama_index.core.llms import ChatMessage
 from config.config import get_config
+from src.ingestion.profiler import get_profiler
+from src.youtube_transcripts.llm_limiter import count_tokens
+from src.youtube_transcripts.format_cache import FormattingCache
+from src.youtube_transcripts.rule_formatter import SENTENCE_END_PATTERN, RuleBasedFormatter
 
 config = get_config()
 os.environ["OPENAI_API_KEY"] = config.openai_api_key
@@ -43,16 +48,51 @@ instructions_for_llm = """You are a formatter.
                             and we get back the retrieved text and then we construct the full prompt and we get the response
                             """
 
+segment_instructions = instructions_for_llm + """
+            Keep all timestamps in the format [XXX.XXs] at the beginning of each line.
+            Preserve the timestamp information exactly as provided in seconds format.
+            """
+
 
 class YouTubeTranscriptScraper:
 
     """Scraper to fetch and segment YouTube video transcripts into Markdown format.
-    Uses YouTubeTranscriptApi to get transcripts, segments them into time-based chunks,
+    Uses YouTubeTranscriptApi to get transcripts, segments them into token-budgeted or time-based chunks,
     and processes each chunk with an LLM to convert to Markdown.   """
 
-    def __init__(self, language="en", segment_length_minutes=10):
+    FORMATTERS = ("llm", "rules")
+
+    def __init__(
+        self,
+        language="en",
+        segment_length_minutes=10,
+        http_cache=None,
+        cache_store=None,
+        formatter="llm",
+        segment_tokens=None,
+        pause_seconds=1.5,
+    ):
+        """
+        Args:
+            language (str): Transcript language
+            segment_length_minutes (int): Window length when segmenting by time
+            http_cache (HttpCache): Cache for video page metadata fetches
+            cache_store (TransformationCacheStore): Store for cached LLM formatting outputs
+            formatter (str): 'llm' or 'rules'
+            segment_tokens (int): Target tokens per segment, None to segment by time windows
+            pause_seconds (float): Silence treated as a natural cut point
+        """
+        if formatter not in self.FORMATTERS:
+            raise ValueError(f"Unsupported transcript formatter '{formatter}'. Expected one of {self.FORMATTERS}.")
         self.language = language
+        self.formatter = formatter
+        self.rule_formatter = RuleBasedFormatter()
         self.segment_length = segment_length_minutes * 60  
+        self.segment_tokens = segment_tokens
+        self.pause_seconds = pause_seconds
+        self.http_cache = http_cache
+        self.format_cache = FormattingCache(cache_store, llm.model, segment_instructions) if cache_store is not None else None
+        self.session = requests.Session()
 
         
     def _get_video_id(self, url: str) -> str:
@@ -83,8 +123,11 @@ class YouTubeTranscriptScraper:
         
         """
         try:
-            resp = requests.get(url, timeout=10)
-            soup = BeautifulSoup(resp.text, "html.parser")
+            if self.http_cache is not None:
+                page_source = self.http_cache.get(self.session, url, timeout=10).text
+            else:
+                page_source = self.session.get(url, timeout=10).text
+            soup = BeautifulSoup(page_source, "html.parser")
             title = soup.title.string if soup.title else "No title found"
             description_tag = soup.find("meta", attrs={"name": "description"})
             description = description_tag["content"] if description_tag else "No description found"
@@ -115,15 +158,17 @@ class YouTubeTranscriptScraper:
 
     
     def _segment_transcript(self, transcript):
-        """Segment transcript into time-based chunks
+        """Segment transcript into chunks, by token budget or by fixed time windows
         Args:
             transcript (list): List of transcript entries from YouTubeTranscriptApi
         Returns:
-            list of segments, each segment is a list of transcript entries
+            list of segments, each segment is a non-empty list of transcript entries
         
         """
       
         snippets = [{"text": s.text, "start": s.start, "duration": s.duration} for s in transcript]
+        if self.segment_tokens:
+            return self._segment_by_tokens(snippets)
         
         segments = []
         current_segment = []
@@ -132,10 +177,9 @@ class YouTubeTranscriptScraper:
         for snippet in snippets:
          
             while snippet["start"] >= current_segment_start + self.segment_length:
+                # Silent windows produce no segment
                 if current_segment:
                     segments.append(current_segment)
-                else:
-                    segments.append([])  
                 current_segment = []
                 current_segment_start += self.segment_length
             
@@ -146,39 +190,106 @@ class YouTubeTranscriptScraper:
             segments.append(current_segment)
         
         return segments
-    
 
-    
-    def _process_segment_content(self, segment, segment_index):
-        """Process a single segment and convert to markdown
+    def _segment_by_tokens(self, snippets):
+        """Segment snippets to a token budget, cutting at sentence ends or pauses
+        
+        A segment is closed at the first sentence end or pause once it holds at
+        least 80% of segment_tokens, and before any snippet that would push it past
+        125%. Single pass over the snippets.
         Args:
-            segment (list): List of transcript entries in the segment
-            segment_index (int): Index of the segment for reference
+            snippets (list): Transcript entries with 'text', 'start' and 'duration'
         Returns:
-            dict with 'start_seconds', 'end_seconds', 'content_markdown'
-        
+            list of segments, each segment is a non-empty list of transcript entries
         """
-        if not segment:
-            return {
-                "start_seconds": segment_index * self.segment_length,
-                "end_seconds": (segment_index + 1) * self.segment_length,
-                "content_markdown": "No content in this segment"
-            }
-        
+        min_tokens = int(self.segment_tokens * 0.8)
+        max_tokens = int(self.segment_tokens * 1.25)
+
+        segments = []
+        current_segment = []
+        current_tokens = 0
+        for i, snippet in enumerate(snippets):
+            # "[1234.56s] " prefix plus the newline cost about 8 tokens per line
+            tokens = count_tokens(snippet["text"]) + 8
+            if current_segment and current_tokens + tokens > max_tokens:
+                segments.append(current_segment)
+                current_segment, current_tokens = [], 0
+
+            current_segment.append(snippet)
+            current_tokens += tokens
+
+            if current_tokens >= min_tokens and i + 1 < len(snippets):
+                silence = snippets[i + 1]["start"] - (snippet["start"] + snippet["duration"])
+                if silence >= self.pause_seconds or SENTENCE_END_PATTERN.search(snippet["text"].strip()):
+                    segments.append(current_segment)
+                    current_segment, current_tokens = [], 0
+
+        if current_segment:
+            segments.append(current_segment)
+        return segments
+
+    def _empty_segment(self, segment_index):
+        return {
+            "start_seconds": segment_index * self.segment_length,
+            "end_seconds": (segment_index + 1) * self.segment_length,
+            "content_markdown": "No content in this segment"
+        }
+
+    def _segment_text(self, segment):
+        """Returns start, end and the timestamped transcript lines of a non-empty segment"""
         start_seconds = segment[0]["start"]
         end_seconds = segment[-1]["start"] + segment[-1]["duration"]
-        
-        # Format timestamps
-        start_time = self._seconds_to_timestamp(start_seconds)
-        end_time = self._seconds_to_timestamp(end_seconds)
-        
+
         # Create content with individual timestamps for each sentence/phrase
         timestamped_content = []
         for s in segment:
             timestamp_seconds = s["start"]
             timestamped_content.append(f"[{timestamp_seconds:.2f}s] {s['text']}")
+
+        return start_seconds, end_seconds, "\n".join(timestamped_content)
+
+    def _segment_messages(self, content_with_timestamps):
+        return [
+            ChatMessage(role="user", content=segment_instructions), 
+            ChatMessage(role="user", content=content_with_timestamps)
+        ]
+
+    def _segment_result(self, start_seconds, end_seconds, content_with_timestamps, formatted=None, error=None):
+        start_time = self._seconds_to_timestamp(start_seconds)
+        end_time = self._seconds_to_timestamp(end_seconds)
+        if error is None:
+            markdown_content = f"**Time Range: {start_time} - {end_time}**\n\n{formatted}"
+        else:
+            markdown_content = f"**Time Range: {start_time} - {end_time}**\n\nError processing content: {error}\n\nOriginal content:\n{content_with_timestamps}"
+
+        return {
+            "start_seconds": start_seconds,
+            "end_seconds": end_seconds,
+            "content_markdown": markdown_content
+        }
+
+    def _process_segment_content(self, segment, segment_index):
+        """Process a single segment and convert to markdown
+        Args:
+            segment (list): List of transcript entries in the segment
+            segment_index (int): Index of the segment for reference
+        Returns:
+            dict with 'start_seconds', 'end_seconds', 'content_markdown'
+        
+        """
+        if not segment:
+            return self._empty_segment(segment_index)
         
-        content_with_timestamps = "\n".join(timestamped_content)
+        start_seconds, end_seconds, content_with_timestamps = self._segment_text(segment)
+
+        if self.formatter == "rules":
+            formatted = self.rule_formatter.format(segment)
+            return self._segment_result(start_seconds, end_seconds, content_with_timestamps, formatted)
+
+        if self.format_cache is not None:
+            formatted = self.format_cache.get(content_with_timestamps)
+            if formatted is not None:
+                return self._segment_result(start_seconds, end_seconds, content_with_timestamps, formatted)
 
         print("-----------------------------")
         print(content_with_timestamps)
@@ -186,31 +297,78 @@ class YouTubeTranscriptScraper:
         
         # Convert to markdown using LLM
         try:
-            enhanced_instructions = instructions_for_llm + """
-            Keep all timestamps in the format [XXX.XXs] at the beginning of each line.
-            Preserve the timestamp information exactly as provided in seconds format.
-            """
-            messages = [
-                ChatMessage(role="user", content=enhanced_instructions), 
-                ChatMessage(role="user", content=content_with_timestamps)
-            ]
-            response = llm.chat(messages)
+            with get_profiler().stage("llm_formatting", items=1):
+                response = llm.chat(self._segment_messages(content_with_timestamps))
 
             print("-----------------------------")
             print("LLM response:", response.message.content)
             print("-----------------------------")
+        except Exception as e:
+            return self._segment_result(start_seconds, end_seconds, content_with_timestamps, error=e)
 
-            markdown_content = f"**Time Range: {start_time} - {end_time}**\n\n{response.message.content}"
+        self._cache_formatted(content_with_timestamps, response.message.content)
+        return self._segment_result(start_seconds, end_seconds, content_with_timestamps, response.message.content)
+
+    def _cache_formatted(self, content_with_timestamps, formatted):
+        """Stores a formatted segment; a failed write only costs a later LLM call, so it is logged and ignored."""
+        if self.format_cache is None:
+            return
+        try:
+            self.format_cache.put(content_with_timestamps, formatted)
         except Exception as e:
-            markdown_content = f"**Time Range: {start_time} - {end_time}**\n\nError processing content: {e}\n\nOriginal content:\n{content_with_timestamps}"
-        
+            print(f"Error caching formatted segment: {e}")
+
+    async def _aprocess_segment_content(self, segment, segment_index, limiter):
+        """Async variant of _process_segment_content that waits for the shared LLM limiter
+        Args:
+            segment (list): List of transcript entries in the segment
+            segment_index (int): Index of the segment for reference
+            limiter (LLMRateLimiter): Concurrency and tokens-per-minute limiter shared by all videos
+        Returns:
+            dict with 'start_seconds', 'end_seconds', 'content_markdown'
+        """
+        if not segment:
+            return self._empty_segment(segment_index)
+
+        start_seconds, end_seconds, content_with_timestamps = self._segment_text(segment)
+        if self.formatter == "rules":
+            formatted = self.rule_formatter.format(segment)
+            return self._segment_result(start_seconds, end_seconds, content_with_timestamps, formatted)
+
+        if self.format_cache is not None:
+            formatted = await asyncio.to_thread(self.format_cache.get, content_with_timestamps)
+            if formatted is not None:
+                return self._segment_result(start_seconds, end_seconds, content_with_timestamps, formatted)
+
+        messages = self._segment_messages(content_with_timestamps)
+        # The formatter echoes its input, so expect about as many output tokens as input
+        prompt_tokens = sum(count_tokens(message.content) for message in messages)
+        try:
+            async with limiter.limit(prompt_tokens + count_tokens(content_with_timestamps)):
+                with get_profiler().stage("llm_formatting", items=1):
+                    response = await llm.achat(messages)
+        except Exception as e:
+            return self._segment_result(start_seconds, end_seconds, content_with_timestamps, error=e)
+
+        if self.format_cache is not None:
+            await asyncio.to_thread(self._cache_formatted, content_with_timestamps, response.message.content)
+        return self._segment_result(start_seconds, end_seconds, content_with_timestamps, response.message.content)
+
+    def _unavailable(self, url, metadata, error):
         return {
-            "start_seconds": start_seconds,
-            "end_seconds": end_seconds,
-            "content_markdown": markdown_content
+            "url": url,
+            "metadata": metadata,
+            "segments": [{
+                "start_seconds": 0,
+                "end_seconds": 0,
+                "content_markdown": f"Transcript not available: {error}"
+            }]
         }
-    
 
+    def _fetch_transcript(self, video_id):
+        with get_profiler().stage("youtube_fetch", items=1):
+            ytt_api = YouTubeTranscriptApi()
+            return ytt_api.fetch(video_id, languages=[self.language])
 
     def get_transcript_segments(self, url: str) -> dict:
         """
@@ -225,22 +383,12 @@ class YouTubeTranscriptScraper:
         try:
             video_id = self._get_video_id(url)
         except Exception as e:
-            metadata = self._fetch_metadata(url)
-            return {
-                "url": url,
-                "metadata": metadata,
-                "segments": [{
-                    "start_seconds": 0,
-                    "end_seconds": 0,
-                    "content_markdown": f"Transcript not available: {e}"
-                }]
-            }
+            return self._unavailable(url, self._fetch_metadata(url), e)
         
         metadata = self._fetch_metadata(url)
         
         try:
-            ytt_api = YouTubeTranscriptApi()
-            transcript = ytt_api.fetch(video_id, languages=[self.language])
+            transcript = self._fetch_transcript(video_id)
             
             # Segment the transcript
             segments = self._segment_transcript(transcript)
@@ -258,15 +406,64 @@ class YouTubeTranscriptScraper:
             }
             
         except Exception as e:
-            return {
-                "url": url,
-                "metadata": metadata,
-                "segments": [{
-                    "start_seconds": 0,
-                    "end_seconds": 0,
-                    "content_markdown": f"Transcript not available: {e}"
-                }]
-            }
+            return self._unavailable(url, metadata, e)
+
+    async def aget_transcript_segments(self, url: str, limiter, fetch_semaphore) -> dict:
+        """
+        Async variant of get_transcript_segments.
+
+        Metadata and transcript are fetched on worker threads (bounded by
+        fetch_semaphore), then all segments are formatted concurrently through
+        the shared limiter and reassembled in their original order.
+
+        Args:
+            url (str): YouTube video URL
+            limiter (LLMRateLimiter): LLM limiter shared by all videos
+            fetch_semaphore (asyncio.Semaphore): Bounds concurrent YouTube fetches
+
+        Returns:
+            dict with 'url', 'metadata', 'segments' (array of segment objects)
+        """
+        async with fetch_semaphore:
+            try:
+                video_id = self._get_video_id(url)
+            except Exception as e:
+                return self._unavailable(url, await asyncio.to_thread(self._fetch_metadata, url), e)
+
+            metadata_task = asyncio.to_thread(self._fetch_metadata, url)
+            transcript_task = asyncio.to_thread(self._fetch_transcript, video_id)
+            metadata, transcript = await asyncio.gather(metadata_task, transcript_task, return_exceptions=True)
+
+        if isinstance(transcript, Exception):
+            return self._unavailable(url, metadata, transcript)
+
+        segments = self._segment_transcript(transcript)
+        processed_segments = await asyncio.gather(
+            *(self._aprocess_segment_content(segment, i, limiter) for i, segment in enumerate(segments))
+        )
+        return {
+            "url": url,
+            "metadata": metadata,
+            "segments": list(processed_segments)
+        }
+
+    async def aget_many(self, urls, limiter, fetch_concurrency=4) -> list:
+        """
+        Processes many videos concurrently.
+
+        Args:
+            urls (list[str]): YouTube video URLs
+            limiter (LLMRateLimiter): LLM limiter shared by all videos
+            fetch_concurrency (int): Maximum concurrent transcript/metadata fetches
+
+        Returns:
+            list: One result (or the exception raised) per URL, in input order
+        """
+        fetch_semaphore = asyncio.Semaphore(fetch_concurrency)
+        return await asyncio.gather(
+            *(self.aget_transcript_segments(url, limiter, fetch_semaphore) for url in urls),
+            return_exceptions=True,
+        )
     
     # Keep the original method for backward compatibility
     def get_transcript(self, url: str) -> dict:
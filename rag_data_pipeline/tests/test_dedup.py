@@ -0,0 +1,40 @@
+from unittest.mock import MagicMock
+
+from src.ingestion.dedup import MinHasher, NearDuplicateFilter, _lsh_shape
+
+
+# Long enough that one changed word leaves the estimated similarity well above the threshold
+TEXT = " ".join(f"word{i}" for i in range(400))
+NEAR_DUPLICATE = TEXT.replace("word200 ", "changed ").upper() + "."
+DISTINCT = " ".join(f"other{i}" for i in range(400))
+
+
+def _filter() -> NearDuplicateFilter:
+    # The signature table is only touched by _load() and commit()
+    return NearDuplicateFilter(MagicMock(), "test_minhash", mode="drop", threshold=0.9)
+
+
+def test_lsh_shape_keeps_collision_threshold_below_match_threshold():
+    bands, rows = _lsh_shape(128, 0.9)
+    assert (bands, rows) == (16, 8)
+    assert (1 / bands) ** (1 / rows) <= 0.8
+
+
+def test_minhash_similarity():
+    hasher = MinHasher()
+    signature = hasher.signature(TEXT)
+    assert (signature == hasher.signature(NEAR_DUPLICATE)).mean() >= 0.9
+    assert (signature == hasher.signature(DISTINCT)).mean() < 0.1
+    assert hasher.signature("") is None
+
+
+def test_match_finds_near_duplicates_of_other_sources():
+    dedup = _filter()
+    hasher = MinHasher()
+    dedup._index("node-a", "doc-a", hasher.signature(TEXT))
+
+    match = dedup._match("doc-b", hasher.signature(NEAR_DUPLICATE))
+    assert match is not None and match[0] == "node-a" and match[1] >= 0.9
+    assert dedup._match("doc-b", hasher.signature(DISTINCT)) is None
+    # A new version of the same source never collapses onto its previous chunks
+    assert dedup._match("doc-a", hasher.signature(NEAR_DUPLICATE)) is None
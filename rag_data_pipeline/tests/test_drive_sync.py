@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import pytest
+from sqlalchemy import create_engine
+
+from src.drive_reader.sync import DriveSync, LocalDriveClient
+
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "drive")
+FOLDER_ID = "fake-folder"
+
+
+@pytest.fixture
+def drive(tmp_path):
+    root = tmp_path / "drive"
+    shutil.copytree(FIXTURES, root)
+    client = LocalDriveClient(str(root), FOLDER_ID)
+    sync = DriveSync(client, create_engine(f"sqlite:///{tmp_path / 'state.db'}"), str(tmp_path / "downloads"))
+    return root, sync
+
+
+def _sync(sync: DriveSync):
+    """Runs one sync and returns the plan and the downloaded files' contents by id."""
+    plan = sync.plan(FOLDER_ID)
+    downloaded = {}
+    for drive_file, path in sync.download(plan.changed):
+        with open(path) as f:
+            downloaded[drive_file.file_id] = f.read()
+    sync.commit(plan, set(downloaded))
+    return plan, downloaded
+
+
+def test_sync_follows_edits_additions_and_deletions(drive):
+    root, sync = drive
+    onboarding = os.path.join("team", "onboarding.md")
+
+    plan, downloaded = _sync(sync)
+    assert sorted(downloaded) == ["overview.md", "release-notes.txt", onboarding]
+    assert downloaded["overview.md"] == (root / "overview.md").read_text()
+    assert plan.removed == []
+
+    plan, downloaded = _sync(sync)
+    assert plan.changed == [] and downloaded == {}
+    assert sorted(plan.files) == ["overview.md", "release-notes.txt", onboarding]
+
+    # Edit
+    with open(root / "overview.md", "a") as f:
+        f.write("\nIt also ships an AI gateway.\n")
+    plan, downloaded = _sync(sync)
+    assert list(downloaded) == ["overview.md"]
+    assert downloaded["overview.md"].endswith("It also ships an AI gateway.\n")
+
+    # Addition in a subfolder
+    (root / "team" / "faq.md").write_text("# FAQ\n\nAsk in the team channel.\n")
+    plan, downloaded = _sync(sync)
+    assert list(downloaded) == [os.path.join("team", "faq.md")]
+    assert plan.removed == []
+
+    # Deletion
+    os.remove(root / "release-notes.txt")
+    plan, downloaded = _sync(sync)
+    assert plan.removed == ["release-notes.txt"] and downloaded == {}
+    assert "release-notes.txt" not in plan.files
+    assert len(os.listdir(sync.download_dir)) == 3
+
+    plan, downloaded = _sync(sync)
+    assert plan.changed == [] and plan.removed == []